@@ -0,0 +1,57 @@
+# coding=utf-8
+'''Throughput of the batch APIs for an increasing number of workers.
+
+Usage: python benchmarks/bench_batch.py [num_packages]
+
+Conversion is CPU bound, so records per second should scale close to
+linearly with the number of workers up to the number of cores.
+'''
+import json
+import os
+import sys
+import time
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+
+def load_packages(num):
+    inpath = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                          'fixtures', 'full_ckan_package.json')
+    ckandict = json.load(open(inpath))
+    for i in range(num):
+        indict = dict(ckandict)
+        indict['name'] = 'package-{}'.format(i)
+        yield indict
+
+
+def run(convert, records, workers):
+    start = time.perf_counter()
+    count = sum(1 for _ in convert(records, workers=workers, chunksize=64))
+    elapsed = time.perf_counter() - start
+    return count / elapsed
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    cores = os.cpu_count() or 1
+    fdpackages = [ckan_to_frictionless.dataset(p) for p in load_packages(1)]
+    workers_list = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+
+    print('{:<12} {:>8} {:>14} {:>8}'.format(
+        'converter', 'workers', 'records/s', 'speedup'))
+    for label, convert, records in [
+            ('datasets', ckan_to_frictionless.datasets,
+             lambda: load_packages(num)),
+            ('packages', frictionless_to_ckan.packages,
+             lambda: (fdpackages[0] for _ in range(num)))]:
+        baseline = None
+        for workers in workers_list:
+            rate = run(convert, records(), workers)
+            baseline = baseline or rate
+            print('{:<12} {:>8} {:>14.0f} {:>7.2f}x'.format(
+                label, workers, rate, rate / baseline))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# coding=utf-8
+'''Memory of a converted catalog held in memory, plain against compact.
+
+Usage: python benchmarks/bench_compact.py [--resources 1000000]
+
+Writes a JSONL dump of synthetic CKAN packages (10 resources each), then, in
+a fresh process per mode, converts the whole dump with
+`ckan_to_frictionless.dataset` into a list and reports the growth of the
+process resident memory:
+
+* plain: the dicts `dataset` returns
+* compact: `dataset(..., compact=True)`, interned keys and values and
+  `compact.ResourceRecord` resources
+'''
+import argparse
+import gc
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, ckan_package  # noqa: E402
+
+RESOURCES_PER_PACKAGE = 10
+
+
+def rss():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def load(path, compact):
+    from frictionless_ckan_mapper import ckan_to_frictionless
+    gc.collect()
+    before = rss()
+    start = time.perf_counter()
+    with io.open(path) as infile:
+        catalog = [ckan_to_frictionless.dataset(json.loads(line),
+                                                compact=compact)
+                   for line in infile]
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    used = rss() - before
+    resources = sum(len(fddict['resources']) for fddict in catalog)
+    print(json.dumps({'bytes': used, 'seconds': elapsed,
+                      'resources': resources}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--resources', type=int, default=1000000)
+    parser.add_argument('--load', help=argparse.SUPPRESS)
+    parser.add_argument('--compact', action='store_true',
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.load:
+        return load(args.load, args.compact)
+
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, 'dump.jsonl')
+        shape = Shape(resources=RESOURCES_PER_PACKAGE)
+        with io.open(path, 'w') as outfile:
+            for seed in range(args.resources // RESOURCES_PER_PACKAGE):
+                outfile.write(json.dumps(ckan_package(shape, seed)) + '\n')
+
+        print('{:<10} {:>12} {:>12} {:>16} {:>10}'.format(
+            'mode', 'resources', 'MB', 'bytes/resource', 'seconds'))
+        results = {}
+        for mode in ['plain', 'compact']:
+            command = [sys.executable, __file__, '--load', path]
+            if mode == 'compact':
+                command.append('--compact')
+            result = json.loads(subprocess.check_output(command))
+            results[mode] = result
+            print('{:<10} {:>12} {:>12.0f} {:>16.0f} {:>10.1f}'.format(
+                mode, result['resources'], result['bytes'] / 1e6,
+                result['bytes'] / float(result['resources']),
+                result['seconds']))
+        print('compact uses {:.0%} of the memory of plain dicts'.format(
+            results['compact']['bytes'] / float(results['plain']['bytes'])))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
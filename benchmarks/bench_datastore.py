@@ -0,0 +1,131 @@
+# coding=utf-8
+'''Fetching the data dictionaries of a catalog, per resource against batched.
+
+Usage: python benchmarks/bench_datastore.py
+
+Serves packages whose resources are all in the DataStore from the stand-in
+portal of the tests, with some latency per request, and gets a Table Schema
+for each resource:
+
+* sequentially with urllib, one `datastore_search?limit=0` per resource,
+  each mapped to a schema by hand (what a plain loop does)
+* with `datastore.fetch` at growing concurrency, the schemas added by
+  `ckan_to_frictionless.dataset(..., datastore_fields_by_id=...)`
+
+then times `datastore.schema` alone on the fields of the catalog.
+'''
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from frictionless_ckan_mapper import ckan_to_frictionless  # noqa: E402
+from frictionless_ckan_mapper import datastore  # noqa: E402
+from tests.fake_ckan import FakeCKAN  # noqa: E402
+
+PACKAGES = 100
+RESOURCES_PER_PACKAGE = 5
+COLUMNS = 20
+LATENCY = 0.01
+
+_types = ['text', 'int4', 'numeric', 'timestamp', 'bool', 'float8', 'date',
+          '_text', 'json', 'varchar(64)']
+
+
+def catalog():
+    ckandicts = []
+    fields = {}
+    for num in range(PACKAGES):
+        resources = []
+        for position in range(RESOURCES_PER_PACKAGE):
+            resource_id = 'res-{}-{}'.format(num, position)
+            resources.append({'id': resource_id, 'name': 'data',
+                              'url': 'http://example.com/data.csv',
+                              'datastore_active': True})
+            fields[resource_id] = [
+                {'id': 'column_{}'.format(column),
+                 'type': _types[(num + column) % len(_types)],
+                 'info': {'label': 'Column {}'.format(column), 'notes': ''}}
+                for column in range(COLUMNS)]
+        ckandicts.append({'id': 'id-{}'.format(num),
+                          'name': 'package-{}'.format(num),
+                          'license_id': 'cc-by', 'resources': resources})
+    return ckandicts, fields
+
+
+# the mapping such a loop carries, one lookup per field
+_by_hand = {'text': 'string', 'int4': 'integer', 'numeric': 'number',
+            'timestamp': 'datetime', 'bool': 'boolean', 'float8': 'number',
+            'date': 'date', '_text': 'array', 'json': 'object',
+            'varchar(64)': 'string'}
+
+
+def sequential(url, ckandicts):
+    out = []
+    for ckandict in ckandicts:
+        fddict = ckan_to_frictionless.dataset(ckandict)
+        for fdresource in fddict['resources']:
+            with urlopen('{}/api/3/action/datastore_search?{}'.format(
+                    url, urlencode({'resource_id': fdresource['id'],
+                                    'limit': 0}))) as response:
+                result = json.loads(response.read().decode('utf-8'))
+            fdresource['schema'] = {'fields': [
+                {'name': field['id'],
+                 'type': _by_hand.get(field['type'], 'any')}
+                for field in result['result']['fields']
+                if field['id'] != '_id']}
+        out.append(fddict)
+    return out
+
+
+def batched(concurrency):
+    def run(url, ckandicts):
+        fields_by_id = datastore.run(url, datastore.resource_ids(ckandicts),
+                                     concurrency=concurrency)
+        return [ckan_to_frictionless.dataset(
+            ckandict, datastore_fields_by_id=fields_by_id)
+            for ckandict in ckandicts]
+    return run
+
+
+def main():
+    ckandicts, fields = catalog()
+    resources = PACKAGES * RESOURCES_PER_PACKAGE
+    runs = [('sequential datastore_search', sequential)]
+    for concurrency in [1, 4, 16]:
+        runs.append(('fetch, concurrency {}'.format(concurrency),
+                     batched(concurrency)))
+
+    print('{} resources of {} columns, {:.0f} ms latency per request'.format(
+        resources, COLUMNS, LATENCY * 1000))
+    print('{:<32} {:>10} {:>12} {:>12}'.format(
+        'method', 'seconds', 'resources/s', 'connections'))
+    for label, run in runs:
+        with FakeCKAN(ckandicts, latency=LATENCY,
+                      datastore=fields) as portal:
+            start = time.perf_counter()
+            out = run(portal.url, ckandicts)
+            elapsed = time.perf_counter() - start
+        assert sum('schema' in fdresource for fddict in out
+                   for fdresource in fddict['resources']) == resources
+        print('{:<32} {:>10.2f} {:>12.0f} {:>12}'.format(
+            label, elapsed, resources / elapsed,
+            portal.stats['connections']))
+
+    ckan_fields = list(fields.values())
+    datastore.cache_clear()
+    start = time.perf_counter()
+    for _ in range(10):
+        for resource_fields in ckan_fields:
+            datastore.schema(resource_fields)
+    elapsed = time.perf_counter() - start
+    print('datastore.schema: {:.0f} fields/s, type cache {}'.format(
+        10 * resources * COLUMNS / elapsed, datastore.cache_info()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# coding=utf-8
+'''Columnar export (`export.export`) against writing rows from the dicts.
+
+Usage: python benchmarks/bench_export.py [--packages 100000]
+
+Converted synthetic packages (5 resources each) are written as package and
+resource tables:
+
+* dicts: a `csv.DictWriter` row built from each package and resource, what
+  reporting scripts usually do
+* csv: `export.export(..., format='csv')`
+* parquet and arrow: the same with pyarrow, if installed
+'''
+import argparse
+import csv
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, frictionless_package  # noqa: E402
+
+from frictionless_ckan_mapper import export  # noqa: E402
+
+TEMPLATES = 100
+
+
+def catalog(num):
+    templates = [frictionless_package(Shape(resources=5), seed)
+                 for seed in range(TEMPLATES)]
+    out = []
+    for number in range(num):
+        fddict = dict(templates[number % TEMPLATES])
+        fddict['id'] = 'id-{}'.format(number)
+        out.append(fddict)
+    return out
+
+
+def dicts(fddicts, directory):
+    with io.open(os.path.join(directory, 'packages.csv'), 'w',
+                 newline='') as packages, \
+            io.open(os.path.join(directory, 'resources.csv'), 'w',
+                    newline='') as resources:
+        package_writer = csv.DictWriter(packages, export.PACKAGE_COLUMNS)
+        resource_writer = csv.DictWriter(resources, export.RESOURCE_COLUMNS)
+        package_writer.writeheader()
+        resource_writer.writeheader()
+        for fddict in fddicts:
+            licenses = fddict.get('licenses') or [{}]
+            package_writer.writerow({
+                'id': fddict.get('id') or fddict.get('name'),
+                'name': fddict.get('name'),
+                'title': fddict.get('title'),
+                'owner_org': fddict.get('owner_org'),
+                'license': licenses[0].get('name'),
+                'keywords': fddict.get('keywords') or [],
+                'version': fddict.get('version'),
+                'created': fddict.get('metadata_created'),
+                'modified': fddict.get('metadata_modified'),
+                'num_resources': len(fddict.get('resources') or ()),
+            })
+            for position, resource in enumerate(
+                    fddict.get('resources') or ()):
+                row = {name: resource.get(name)
+                       for name in export.RESOURCE_COLUMNS[2:]}
+                row['package_id'] = fddict.get('id')
+                row['position'] = position
+                resource_writer.writerow(row)
+
+
+def exported(format):
+    def run(fddicts, directory):
+        if format == 'csv':
+            with io.open(os.path.join(directory, 'packages.csv'), 'w',
+                         newline='') as packages, \
+                    io.open(os.path.join(directory, 'resources.csv'), 'w',
+                            newline='') as resources:
+                export.export(fddicts, packages, resources)
+        else:
+            export.export(fddicts, os.path.join(directory, 'packages'),
+                          os.path.join(directory, 'resources'),
+                          format=format)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packages', type=int, default=100000)
+    args = parser.parse_args()
+
+    fddicts = catalog(args.packages)
+    rows = args.packages * 6
+    modes = [('dicts', dicts), ('csv', exported('csv'))]
+    if importlib.util.find_spec('pyarrow'):
+        modes += [('parquet', exported('parquet')),
+                  ('arrow', exported('arrow'))]
+    else:
+        print('pyarrow not installed, parquet and arrow skipped')
+
+    directory = tempfile.mkdtemp()
+    try:
+        print('{} packages, {} rows'.format(args.packages, rows))
+        print('{:<10} {:>10} {:>14}'.format('mode', 'seconds', 'rows/s'))
+        for name, func in modes:
+            start = time.perf_counter()
+            func(fddicts, directory)
+            elapsed = time.perf_counter() - start
+            print('{:<10} {:>10.2f} {:>14.0f}'.format(
+                name, elapsed, rows / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
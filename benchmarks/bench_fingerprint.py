@@ -0,0 +1,69 @@
+# coding=utf-8
+'''Speed and peak memory of `fingerprint.fingerprint` on large packages.
+
+Usage: python benchmarks/bench_fingerprint.py
+
+Compares, on synthetic CKAN packages with many resources or a big JSON
+extra:
+
+* `fingerprint.fingerprint`, which normalizes the package with the
+  converters and streams its JSON a few resources at a time
+* BLAKE2b of the whole canonical JSON string (`json.dumps` with sorted keys,
+  what `cache.cache_key` does), which neither skips volatile keys nor
+  normalizes the package
+'''
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, ckan_package  # noqa: E402
+
+from frictionless_ckan_mapper import fingerprint  # noqa: E402
+
+SHAPES = [
+    ('1k resources', Shape(resources=1000)),
+    ('10k resources', Shape(resources=10000)),
+    ('100k resources', Shape(resources=100000)),
+    ('1 MB JSON extra', Shape(resources=10, json_extra_size=1000000)),
+]
+
+
+def whole_string(package):
+    content = json.dumps(package, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(content.encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+def measure(func, package, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(package)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(package)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    print('{:<18} {:<14} {:>10} {:>14}'.format(
+        'package', 'method', 'ms', 'peak memory'))
+    for label, shape in SHAPES:
+        package = ckan_package(shape)
+        for method, func in [('fingerprint', fingerprint.fingerprint),
+                             ('whole string', whole_string)]:
+            seconds, peak = measure(func, package)
+            print('{:<18} {:<14} {:>10.1f} {:>11.0f} kB'.format(
+                label, method, seconds * 1e3, peak / 1e3))
+
+
+if __name__ == '__main__':
+    main()
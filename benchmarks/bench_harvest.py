@@ -0,0 +1,105 @@
+# coding=utf-8
+'''Throughput of `harvest.harvest` against sequential fetching.
+
+Usage: python benchmarks/bench_harvest.py
+
+Serves copies of the full CKAN package fixture from the stand-in portal of
+the tests with some latency per request, and harvests them:
+
+* sequentially with urllib, one `package_show` per package then one
+  `package_search` page at a time (what a plain loop does)
+* with `harvest.harvest`, by pages and by ids, at growing concurrency
+'''
+import json
+import os
+import sys
+import time
+from urllib.parse import urlencode
+from urllib.request import urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from frictionless_ckan_mapper import ckan_to_frictionless  # noqa: E402
+from frictionless_ckan_mapper import client  # noqa: E402
+from frictionless_ckan_mapper import harvest  # noqa: E402
+from tests.fake_ckan import FakeCKAN  # noqa: E402
+
+NUM = 1000
+ROWS = 50
+LATENCY = 0.01
+
+
+def packages():
+    inpath = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                          'fixtures', 'full_ckan_package.json')
+    ckandict = json.load(open(inpath))
+    out = []
+    for i in range(NUM):
+        indict = dict(ckandict)
+        indict['id'] = 'id-{}'.format(i)
+        indict['name'] = 'package-{}'.format(i)
+        out.append(indict)
+    return out
+
+
+def action(url, name, **params):
+    with urlopen('{}/api/3/action/{}?{}'.format(
+            url, name, urlencode(params))) as response:
+        return json.loads(response.read().decode('utf-8'))['result']
+
+
+def sequential_show(url, ids):
+    return [ckan_to_frictionless.dataset(action(url, 'package_show', id=id_))
+            for id_ in ids]
+
+
+def sequential_search(url, ids):
+    out = []
+    start = 0
+    while True:
+        result = action(url, 'package_search', start=start, rows=ROWS)
+        out.extend(ckan_to_frictionless.dataset(ckandict)
+                   for ckandict in result['results'])
+        start += ROWS
+        if start >= result['count']:
+            return out
+
+
+def harvester(concurrency, by_ids=False):
+    def run(url, ids):
+        async def collect():
+            return [fddict async for fddict in harvest.harvest(
+                url, ids=ids if by_ids else None, rows=ROWS,
+                concurrency=concurrency)]
+        return client.run(collect())
+    return run
+
+
+def main():
+    ckandicts = packages()
+    ids = [ckandict['id'] for ckandict in ckandicts]
+    runs = [('sequential package_show', sequential_show),
+            ('sequential package_search', sequential_search)]
+    for concurrency in [1, 4, 16]:
+        runs.append(('harvest ids, concurrency {}'.format(concurrency),
+                     harvester(concurrency, by_ids=True)))
+    for concurrency in [1, 4, 16]:
+        runs.append(('harvest pages, concurrency {}'.format(concurrency),
+                     harvester(concurrency)))
+
+    print('{} packages, {} per page, {:.0f} ms latency per request'.format(
+        NUM, ROWS, LATENCY * 1000))
+    print('{:<32} {:>10} {:>12} {:>12}'.format(
+        'method', 'seconds', 'packages/s', 'connections'))
+    for label, run in runs:
+        with FakeCKAN(ckandicts, latency=LATENCY) as portal:
+            start = time.perf_counter()
+            out = run(portal.url, ids)
+            elapsed = time.perf_counter() - start
+        assert len(out) == NUM
+        print('{:<32} {:>10.2f} {:>12.0f} {:>12}'.format(
+            label, elapsed, NUM / elapsed, portal.stats['connections']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# coding=utf-8
+'''Query latency of an `index.CatalogIndex` against scanning the packages.
+
+Usage: python benchmarks/bench_index.py [--packages 500000]
+
+Builds a catalog of converted synthetic packages with keywords, licenses,
+organizations and resource formats drawn from skewed distributions (a few
+common values and a long tail of rare ones), indexes it and times queries
+with the index and with a scan of every package. The last query mixes the
+organization with the most packages below `index.DENSE` and the least
+frequent keyword and format at or above it, whatever the catalog size.
+'''
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, frictionless_package  # noqa: E402
+
+from frictionless_ckan_mapper import index  # noqa: E402
+
+TEMPLATES = 100
+FORMATS = ['CSV', 'JSON', 'XLSX', 'PDF', 'ZIP', 'GeoJSON', 'XML', 'HTML',
+           'SHP', 'KML', 'TXT', 'API', 'WMS', 'XLS', 'ODS']
+QUERIES = [
+    ('rare keyword', {'keywords': 'keyword-900'}),
+    ('common keyword', {'keywords': 'keyword-1'}),
+    ('organization', {'owner_org': 'org-10'}),
+    ('CSV', {'format': 'CSV'}),
+    ('CSV and license', {'format': 'CSV', 'license': 'license-2'}),
+    ('PDF, org, keyword', {'format': 'PDF', 'owner_org': 'org-3',
+                           'keywords': 'keyword-5'}),
+]
+REPEAT = 200
+
+
+def skewed(rand, num):
+    # Zipf like: value i is about 1 / i as frequent as value 0
+    return min(int(rand.paretovariate(1.0)) - 1, num - 1)
+
+
+def catalog(num):
+    rand = random.Random(0)
+    templates = [frictionless_package(Shape(resources=2), seed)
+                 for seed in range(TEMPLATES)]
+    for number in range(num):
+        fddict = dict(templates[number % TEMPLATES])
+        fddict['id'] = 'id-{}'.format(number)
+        fddict['name'] = 'package-{}'.format(number)
+        fddict['keywords'] = list({'keyword-{}'.format(skewed(rand, 5000))
+                                   for _ in range(rand.randint(0, 5))})
+        fddict['licenses'] = [{'name': 'license-{}'.format(
+            skewed(rand, 20))}]
+        fddict['owner_org'] = 'org-{}'.format(skewed(rand, 2000))
+        fddict['resources'] = [
+            dict(resource, format=FORMATS[skewed(rand, len(FORMATS))])
+            for resource in fddict['resources']]
+        yield fddict
+
+
+def just_dense(catalog_index, field, below=False):
+    '''Return the value of `field` with the fewest packages at or above
+    `index.DENSE`, or the most below it.'''
+    counts = catalog_index.values(field)
+    if below:
+        candidates = [value for value in counts
+                      if counts[value] < index.DENSE]
+        return max(candidates, key=counts.get)
+    candidates = [value for value in counts if counts[value] >= index.DENSE]
+    return min(candidates, key=counts.get)
+
+
+def scan(fddicts, criteria):
+    out = []
+    for fddict in fddicts:
+        if all(value in list(index._extractors[field](fddict))
+               for field, value in criteria.items()):
+            out.append(fddict.get('id'))
+    return out
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packages', type=int, default=500000)
+    args = parser.parse_args()
+
+    fddicts = list(catalog(args.packages))
+    start = time.perf_counter()
+    catalog_index = index.build(fddicts)
+    elapsed = time.perf_counter() - start
+    postings = sum(len(numbers) for field in catalog_index.postings.values()
+                   for numbers in field.values())
+    print('{} packages indexed in {:.1f} s, {} postings ({:.1f} MB)'.format(
+        args.packages, elapsed, postings, postings * 4 / 1e6))
+
+    print('{:<20} {:>8} {:>14} {:>14} {:>10}'.format(
+        'query', 'matches', 'search(20) us', 'count us', 'scan ms'))
+    mixed = {'owner_org': just_dense(catalog_index, 'owner_org', True),
+             'keywords': just_dense(catalog_index, 'keywords'),
+             'format': just_dense(catalog_index, 'format')}
+    for label, criteria in QUERIES + [('sparse org, dense', mixed)]:
+        matches = catalog_index.count(**criteria)
+        search = min(timed(catalog_index.search, 20, **criteria)
+                     for _ in range(REPEAT))
+        count = min(timed(catalog_index.count, **criteria)
+                    for _ in range(REPEAT))
+        scanned = timed(scan, fddicts, criteria)
+        print('{:<20} {:>8} {:>14.1f} {:>14.1f} {:>10.0f}'.format(
+            label, matches, search * 1e6, count * 1e6, scanned * 1e3))
+
+    rand = random.Random(1)
+    updates = [dict(fddicts[rand.randrange(args.packages)],
+                    keywords=['updated']) for _ in range(10000)]
+    elapsed = timed(lambda: [catalog_index.add(fddict)
+                             for fddict in updates])
+    print('{} updates in {:.0f} ms, {:.1f} us each'.format(
+        len(updates), elapsed * 1e3, elapsed / len(updates) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
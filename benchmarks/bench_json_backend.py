@@ -0,0 +1,61 @@
+# coding=utf-8
+'''Compare the JSON backends on packages with heavy JSON extras.
+
+Usage: python benchmarks/bench_json_backend.py
+
+Each package has a large GeoJSON `spatial` extra and a Table Schema in its
+resource, the kind of extras that dominate the profile on real portals.
+'''
+import json
+import random
+import timeit
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import json_backend
+
+
+def heavy_package(num_points=5000, num_fields=200, seed=1):
+    rnd = random.Random(seed)
+    ring = [[round(rnd.uniform(-180, 180), 6), round(rnd.uniform(-90, 90), 6)]
+            for _ in range(num_points)]
+    spatial = {'type': 'Polygon', 'coordinates': [ring + ring[:1]]}
+    schema = {'fields': [{'name': 'field_{}'.format(i), 'type': 'number',
+                          'description': u'Field number {} ü'.format(i)}
+                         for i in range(num_fields)]}
+    return {
+        'name': 'heavy',
+        'license_id': 'cc-by',
+        'extras': [
+            {'key': 'spatial', 'value': json.dumps(spatial)},
+            {'key': 'harvest', 'value': json.dumps({'source': 'x' * 100})},
+            {'key': 'plain', 'value': 'not json'},
+        ],
+        'resources': [{'name': 'data', 'url': 'http://x.com/data.csv',
+                       'schema': json.dumps(schema)}],
+    }
+
+
+def bench(func, arg, number=200):
+    return min(timeit.repeat(lambda: func(arg), number=number,
+                             repeat=5)) / number * 1e6
+
+
+def main():
+    ckandict = heavy_package()
+    fddict = ckan_to_frictionless.dataset(ckandict)
+    print('{:<8} {:<8} {:>12} {:>12}'.format(
+        'loads', 'dumps', 'dataset us', 'package us'))
+    for name in json_backend.BACKENDS:
+        try:
+            backends = json_backend.use(name)
+        except ImportError:
+            continue
+        print('{:<8} {:<8} {:>12.1f} {:>12.1f}'.format(
+            backends[0], backends[1],
+            bench(ckan_to_frictionless.dataset, ckandict),
+            bench(frictionless_to_ckan.package, fddict)))
+
+
+if __name__ == '__main__':
+    main()
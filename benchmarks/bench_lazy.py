@@ -0,0 +1,74 @@
+# coding=utf-8
+'''Eager against lazy (`lazy=True`) decoding in `ckan_to_frictionless.dataset`.
+
+Usage: python benchmarks/bench_lazy.py
+
+Synthetic CKAN packages with a GeoJSON `spatial` extra and a Table Schema in
+each resource go through two pipelines:
+
+* filter: convert and read the name only, what routing packages does
+* dump: convert and `json.dumps` the whole package
+'''
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, ckan_package  # noqa: E402
+
+from frictionless_ckan_mapper import ckan_to_frictionless  # noqa: E402
+
+NUM = 200
+SHAPES = [
+    ('small', Shape(resources=2, json_extra_size=1000)),
+    ('100 kB spatial', Shape(resources=2, json_extra_size=100000)),
+    ('50 schemas', Shape(resources=50, json_extra_size=1000)),
+]
+SCHEMA = json.dumps({'fields': [{'name': 'column_{}'.format(i),
+                                 'type': 'string'} for i in range(20)]})
+
+
+def packages(shape):
+    ckandict = ckan_package(shape)
+    for resource in ckandict['resources']:
+        resource['schema'] = SCHEMA
+    return [ckandict] * NUM
+
+
+def filter_names(ckandicts, lazy):
+    return [ckan_to_frictionless.dataset(ckandict, lazy=lazy)['name']
+            for ckandict in ckandicts]
+
+
+def dump(ckandicts, lazy):
+    return [json.dumps(ckan_to_frictionless.dataset(ckandict, lazy=lazy))
+            for ckandict in ckandicts]
+
+
+def best(func, *args):
+    out = None
+    for _ in range(3):
+        start = time.perf_counter()
+        func(*args)
+        elapsed = time.perf_counter() - start
+        out = elapsed if out is None else min(out, elapsed)
+    return out
+
+
+def main():
+    print('{} packages per run'.format(NUM))
+    print('{:<16} {:<8} {:>10} {:>10} {:>8}'.format(
+        'package', 'pipeline', 'eager ms', 'lazy ms', 'speedup'))
+    for label, shape in SHAPES:
+        ckandicts = packages(shape)
+        for name, pipeline in [('filter', filter_names), ('dump', dump)]:
+            eager = best(pipeline, ckandicts, False)
+            lazy = best(pipeline, ckandicts, True)
+            print('{:<16} {:<8} {:>10.1f} {:>10.1f} {:>7.1f}x'.format(
+                label, name, eager * 1e3, lazy * 1e3, eager / lazy))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+# coding=utf-8
+'''`loader.load` over 100k small `datapackage.json` files.
+
+Usage: python benchmarks/bench_loader.py [--descriptors 100000]
+                                         [--workers N]
+
+Writes small descriptors (one resource each) to a directory tree, a
+.tar.gz and a .zip of it, then converts them to CKAN JSONL:
+
+* naive: a loop opening each file, `json.load`, `frictionless_to_ckan.package`
+  and writing a line at a time
+* loader: `loader.load` on the directory (with 1 and `--workers` workers)
+  and on the archives
+'''
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tarfile
+import tempfile
+import time
+import zipfile
+
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import loader
+
+PER_DIRECTORY = 1000
+
+
+def descriptor(num):
+    return {
+        'name': 'package-{}'.format(num),
+        'title': 'Package {}'.format(num),
+        'licenses': [{'name': 'cc-by', 'title': 'CC BY 4.0'}],
+        'keywords': ['water', 'health'],
+        'resources': [{'name': 'data-{}'.format(num),
+                       'path': 'https://example.com/{}.csv'.format(num),
+                       'format': 'csv', 'bytes': 1024}],
+    }
+
+
+def write_tree(root, num):
+    for i in range(num):
+        directory = os.path.join(root, 'group-{}'.format(i // PER_DIRECTORY),
+                                 'package-{}'.format(i))
+        os.makedirs(directory)
+        with io.open(os.path.join(directory, loader.DESCRIPTOR), 'w') as f:
+            f.write(json.dumps(descriptor(i), indent=2))
+
+
+def naive(root, outpath):
+    with io.open(outpath, 'w') as outfile:
+        for directory, _, files in os.walk(root):
+            if loader.DESCRIPTOR in files:
+                path = os.path.join(directory, loader.DESCRIPTOR)
+                with io.open(path) as infile:
+                    fddict = json.load(infile)
+                outfile.write(json.dumps(frictionless_to_ckan.package(fddict)))
+                outfile.write('\n')
+
+
+def load(source, workers=1):
+    def run(root, outpath):
+        with io.open(outpath, 'w') as outfile:
+            loader.load(source or root, outfile, workers=workers,
+                        chunksize=256)
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--descriptors', type=int, default=100000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        root = os.path.join(directory, 'lake')
+        write_tree(root, args.descriptors)
+        tarpath = os.path.join(directory, 'lake.tar.gz')
+        with tarfile.open(tarpath, 'w:gz') as archive:
+            archive.add(root, 'lake')
+        zippath = os.path.join(directory, 'lake.zip')
+        with zipfile.ZipFile(zippath, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path, _, files in os.walk(root):
+                for name in files:
+                    archive.write(os.path.join(path, name), os.path.relpath(
+                        os.path.join(path, name), directory))
+        outpath = os.path.join(directory, 'ckan.jsonl')
+
+        modes = [('naive', naive), ('loader', load(None))]
+        if args.workers > 1:
+            modes.append(('loader {} workers'.format(args.workers),
+                          load(None, args.workers)))
+        modes += [('loader .tar.gz', load(tarpath)),
+                  ('loader .zip', load(zippath))]
+        print('{} descriptors'.format(args.descriptors))
+        print('{:<20} {:>10} {:>14}'.format('mode', 'seconds', 'files/s'))
+        for name, func in modes:
+            start = time.perf_counter()
+            func(root, outpath)
+            elapsed = time.perf_counter() - start
+            print('{:<20} {:>10.2f} {:>14.0f}'.format(
+                name, elapsed, args.descriptors / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+# coding=utf-8
+'''Per record conversion time of the fixture packages and resources.
+
+Usage: python benchmarks/bench_mapping.py
+'''
+import json
+import os
+import timeit
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'tests', 'fixtures')
+
+
+def load(name):
+    return json.load(open(os.path.join(FIXTURES, name)))
+
+
+def bench(label, func, arg, number=20000):
+    best = min(timeit.repeat(lambda: func(arg), number=number, repeat=5))
+    print('{:<40} {:>10.2f} us'.format(label, best / number * 1e6))
+
+
+def main():
+    ckan_resource = load('ckan_resource.json')
+    ckan_package = load('full_ckan_package.json')
+    fd_resource = load('frictionless_resource.json')
+    fd_package = ckan_to_frictionless.dataset(ckan_package)
+
+    bench('ckan_to_frictionless.resource', ckan_to_frictionless.resource,
+          ckan_resource)
+    bench('ckan_to_frictionless.dataset', ckan_to_frictionless.dataset,
+          ckan_package)
+    bench('frictionless_to_ckan.resource', frictionless_to_ckan.resource,
+          fd_resource)
+    bench('frictionless_to_ckan.package', frictionless_to_ckan.package,
+          fd_package)
+
+
+if __name__ == '__main__':
+    main()
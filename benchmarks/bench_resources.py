@@ -0,0 +1,51 @@
+# coding=utf-8
+'''Scaling of `ckan_to_frictionless.dataset` with the number of resources.
+
+Usage: python benchmarks/bench_resources.py
+
+Converts packages with growing numbers of resources, with unique names, with
+every name used twice and without names. The time per resource should stay
+flat as the package grows.
+'''
+import time
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+
+
+def package(num, names):
+    resources = []
+    for i in range(num):
+        res = {
+            'id': 'res-{}'.format(i),
+            'url': 'http://example.com/{}.csv'.format(i),
+            'format': 'CSV',
+            'size': 1000 + i,
+            'position': i,
+            'state': 'active',
+        }
+        if names == 'unique':
+            res['name'] = 'resource-{}'.format(i)
+        elif names == 'duplicated':
+            res['name'] = 'resource-{}'.format(i // 2)
+        resources.append(res)
+    return {'name': 'big', 'license_id': 'cc-by', 'resources': resources}
+
+
+def main():
+    print('{:>10} {:>12} {:>12} {:>14}'.format(
+        'resources', 'names', 'ms', 'us/resource'))
+    for num in [1000, 10000, 50000, 200000]:
+        for names in ['unique', 'duplicated', 'missing']:
+            ckandict = package(num, names)
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                ckan_to_frictionless.dataset(ckandict)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            print('{:>10} {:>12} {:>12.1f} {:>14.2f}'.format(
+                num, names, best * 1e3, best / num * 1e6))
+
+
+if __name__ == '__main__':
+    main()
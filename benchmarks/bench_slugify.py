@@ -0,0 +1,71 @@
+# coding=utf-8
+'''Resource name slugification on a synthetic corpus.
+
+Usage: python benchmarks/bench_slugify.py [num_names] [unicode_ratio]
+
+The corpus mixes a small set of very common names with unique ASCII and
+unicode names. The uncached baseline is the original implementation:
+unidecode + lower + uncompiled re.sub on every name.
+'''
+import random
+import re
+import sys
+import time
+
+import unidecode
+
+from frictionless_ckan_mapper import slugify
+
+COMMON = [u'data', u'csv', u'download', u'Data', u'CSV file', u'metadata',
+          u'API', u'json', u'Download (XLSX)', u'README']
+UNICODE = [u'données', u'Übersicht', u'國內生產總值', u'статистика', u'café']
+
+
+def corpus(num, unicode_ratio, seed=1):
+    rnd = random.Random(seed)
+    names = []
+    for i in range(num):
+        draw = rnd.random()
+        if draw < unicode_ratio:
+            names.append(u'{} {}'.format(rnd.choice(UNICODE), i % 5000))
+        elif draw < 0.9:
+            names.append(rnd.choice(COMMON))
+        else:
+            names.append(u'resource {}'.format(i))
+    return names
+
+
+def uncached(name):
+    value = unidecode.unidecode(name)
+    value = value.lower()
+    value = value.strip()
+    value = re.sub(r'(\||[^\w|.|\|])+', '-', value)
+    if value == '':
+        value = 'unnamed-resource'
+    return value
+
+
+def bench(label, func, names):
+    start = time.perf_counter()
+    for name in names:
+        func(name)
+    elapsed = time.perf_counter() - start
+    print('{:<10} {:>10.0f} names/s'.format(label, len(names) / elapsed))
+
+
+def main():
+    num = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    unicode_ratio = float(sys.argv[2]) if len(sys.argv) > 2 else 0.1
+    names = corpus(num, unicode_ratio)
+
+    bench('uncached', uncached, names)
+    slugify.cache_clear()
+    bench('slugify', slugify.slugify, names)
+    info = slugify.cache_info()
+    print('cache: {} hits, {} misses, hit rate {:.1%}, {}/{} entries'.format(
+        info.hits, info.misses, info.hits / float(info.hits + info.misses),
+        info.currsize, info.maxsize))
+
+
+if __name__ == '__main__':
+    main()
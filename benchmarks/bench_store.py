@@ -0,0 +1,102 @@
+# coding=utf-8
+'''Lookup latency of a `store.CatalogStore` of converted packages.
+
+Usage: python benchmarks/bench_store.py [--packages 100000]
+
+Writes a JSONL dump of synthetic CKAN packages (3 resources each), stores
+their `ckan_to_frictionless.dataset` conversion and times random lookups in
+the store opened read only, against converting on demand: reading the dump
+until the package and converting it.
+'''
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, ckan_package  # noqa: E402
+
+from frictionless_ckan_mapper import ckan_to_frictionless  # noqa: E402
+from frictionless_ckan_mapper import store  # noqa: E402
+
+LOOKUPS = 10000
+SCANS = 5
+
+
+def scan(path, name):
+    with io.open(path) as infile:
+        for line in infile:
+            ckandict = json.loads(line)
+            if ckandict['name'] == name:
+                return ckan_to_frictionless.dataset(ckandict)
+
+
+def latencies(func, keys):
+    out = []
+    for key in keys:
+        start = time.perf_counter()
+        func(key)
+        out.append(time.perf_counter() - start)
+    out.sort()
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--packages', type=int, default=100000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        dump = os.path.join(directory, 'dump.jsonl')
+        ids, names = [], []
+        shape = Shape(resources=3)
+        with io.open(dump, 'w') as outfile:
+            for seed in range(args.packages):
+                ckandict = ckan_package(shape, seed)
+                ids.append(ckandict['id'])
+                names.append(ckandict['name'])
+                outfile.write(json.dumps(ckandict) + '\n')
+
+        path = os.path.join(directory, 'catalog.jsonl')
+        start = time.perf_counter()
+        with store.CatalogStore(
+                path, convert=ckan_to_frictionless.dataset) as catalog, \
+                io.open(dump) as infile:
+            for line in infile:
+                catalog.add(json.loads(line))
+        print('{} packages stored in {:.1f} s, {:.0f} MB'.format(
+            args.packages, time.perf_counter() - start,
+            os.path.getsize(path) / 1e6))
+
+        start = time.perf_counter()
+        catalog = store.CatalogStore(path, readonly=True)
+        print('opened in {:.0f} ms'.format(
+            (time.perf_counter() - start) * 1e3))
+
+        rand = random.Random(0)
+        print('{:<16} {:>10} {:>10} {:>10}'.format(
+            'lookup', 'p50 us', 'p99 us', 'max us'))
+        for label, func, keys in [
+                ('get by id', catalog.get, ids),
+                ('get by name', catalog.get, names),
+                ('raw by name', catalog.raw, names),
+                ('scan the dump', lambda key: scan(dump, key), names)]:
+            num = SCANS if label == 'scan the dump' else LOOKUPS
+            out = latencies(func, [rand.choice(keys) for _ in range(num)])
+            print('{:<16} {:>10.1f} {:>10.1f} {:>10.1f}'.format(
+                label, out[len(out) // 2] * 1e6,
+                out[int(len(out) * 0.99)] * 1e6, out[-1] * 1e6))
+        catalog.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
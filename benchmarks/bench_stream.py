@@ -0,0 +1,60 @@
+# coding=utf-8
+'''Peak memory of the streaming converter for growing dumps.
+
+Usage: python benchmarks/bench_stream.py
+
+Writes `package_search` style dumps of increasing size to a temporary
+directory and converts them with `stream.convert`. Peak traced memory should
+stay flat: it depends on the largest package, not on the number of packages.
+'''
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+from frictionless_ckan_mapper import stream
+
+
+def write_dump(path, num):
+    inpath = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                          'fixtures', 'full_ckan_package.json')
+    ckandict = json.load(open(inpath))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(u'{"help": "", "success": true, "result": {"count": %d, '
+                u'"results": [' % num)
+        for i in range(num):
+            ckandict['name'] = 'package-{}'.format(i)
+            if i:
+                f.write(u', ')
+            f.write(json.dumps(ckandict))
+        f.write(u']}}')
+
+
+def main():
+    tmpdir = tempfile.mkdtemp()
+    try:
+        print('{:>10} {:>12} {:>14} {:>12}'.format(
+            'packages', 'dump MB', 'peak MB', 'records/s'))
+        for num in [1000, 10000, 50000]:
+            path = os.path.join(tmpdir, 'dump.json')
+            write_dump(path, num)
+            size = os.path.getsize(path)
+            tracemalloc.start()
+            start = time.perf_counter()
+            with io.open(path, encoding='utf-8') as infile, \
+                    io.open(os.devnull, 'w') as outfile:
+                stream.convert(infile, outfile)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print('{:>10} {:>12.1f} {:>14.2f} {:>12.0f}'.format(
+                num, size / 1e6, peak / 1e6, num / elapsed))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# coding=utf-8
+'''Nightly conversion of a catalog: full conversion against `sync.sync`.
+
+Usage: python benchmarks/bench_sync.py
+
+Writes two JSONL dumps of synthetic CKAN packages where 1% of the packages
+changed (half modified, half replaced), then times:
+
+* converting the whole new dump (`stream.convert`)
+* `sync.sync` with the index built from the old dump
+* `sync.sync` with the index saved by the previous run
+'''
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from synthetic import Shape, ckan_package  # noqa: E402
+
+from frictionless_ckan_mapper import stream  # noqa: E402
+from frictionless_ckan_mapper import sync  # noqa: E402
+
+NUM = 20000
+CHANGED = 0.01
+SHAPE = Shape(resources=5, extras=5)
+
+
+def dumps(directory):
+    old_path = os.path.join(directory, 'old.jsonl')
+    new_path = os.path.join(directory, 'new.jsonl')
+    step = int(1 / CHANGED)
+    base = ckan_package(SHAPE)
+    with io.open(old_path, 'w') as old, io.open(new_path, 'w') as new:
+        for i in range(NUM):
+            package = dict(base, id='id-{}'.format(i),
+                           name='package-{}'.format(i))
+            old.write(json.dumps(package) + '\n')
+            if i % step == 0:
+                package = dict(package, title='Changed',
+                               metadata_modified='2030-01-01T00:00:00')
+            elif i % step == 1:
+                package = dict(package, id='new-{}'.format(i),
+                               name='new-package-{}'.format(i))
+            new.write(json.dumps(package) + '\n')
+    return old_path, new_path
+
+
+def full(old_path, new_path, index_path, outfile):
+    with io.open(new_path) as infile:
+        stream.convert(infile, outfile)
+
+
+def from_dump(old_path, new_path, index_path, outfile):
+    with io.open(old_path) as oldfile:
+        old_index = sync.build_index(stream.iter_packages(oldfile))
+    with io.open(new_path) as infile:
+        sync.sync(old_index, stream.iter_packages(infile), outfile)
+
+
+def from_index(old_path, new_path, index_path, outfile):
+    with io.open(index_path) as indexfile:
+        old_index = sync.read_index(indexfile)
+    with io.open(new_path) as infile:
+        sync.sync(old_index, stream.iter_packages(infile), outfile)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        old_path, new_path = dumps(directory)
+        index_path = os.path.join(directory, 'index.jsonl')
+        with io.open(old_path) as oldfile, \
+                io.open(index_path, 'w') as indexfile:
+            sync.write_index(sync.build_index(stream.iter_packages(oldfile)),
+                             indexfile)
+
+        print('{} packages, {:.0%} changed'.format(NUM, CHANGED * 2))
+        print('{:<24} {:>10} {:>12}'.format('method', 'seconds', 'converted'))
+        for label, run in [('full conversion', full),
+                           ('sync, old dump', from_dump),
+                           ('sync, saved index', from_index)]:
+            outfile = io.StringIO()
+            start = time.perf_counter()
+            run(old_path, new_path, index_path, outfile)
+            elapsed = time.perf_counter() - start
+            print('{:<24} {:>10.2f} {:>12}'.format(
+                label, elapsed, outfile.getvalue().count('\n')))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
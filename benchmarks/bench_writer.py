@@ -0,0 +1,88 @@
+# coding=utf-8
+'''Throughput of `writer.write` against a sequential `package_create` loop.
+
+Usage: python benchmarks/bench_writer.py
+
+Converts copies of the full CKAN package fixture back with
+`frictionless_to_ckan.package` and writes them to the stand-in portal of the
+tests, with some latency per request:
+
+* sequentially with urllib, one `package_create` POST per package and a new
+  connection each time (what our scripts did)
+* with `writer.write` at growing concurrency, to an empty portal (creates)
+  and to a portal already holding the packages (updates)
+'''
+import json
+import os
+import sys
+import time
+from urllib.request import Request, urlopen
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from frictionless_ckan_mapper import ckan_to_frictionless  # noqa: E402
+from frictionless_ckan_mapper import client  # noqa: E402
+from frictionless_ckan_mapper import frictionless_to_ckan  # noqa: E402
+from frictionless_ckan_mapper import writer  # noqa: E402
+from tests.fake_ckan import FakeCKAN  # noqa: E402
+
+NUM = 1000
+LATENCY = 0.01
+
+
+def packages():
+    inpath = os.path.join(os.path.dirname(__file__), '..', 'tests',
+                          'fixtures', 'full_ckan_package.json')
+    fddict = ckan_to_frictionless.dataset(json.load(open(inpath)))
+    del fddict['id']
+    out = []
+    for i in range(NUM):
+        fddict['name'] = 'package-{}'.format(i)
+        out.append(frictionless_to_ckan.package(fddict))
+    return out
+
+
+def sequential(url, ckandicts):
+    for ckandict in ckandicts:
+        request = Request(url + '/api/3/action/package_create',
+                          json.dumps(ckandict).encode('utf-8'),
+                          {'Content-Type': 'application/json'})
+        with urlopen(request) as response:
+            json.loads(response.read().decode('utf-8'))
+
+
+def concurrent(concurrency):
+    def run(url, ckandicts):
+        report = client.run(writer.write(url, ckandicts,
+                                         concurrency=concurrency))
+        assert report.failed == 0
+    return run
+
+
+def main():
+    ckandicts = packages()
+    runs = [('sequential package_create', sequential, False)]
+    for existing in [False, True]:
+        for concurrency in [1, 4, 16]:
+            runs.append(('write {}, concurrency {}'.format(
+                'updates' if existing else 'creates', concurrency),
+                concurrent(concurrency), existing))
+
+    print('{} packages, {:.0f} ms latency per request'.format(
+        NUM, LATENCY * 1000))
+    print('{:<32} {:>10} {:>12} {:>12} {:>10}'.format(
+        'method', 'seconds', 'packages/s', 'connections', 'requests'))
+    for label, run, existing in runs:
+        with FakeCKAN(ckandicts if existing else [],
+                      latency=LATENCY) as portal:
+            start = time.perf_counter()
+            run(portal.url, ckandicts)
+            elapsed = time.perf_counter() - start
+        assert len(portal.packages) == NUM
+        print('{:<32} {:>10.2f} {:>12.0f} {:>12} {:>10}'.format(
+            label, elapsed, NUM / elapsed, portal.stats['connections'],
+            portal.stats['requests']))
+
+
+if __name__ == '__main__':
+    main()
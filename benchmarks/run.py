@@ -0,0 +1,191 @@
+# coding=utf-8
+'''Benchmark suite of the converters on synthetic packages.
+
+Usage: python benchmarks/run.py [--filter TEXT] [--compare RESULTS]
+
+Times every converter (`ckan_to_frictionless.resource` / `dataset`,
+`frictionless_to_ckan.resource` / `package` and the round trip) on
+synthetic packages of various shapes, see `synthetic.py`. Results are saved
+as JSON in `.benchmarks/` (or `--output`) with the commit, version and
+Python they were measured with, and compared with the previous results (or
+`--compare`): timings more than `--threshold` slower are flagged, and the
+exit status is 1 if any benchmark regressed.
+'''
+import argparse
+import datetime
+import glob
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import timeit
+
+import synthetic
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import slugify
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name: package shape
+SHAPES = {
+    'small': synthetic.Shape(resources=1, extras=2),
+    'resources-100': synthetic.Shape(resources=100),
+    'resources-2000': synthetic.Shape(resources=2000),
+    'extras-200': synthetic.Shape(extras=200),
+    'json-extra-100k': synthetic.Shape(json_extra_size=100000),
+    'unicode-50%': synthetic.Shape(resources=100, unicode_ratio=0.5),
+    'duplicates-50%': synthetic.Shape(resources=100, duplicate_ratio=0.5),
+}
+
+
+def roundtrip(ckandict):
+    return frictionless_to_ckan.package(ckan_to_frictionless.dataset(ckandict))
+
+
+# name: (function, input) where input is 'ckan' or 'frictionless' for a
+# package and 'ckan-resource' or 'frictionless-resource' for its first
+# resource
+TARGETS = {
+    'ckan_to_frictionless.resource': (ckan_to_frictionless.resource,
+                                      'ckan-resource'),
+    'ckan_to_frictionless.dataset': (ckan_to_frictionless.dataset, 'ckan'),
+    'frictionless_to_ckan.resource': (frictionless_to_ckan.resource,
+                                      'frictionless-resource'),
+    'frictionless_to_ckan.package': (frictionless_to_ckan.package,
+                                     'frictionless'),
+    'roundtrip': (roundtrip, 'ckan'),
+}
+
+
+def _inputs(shape):
+    ckandict = synthetic.ckan_package(shape)
+    fddict = ckan_to_frictionless.dataset(ckandict)
+    return {
+        'ckan': ckandict,
+        'ckan-resource': ckandict['resources'][0] if shape.resources else {},
+        'frictionless': fddict,
+        'frictionless-resource': (fddict['resources'][0]
+                                  if shape.resources else {}),
+    }
+
+
+def _time(func, arg, cold_slugs, repeat):
+    '''Return the per call timings in us of `repeat` runs of `func(arg)`.'''
+    if cold_slugs:
+        # transliterating names is what is measured, not the slug cache
+        def call():
+            slugify.cache_clear()
+            func(arg)
+    else:
+        def call():
+            func(arg)
+    timer = timeit.Timer(call)
+    number, _ = timer.autorange()
+    return [t / number * 1e6 for t in timer.repeat(repeat, number)]
+
+
+def run(pattern=None, repeat=5):
+    results = {}
+    for shape_name, shape in sorted(SHAPES.items()):
+        inputs = _inputs(shape)
+        for target, (func, input_name) in sorted(TARGETS.items()):
+            name = '{}[{}]'.format(target, shape_name)
+            if pattern and pattern not in name:
+                continue
+            timings = _time(func, inputs[input_name],
+                            shape.unicode_ratio > 0, repeat)
+            results[name] = {'min_us': min(timings),
+                             'median_us': sorted(timings)[len(timings) // 2]}
+            print('{:<60} {:>12.1f} us'.format(name, min(timings)))
+            sys.stdout.flush()
+    return results
+
+
+def _commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save(results, directory):
+    with io.open(os.path.join(ROOT, 'frictionless_ckan_mapper',
+                              'VERSION')) as f:
+        version = f.read().strip()
+    now = datetime.datetime.now()
+    commit = _commit()
+    data = {
+        'date': now.isoformat(),
+        'commit': commit,
+        'version': version,
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': results,
+    }
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    path = os.path.join(directory, '{}-{}.json'.format(
+        now.strftime('%Y%m%d-%H%M%S'), commit or version))
+    with io.open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(data, indent=2, sort_keys=True))
+    return path
+
+
+def previous(directory):
+    paths = sorted(glob.glob(os.path.join(directory, '*.json')))
+    return paths[-1] if paths else None
+
+
+def compare(results, path, threshold):
+    '''Print the change of each benchmark since the results in `path` and
+    return the names of the ones more than `threshold` slower.'''
+    with io.open(path, encoding='utf-8') as f:
+        old = json.load(f)
+    print('\nCompared with {} (commit {}, version {}):'.format(
+        os.path.basename(path), old.get('commit'), old.get('version')))
+    regressions = []
+    for name, result in sorted(results.items()):
+        if name not in old['results']:
+            continue
+        ratio = result['min_us'] / old['results'][name]['min_us']
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = 'SLOWER'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = 'faster'
+        print('{:<60} {:>7.2f}x {}'.format(name, ratio, flag))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--filter', help='Only run the benchmarks whose name '
+                                         'contains this text')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', default=os.path.join(ROOT, '.benchmarks'),
+                        help='Directory to save the results in')
+    parser.add_argument('--compare', help='Results to compare with (default: '
+                                          'the latest saved results)')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='Relative slowdown flagged as a regression '
+                             '(default: 0.1)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args(argv)
+
+    baseline = args.compare or previous(args.output)
+    results = run(args.filter, args.repeat)
+    if not args.no_save:
+        print('\nSaved results to {}'.format(save(results, args.output)))
+    if baseline and compare(results, baseline, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
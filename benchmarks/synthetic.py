@@ -0,0 +1,132 @@
+# coding=utf-8
+'''Synthetic CKAN and Frictionless packages of a configurable shape.
+
+    from synthetic import Shape, ckan_package, frictionless_package
+
+    shape = Shape(resources=100, extras=20, json_extra_size=10000,
+                  unicode_ratio=0.2, duplicate_ratio=0.1)
+    ckandict = ckan_package(shape)
+
+Packages look like what CKAN's `package_show` returns. They are generated
+from a seeded random generator, so a shape always gives the same package.
+'''
+import collections
+import json
+import random
+import uuid
+
+Shape = collections.namedtuple('Shape', [
+    'resources',        # number of resources
+    'extras',           # number of (plain string) extras
+    'json_extra_size',  # approximate size of a JSON extra, 0 for none
+    'unicode_ratio',    # fraction of resources with a non ASCII name
+    'duplicate_ratio',  # fraction of resources reusing an earlier name
+])
+Shape.__new__.__defaults__ = (1, 5, 0, 0.0, 0.0)
+
+UNICODE_WORDS = [u'données', u'статистика', u'国内生产总值', u'Größe',
+                 u'población', u'εθνικό', u'İstanbul', u'東京都']
+WORDS = ['population', 'budget', 'water', 'roads', 'schools', 'health',
+         'census', 'transport', 'energy', 'trees']
+
+
+def _uuid(rand):
+    return str(uuid.UUID(int=rand.getrandbits(128), version=4))
+
+
+def _name(rand, shape, names):
+    if names and rand.random() < shape.duplicate_ratio:
+        return rand.choice(names)
+    words = UNICODE_WORDS if rand.random() < shape.unicode_ratio else WORDS
+    return u'{} {} {}.csv'.format(rand.choice(words).title(),
+                                  rand.choice(WORDS), len(names))
+
+
+def _json_extra(rand, size):
+    # a GeoJSON polygon, the usual big JSON extra (`spatial`)
+    points = [[round(rand.uniform(-180, 180), 6),
+               round(rand.uniform(-90, 90), 6)]
+              for _ in range(max(1, size // 25))]
+    return json.dumps({'type': 'Polygon', 'coordinates': [points]})
+
+
+def _resource(rand, package_id, position, name):
+    resource_id = _uuid(rand)
+    return {
+        'cache_last_updated': None,
+        'cache_url': None,
+        'created': '2020-06-25T14:33:49.587300',
+        'datastore_active': rand.random() < 0.5,
+        'description': 'Resource {} of the package'.format(position),
+        'format': 'CSV',
+        'hash': '',
+        'id': resource_id,
+        'last_modified': '2020-06-25T14:33:49.567891',
+        'mimetype': 'text/csv',
+        'mimetype_inner': None,
+        'name': name,
+        'package_id': package_id,
+        'position': position,
+        'resource_type': None,
+        'size': rand.randint(10, 10 ** 9),
+        'state': 'active',
+        'url': 'http://ckan.example.com/dataset/{}/resource/{}/download/'
+               'data.csv'.format(package_id, resource_id),
+        'url_type': 'upload',
+    }
+
+
+def ckan_package(shape=Shape(), seed=0):
+    '''Return a CKAN package of the given `shape`.'''
+    rand = random.Random(seed)
+    package_id = _uuid(rand)
+    names = []
+    resources = []
+    for position in range(shape.resources):
+        name = _name(rand, shape, names)
+        names.append(name)
+        resources.append(_resource(rand, package_id, position, name))
+    extras = [{'key': 'extra_{}'.format(i),
+               'value': ' '.join(rand.choice(WORDS) for _ in range(5))}
+              for i in range(shape.extras)]
+    if shape.json_extra_size:
+        extras.append({'key': 'spatial',
+                       'value': _json_extra(rand, shape.json_extra_size)})
+    return {
+        'author': 'Author Name',
+        'author_email': 'author@example.com',
+        'creator_user_id': _uuid(rand),
+        'extras': extras,
+        'groups': [],
+        'id': package_id,
+        'isopen': True,
+        'license_id': 'cc-by',
+        'license_title': 'Creative Commons Attribution',
+        'license_url': 'http://www.opendefinition.org/licenses/cc-by',
+        'maintainer': 'Maintainer Name',
+        'maintainer_email': None,
+        'metadata_created': '2020-06-25T14:33:18.301040',
+        'metadata_modified': '2020-06-25T14:50:34.860070',
+        'name': 'package-{}'.format(seed),
+        'notes': 'A synthetic package',
+        'num_resources': shape.resources,
+        'num_tags': 2,
+        'organization': {'id': _uuid(rand), 'name': 'org',
+                         'title': 'Organization', 'type': 'organization'},
+        'owner_org': _uuid(rand),
+        'private': False,
+        'resources': resources,
+        'state': 'active',
+        'tags': [{'name': rand.choice(WORDS)} for _ in range(2)],
+        'title': 'Synthetic package {}'.format(seed),
+        'type': 'dataset',
+        'url': 'http://example.com',
+        'version': '1.0',
+    }
+
+
+def frictionless_package(shape=Shape(), seed=0):
+    '''Return a Frictionless package of the given `shape`, the conversion of
+    `ckan_package(shape, seed)`.'''
+    from frictionless_ckan_mapper import ckan_to_frictionless
+    return ckan_to_frictionless.dataset(ckan_package(shape, seed))
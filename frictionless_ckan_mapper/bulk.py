@@ -0,0 +1,134 @@
+# coding=utf-8
+'''Error tolerant bulk conversion.
+
+A single malformed package should not abort the conversion of a catalog.
+`convert` runs a converter over many records and, instead of raising, writes
+every record it fails on to a quarantine JSONL file together with the error
+and its traceback, then carries on:
+
+    report = bulk.Report()
+    with io.open('quarantine.jsonl', 'w') as quarantine:
+        for fdpackage in bulk.convert(ckandicts, quarantine=quarantine,
+                                      report=report):
+            ...
+    print(report)
+
+Each quarantine line is a JSON object with the `index` of the record in the
+input, its `id` and `name` if any, the `error`, the `traceback` and the input
+`record` itself, so failed records can be fixed and converted again.
+'''
+import json
+import time
+import traceback
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import parallel
+
+
+class Report(object):
+    '''Counts and timing of a bulk conversion.'''
+
+    def __init__(self):
+        self.converted = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def total(self):
+        return self.converted + self.failed
+
+    @property
+    def seconds(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def records_per_second(self):
+        return self.total / self.seconds if self.seconds else 0.0
+
+    @property
+    def failure_rate(self):
+        return self.failed / float(self.total) if self.total else 0.0
+
+    def as_dict(self):
+        return {
+            'converted': self.converted,
+            'failed': self.failed,
+            'seconds': self.seconds,
+            'records_per_second': self.records_per_second,
+            'failure_rate': self.failure_rate,
+        }
+
+    def __str__(self):
+        return ('Converted {} records, {} failed ({:.2%}) in {:.1f}s '
+                '({:.0f} records/s)'.format(
+                    self.converted, self.failed, self.failure_rate,
+                    self.seconds, self.records_per_second))
+
+
+class _Tolerant(object):
+    '''Picklable wrapper of `func` returning failures instead of raising.'''
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, item):
+        index, record = item
+        try:
+            return index, True, self.func(record)
+        except Exception as error:
+            return index, False, {
+                'error': '{}: {}'.format(type(error).__name__, error),
+                'traceback': traceback.format_exc(),
+            }
+
+
+def _quarantine_line(index, record, failure):
+    line = {'index': index}
+    if isinstance(record, dict):
+        line['id'] = record.get('id')
+        line['name'] = record.get('name')
+    line.update(failure)
+    line['record'] = record
+    # the record may hold values JSON can't encode, e.g. a broken Python
+    # input, keep their repr rather than losing the line
+    return json.dumps(line, default=repr) + '\n'
+
+
+def convert(records, func=ckan_to_frictionless.dataset, quarantine=None,
+            report=None, workers=1, chunksize=64, ordered=True):
+    '''Convert `records` with `func`, skipping the records it fails on.
+
+    * Failed records are written to the `quarantine` file object, if any.
+    * `report` (a `Report`) is updated as records are converted, and marked
+      finished when the generator is exhausted.
+    * `workers`, `chunksize` and `ordered` are passed to
+      `parallel.map_records`; `func` must be picklable with `workers` > 1.
+
+    Returns a generator of the converted records. Only exceptions are caught:
+    KeyboardInterrupt and friends still stop the conversion.
+    '''
+    if report is None:
+        report = Report()
+    pending = {}
+
+    def numbered():
+        # keep the inputs until their result is in, to quarantine them
+        for index, record in enumerate(records):
+            if quarantine is not None:
+                pending[index] = record
+            yield index, record
+
+    results = parallel.map_records(_Tolerant(func), numbered(),
+                                   workers=workers, chunksize=chunksize,
+                                   ordered=ordered)
+    for index, ok, value in results:
+        record = pending.pop(index, None)
+        if ok:
+            report.converted += 1
+            yield value
+        else:
+            report.failed += 1
+            if quarantine is not None:
+                quarantine.write(_quarantine_line(index, record, value))
+    report.finished = time.time()
@@ -0,0 +1,340 @@
+# coding=utf-8
+'''Persistent cache of conversions for incremental catalog conversion.
+
+Most packages of a catalog do not change between two runs. A
+`ConversionCache` sits in front of `ckan_to_frictionless.dataset` and
+`frictionless_to_ckan.package` and returns the stored conversion of a package
+when it has not changed:
+
+    cache = ConversionCache(SQLiteStore('conversions.sqlite', max_bytes=1e9))
+    fdpackage = cache.dataset(ckanpackage)
+    print(cache.stats())
+
+A package is identified by its `id` and `metadata_modified`, or by a hash of
+its canonical JSON when it has no `id` or `metadata_modified`. Cached entries
+are namespaced by converter and library version so an upgrade never serves
+stale conversions.
+
+Two stores are available, a single SQLite file (`SQLiteStore`) and a
+directory of JSON files (`DirectoryStore`). Both evict the least recently
+used entries once `max_bytes` is exceeded. Stores are not safe to share
+between processes writing at the same time.
+'''
+import hashlib
+import io
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import compact
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+with io.open(os.path.join(os.path.dirname(__file__), 'VERSION')) as f:
+    VERSION = f.read().strip()
+
+# Stores evict down to this fraction of `max_bytes` so that eviction does not
+# run again on every insert.
+EVICTION_TARGET = 0.9
+
+# Number of cache hits whose access time SQLiteStore keeps in memory before
+# writing them in one transaction
+TOUCH_BATCH = 256
+
+
+def cache_key(indict):
+    '''Return the (package id, cache key) of a package.
+
+    The key is built from `id` and `metadata_modified` if both are present,
+    else from a hash of the canonical JSON of the package.
+    '''
+    package_id = indict.get('id')
+    modified = indict.get('metadata_modified')
+    if package_id and modified:
+        return package_id, u'{}@{}'.format(package_id, modified)
+    content = json.dumps(indict, sort_keys=True, separators=(',', ':'))
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+    return package_id, u'sha256:' + digest
+
+
+def _namespace(func):
+    return u'{}.{}@{}'.format(func.__module__, func.__name__, VERSION)
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode('utf-8')).hexdigest()
+
+
+class SQLiteStore(object):
+    '''Store cached conversions in a single SQLite file.
+
+    The access times of cache hits are kept in memory and written
+    `TOUCH_BATCH` at a time, before an eviction and on `close`, rather than
+    with an UPDATE per hit.
+    '''
+
+    def __init__(self, path, max_bytes=None):
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')
+        self.db.execute(
+            'CREATE TABLE IF NOT EXISTS conversions ('
+            ' namespace TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' package_id TEXT,'
+            ' value TEXT NOT NULL,'
+            ' size INTEGER NOT NULL,'
+            ' accessed INTEGER NOT NULL,'
+            ' PRIMARY KEY (namespace, key))')
+        self.db.execute('CREATE INDEX IF NOT EXISTS conversions_package_id '
+                        'ON conversions (package_id)')
+        self.db.execute('CREATE INDEX IF NOT EXISTS conversions_accessed '
+                        'ON conversions (accessed)')
+        self.size, self.clock = self.db.execute(
+            'SELECT COALESCE(SUM(size), 0), COALESCE(MAX(accessed), 0) '
+            'FROM conversions').fetchone()
+        # (namespace, key): access time of the hits not written yet
+        self.touched = {}
+
+    def _tick(self):
+        self.clock += 1
+        return self.clock
+
+    def get(self, namespace, key, package_id):
+        row = self.db.execute(
+            'SELECT value FROM conversions WHERE namespace = ? AND key = ?',
+            (namespace, key)).fetchone()
+        if row is None:
+            return None
+        self.touched[namespace, key] = self._tick()
+        if len(self.touched) >= TOUCH_BATCH:
+            self.flush()
+        return row[0]
+
+    def flush(self):
+        '''Write the access times of the hits since the last flush.'''
+        if not self.touched:
+            return
+        with self.db:
+            self.db.execute('BEGIN')
+            self.db.executemany(
+                'UPDATE conversions SET accessed = ? '
+                'WHERE namespace = ? AND key = ?',
+                [(accessed, namespace, key) for (namespace, key), accessed
+                 in self.touched.items()])
+        self.touched.clear()
+
+    def put(self, namespace, key, package_id, value):
+        self.touched.pop((namespace, key), None)
+        with self.db:
+            self.db.execute('BEGIN')
+            # older conversions of the same package will never be used again
+            if package_id:
+                self._delete('namespace = ? AND package_id = ?',
+                             (namespace, package_id))
+            self._delete('namespace = ? AND key = ?', (namespace, key))
+            self.db.execute(
+                'INSERT INTO conversions VALUES (?, ?, ?, ?, ?, ?)',
+                (namespace, key, package_id, value, len(value),
+                 self._tick()))
+            self.size += len(value)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICTION_TARGET))
+
+    def _delete(self, where, params):
+        freed = self.db.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM conversions WHERE ' + where,
+            params).fetchone()[0]
+        self.db.execute('DELETE FROM conversions WHERE ' + where, params)
+        self.size -= freed
+
+    def evict(self, target):
+        '''Delete least recently used entries until the store holds at most
+        `target` bytes.'''
+        if self.size <= target:
+            return
+        self.flush()
+        to_free = self.size - target
+        cutoff = None
+        freed = 0
+        for accessed, size in self.db.execute(
+                'SELECT accessed, size FROM conversions ORDER BY accessed'):
+            freed += size
+            cutoff = accessed
+            if freed >= to_free:
+                break
+        with self.db:
+            self.db.execute('BEGIN')
+            self._delete('accessed <= ?', (cutoff,))
+
+    def delete(self, package_id):
+        with self.db:
+            self.db.execute('BEGIN')
+            self._delete('package_id = ?', (package_id,))
+
+    def clear(self):
+        with self.db:
+            self.db.execute('BEGIN')
+            self._delete('1', ())
+
+    def __len__(self):
+        return self.db.execute(
+            'SELECT COUNT(*) FROM conversions').fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+
+class DirectoryStore(object):
+    '''Store cached conversions as JSON files in a directory.
+
+    Layout: `<path>/<namespace hash>/<package id hash>/<key hash>.json`.
+    The modification time of a file records its last access.
+    '''
+
+    def __init__(self, path, max_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.size = sum(os.path.getsize(f) for f in self._files())
+
+    def _files(self):
+        for dirpath, _, filenames in os.walk(self.path):
+            for filename in filenames:
+                if filename.endswith('.json'):
+                    yield os.path.join(dirpath, filename)
+
+    def _package_dir(self, namespace, package_id):
+        # conversions without a package id all go in the same directory
+        return os.path.join(self.path, _hash(namespace),
+                            _hash(package_id) if package_id else '_')
+
+    def _file(self, namespace, key, package_id):
+        return os.path.join(self._package_dir(namespace, package_id),
+                            _hash(key) + '.json')
+
+    def get(self, namespace, key, package_id):
+        path = self._file(namespace, key, package_id)
+        try:
+            with io.open(path, encoding='utf-8') as f:
+                value = f.read()
+        except (IOError, OSError):
+            return None
+        os.utime(path, None)
+        return value
+
+    def put(self, namespace, key, package_id, value):
+        directory = self._package_dir(namespace, package_id)
+        if package_id:
+            # older conversions of the same package will never be used again
+            self._rmtree(directory)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        path = self._file(namespace, key, package_id)
+        if os.path.exists(path):
+            self.size -= os.path.getsize(path)
+        fd, tmppath = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with io.open(fd, 'w', encoding='utf-8') as f:
+            f.write(value)
+        os.rename(tmppath, path)
+        self.size += os.path.getsize(path)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICTION_TARGET))
+
+    def _rmtree(self, directory):
+        if os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                self.size -= os.path.getsize(os.path.join(directory, filename))
+            shutil.rmtree(directory)
+
+    def evict(self, target):
+        '''Delete least recently used entries until the store holds at most
+        `target` bytes.'''
+        if self.size <= target:
+            return
+        entries = sorted((os.path.getmtime(f), f) for f in self._files())
+        for _, path in entries:
+            if self.size <= target:
+                break
+            self.size -= os.path.getsize(path)
+            os.remove(path)
+
+    def delete(self, package_id):
+        package_dir = _hash(package_id)
+        for namespace_dir in os.listdir(self.path):
+            self._rmtree(os.path.join(self.path, namespace_dir, package_dir))
+
+    def clear(self):
+        for namespace_dir in os.listdir(self.path):
+            shutil.rmtree(os.path.join(self.path, namespace_dir))
+        self.size = 0
+
+    def __len__(self):
+        return sum(1 for _ in self._files())
+
+    def close(self):
+        pass
+
+
+class ConversionCache(object):
+    '''Cache conversions in a store and keep hit / miss statistics.'''
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def convert(self, func, indict):
+        '''Return `func(indict)`, from the store if it has not changed.'''
+        namespace = _namespace(func)
+        package_id, key = cache_key(indict)
+        value = self.store.get(namespace, key, package_id)
+        if value is not None:
+            self.hits += 1
+            self.bytes_saved += len(value)
+            return json.loads(value)
+        self.misses += 1
+        outdict = func(indict)
+        self.store.put(namespace, key, package_id,
+                       json.dumps(outdict, default=compact.default))
+        return outdict
+
+    def dataset(self, ckandict):
+        '''Cached `ckan_to_frictionless.dataset`.'''
+        return self.convert(ckan_to_frictionless.dataset, ckandict)
+
+    def package(self, fddict):
+        '''Cached `frictionless_to_ckan.package`.'''
+        return self.convert(frictionless_to_ckan.package, fddict)
+
+    def invalidate(self, package_id=None):
+        '''Drop the cached conversions of a package, or of all packages.'''
+        if package_id is None:
+            self.store.clear()
+        else:
+            self.store.delete(package_id)
+
+    def stats(self):
+        '''Return the cache statistics as a dict.
+
+        `bytes_saved` is the size of the conversions served from the store
+        instead of being computed again.
+        '''
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / float(lookups) if lookups else 0.0,
+            'bytes_saved': self.bytes_saved,
+            'entries': len(self.store),
+            'size': self.store.size,
+        }
+
+    def close(self):
+        self.store.close()
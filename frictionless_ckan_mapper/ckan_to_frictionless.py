@@ -1,14 +1,20 @@
 # coding=utf-8
-import six
+import functools
 import json
-import re
-import unidecode
-from collections import defaultdict
 
-try:
-    json_parse_exception = json.decoder.JSONDecodeError
-except AttributeError:  # Testing against Python 2
-    json_parse_exception = ValueError
+from frictionless_ckan_mapper import datastore
+from frictionless_ckan_mapper import instrument
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import mapping
+from frictionless_ckan_mapper import metrics
+from frictionless_ckan_mapper import parallel
+from frictionless_ckan_mapper import slugify
+# not the modules: `lazy` and `compact` are arguments of the converters
+from frictionless_ckan_mapper.compact import package as compact_package
+from frictionless_ckan_mapper.compact import resource as compact_resource
+from frictionless_ckan_mapper.lazy import Deferred, LazyDict
+
+json_parse_exception = json.decoder.JSONDecodeError
 
 
 resource_mapping = {
@@ -24,7 +30,139 @@ resource_keys_to_remove = [
 ]
 
 
-def resource(ckandict):
+def _slugify_name(value, stored):
+    if instrument.recorder is None:
+        return slugify.slugify(value)
+    watch = instrument.stopwatch()
+    value = slugify.slugify(value)
+    watch.lap('resource.slugify')
+    return value
+
+
+def _int_size(value, stored):
+    if stored:
+        return int(stored)
+    return stored
+
+
+def _lower_type(value, stored):
+    # 'type' must be lower case
+    return value.lower()
+
+
+# Special formatting of key fields: handler(value, stored) where `value` is the
+# stripped (or unjsonified) value and `stored` the value kept in the resource.
+_resource_value_handlers = {
+    'name': _slugify_name,
+    'size': _int_size,
+    'type': _lower_type,
+}
+_resource_value_handler_items = tuple(_resource_value_handlers.items())
+
+# Only strings starting with one of these can change when unjsonified: the
+# value is stripped before looking for a [ or {.
+_unjsonify_first_chars = frozenset(
+    u'{[\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680\u2000\u2001\u2002'
+    u'\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a\u2028\u2029\u202f'
+    u'\u205f\u3000')
+
+
+def _unjsonify(value):
+    '''Return `value` json loaded if it is a jsonified array or dict, else
+    return it as is. Also returns the stripped value.'''
+    stripped = value.strip()
+    if stripped.startswith('{') or stripped.startswith('['):
+        try:
+            stripped = json_backend.loads(stripped)
+            return stripped, stripped
+        except (json_parse_exception, TypeError):
+            metrics.incr('resource.value_not_json')
+    return value, stripped
+
+
+def _unjsonified(value):
+    return _unjsonify(value)[0]
+
+
+def _resource_values(resource):
+    '''Unjsonify and format the values of a CKAN resource in place.'''
+    # unjsonify values
+    # * check if string
+    # * if starts with [ or { => json.loads it ...
+    # HACK: bit of a hacky way to check if value is a jsonified array or
+    # dict
+    # * else do nothing
+    for key, value in resource.items():
+        if (isinstance(value, str) and
+                value[:1] in _unjsonify_first_chars and
+                key not in _resource_value_handlers):
+            resource[key] = _unjsonify(value)[0]
+
+    for key, handler in _resource_value_handler_items:
+        value = resource.get(key)
+        if isinstance(value, str):
+            stored, value = _unjsonify(value)
+            resource[key] = handler(value, stored)
+
+
+def _lazy_resource_values(resource):
+    '''Same as `_resource_values` but leaves the values to unjsonify to a
+    `lazy.LazyDict`.'''
+    for key, value in dict.items(resource):
+        if (isinstance(value, str) and
+                value[:1] in _unjsonify_first_chars and
+                key not in _resource_value_handlers and
+                value.lstrip()[:1] in ('{', '[')):
+            resource[key] = Deferred(_unjsonified, value)
+
+    for key, handler in _resource_value_handler_items:
+        value = resource.get(key)
+        if isinstance(value, str):
+            stored, value = _unjsonify(value)
+            resource[key] = handler(value, stored)
+
+
+def compile_resource(extra_mapping=None, lazy_values=False):
+    '''Return a CKAN to Frictionless resource converter.
+
+    The resource tables are compiled once, together with the user supplied
+    `extra_mapping` ({ckan key: frictionless key}) if any, into a function
+    with the same signature as `resource`. With `lazy_values` it returns a
+    `lazy.LazyDict`, see `resource`.
+    '''
+    return mapping.compile_mapping(
+        resource_mapping, resource_keys_to_remove,
+        extra_mapping=extra_mapping,
+        transform=_lazy_resource_values if lazy_values else _resource_values,
+        drop_none=True, factory=LazyDict if lazy_values else dict)
+
+
+_resource = compile_resource()
+_lazy_resource = compile_resource(lazy_values=True)
+
+# Converters compiled for user supplied extra mappings, kept by the items of
+# the mapping
+COMPILED_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compiled_resource(extra_items, lazy_values):
+    return compile_resource(dict(extra_items), lazy_values)
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compiled_dataset_keys(extra_items):
+    return mapping.compile_mapping({}, extra_mapping=dict(extra_items))
+
+
+def _check_modes(inplace, lazy_values, compact_values=False):
+    if lazy_values and (inplace or compact_values):
+        raise ValueError('lazy can be combined with neither inplace nor '
+                         'compact: a lazy conversion returns a new LazyDict')
+
+
+def resource(ckandict, inplace=False, lazy=False, compact=False,
+             datastore_fields=None, extra_mapping=None):
     '''Convert a CKAN resource to Frictionless Resource.
 
     1. Remove unneeded keys
@@ -36,58 +174,107 @@ def resource(ckandict):
     3. Map keys from CKAN to Frictionless (and reformat if needed)
     4. Remove keys with null values (CKAN has a lot of null valued keys)
     5. Apply special formatting (if any) for key fields e.g. slugiify
-    '''
-    # TODO: delete keys last as may be needed for something in processing
-    resource = dict(ckandict)
-    for key in resource_keys_to_remove:
-        if key in resource:
-            del resource[key]
 
-    # unjsonify values
-    # * check if string
-    # * if starts with [ or { => json.loads it ...
-    # HACK: bit of a hacky way to check if value is a jsonified array or
-    # dict
-    # * else do nothing
-    for key, value in resource.items():
-        if isinstance(value, six.text_type) or isinstance(value, six.string_types):
-            value = value.strip()
-            if value.startswith('{') or value.startswith('['):
-                try:
-                    value = json.loads(value)
-                    resource[key] = value
-                except (json_parse_exception, TypeError):
-                    pass
-
-            if key == 'name':
-                if isinstance(value, six.text_type):
-                    value = unidecode.unidecode(value)
-                value = value.lower()
-                value = value.strip()
-                value = re.sub('(\||[^\w|.|\|])+', '-', value)
-                if value == '':
-                    value = 'unnamed-resource'
-                resource[key] = value
-
-            if key == 'size':
-                if resource[key]:    
-                    resource[key] = int(resource[key])
-
-            # 'type' must be lower case 
-            if key == 'type':
-                resource[key] = value.lower()
-
-    # Remap differences from CKAN to Frictionless resource
-    for key, value in resource_mapping.items():
-        if key in resource:
-            resource[value] = resource[key] 
-            del resource[key]
-
-    for key in list(resource.keys()):
-        if resource[key] is None:
-            del resource[key]
-
-    return resource
+    The tables are compiled into a converter once, see `compile_resource`.
+
+    With `inplace=True` `ckandict` itself is converted and returned instead of
+    a copy.
+
+    With `lazy=True` the values to JSON load are only decoded when read, see
+    `lazy.LazyDict`. Raises ValueError with `inplace=True` too.
+
+    With `compact=True` a `compact.ResourceRecord` is returned, see
+    `compact`.
+
+    `datastore_fields`, the DataStore fields of the resource (see
+    `datastore.fetch`), become its `schema` unless it has one already.
+
+    `extra_mapping` ({ckan key: frictionless key}) maps additional keys, see
+    `compile_resource`. The converter is compiled once per mapping.
+    '''
+    if lazy:
+        _check_modes(inplace, lazy, compact)
+    if extra_mapping:
+        convert = _compiled_resource(tuple(extra_mapping.items()), bool(lazy))
+    else:
+        convert = _lazy_resource if lazy else _resource
+    res = convert(ckandict, inplace)
+    if datastore_fields is not None and 'schema' not in res:
+        res['schema'] = datastore.schema(datastore_fields)
+    if compact:
+        return compact_resource(res)
+    return res
+
+
+def resources(ckandicts, inplace=False, lazy=False, compact=False,
+              datastore_fields_by_id=None, extra_mapping=None):
+    '''Convert CKAN resources and give them unique names.
+
+    Returns a generator converting the resources of `ckandicts` (any
+    iterable) with `resource` one at a time:
+
+    * resources without a name are named 'unnamed-resource'
+    * resources named 'unnamed-resource' are numbered, 'unnamed-resource-1',
+      'unnamed-resource-2'...
+    * resources with the same name are numbered too, e.g. 'data-1', 'data-2',
+      and the name is kept in 'original_name' (see
+      https://specs.frictionlessdata.io/data-resource/#name)
+
+    This all happens in a single pass, but the first resource with a given
+    name is only renamed when a second one shows up: names are final once
+    the generator is exhausted.
+
+    `inplace`, `lazy`, `compact` and `extra_mapping` are passed to
+    `resource`, and so are the fields of each resource in
+    `datastore_fields_by_id`, {resource id: DataStore fields} (see
+    `datastore.fetch`), as its `datastore_fields`.
+    '''
+    _check_modes(inplace, lazy, compact)
+    return _resources(ckandicts, inplace, instrument.stopwatch(), lazy,
+                      compact, datastore_fields_by_id, extra_mapping)
+
+
+def _resources(ckandicts, inplace, watch, lazy_values=False,
+               compact_values=False, datastore_fields_by_id=None,
+               extra_mapping=None):
+    unnamed_num = 0
+    # name => [first resource with this name, number of resources]
+    seen = {}
+    for ckandict in ckandicts:
+        if watch:
+            # leave out the time spent by the consumer of the generator
+            watch.last = instrument.clock()
+        fields = None
+        if datastore_fields_by_id:
+            fields = datastore_fields_by_id.get(ckandict.get('id'))
+        res = resource(ckandict, inplace, lazy_values, compact_values,
+                       fields, extra_mapping)
+        if watch:
+            watch.lap('resource.convert')
+        name = res.get('name', 'unnamed-resource')
+        if name == 'unnamed-resource':
+            metrics.incr('resource.unnamed')
+            unnamed_num += 1
+            name = 'unnamed-resource-{}'.format(unnamed_num)
+        res['name'] = name
+        group = seen.get(name)
+        if group is None:
+            seen[name] = [res, 1]
+        else:
+            if group[1] == 1:
+                metrics.incr('resource.renamed_duplicate')
+                first = group[0]
+                first['original_name'] = name
+                first['name'] = f'{name}-1'
+                # the group is only needed for its count from now on
+                group[0] = None
+            group[1] += 1
+            metrics.incr('resource.renamed_duplicate')
+            res['original_name'] = name
+            res['name'] = f'{name}-{group[1]}'
+        if watch:
+            watch.lap('resource.names')
+        yield res
 
 
 dataset_keys_to_remove = [
@@ -101,9 +288,26 @@ dataset_mapping = {
     'notes': 'description',
     'url': 'homepage'
 }
+_dataset_renames = tuple(dataset_mapping.items())
+
+_cleanup_dataset = mapping.compile_mapping({}, dataset_keys_to_remove,
+                                           drop_none=True)
 
+# Keys of the CKAN package read by `dataset` after it starts filling outdict
+_dataset_input_keys = ('extras', 'resources', 'tags') + tuple(dataset_mapping)
 
-def dataset(ckandict):
+
+def _extra_value(value):
+    try:
+        return json_backend.loads(value)
+    except (json_parse_exception, TypeError):
+        metrics.incr('dataset.extra_not_json')
+        return value
+
+
+def dataset(ckandict, inplace=False, lazy=False, compact=False,
+            datastore_fields_by_id=None, extra_mapping=None,
+            extra_resource_mapping=None):
     '''Convert a CKAN Package (Dataset) to Frictionless Package.
 
     1. Expand extras.
@@ -112,68 +316,87 @@ def dataset(ckandict):
     3. Remove keys with null values (CKAN has a lot of null valued keys)
     4. Remove unneeded keys
     5. Apply special formatting for key fields
+
+    With `inplace=True` `ckandict` and its resources are converted and
+    returned instead of copies. This avoids doubling peak memory on packages
+    with many resources but the input is modified.
+
+    With `lazy=True` the package and its resources are `lazy.LazyDict`s:
+    extras and resource values starting with { or [ are only JSON loaded
+    when read. Extras that turn out not to be JSON are counted in `metrics`
+    then. Raises ValueError with `inplace=True` too.
+
+    With `compact=True` keys and repeated values are interned and resources
+    are `compact.ResourceRecord`s, see `compact`. It can be combined with
+    `inplace=True` to save a copy, but a new package is returned. Records
+    are not dicts: `json.dumps` needs `default=compact.default`, as `stream`,
+    `sync`, `store` and `cache` pass.
+
+    `datastore_fields_by_id`, {resource id: DataStore fields} (see
+    `datastore.fetch`), gives a `schema` to the resources in the DataStore,
+    see `resource`.
+
+    `extra_mapping` ({ckan key: frictionless key}) renames additional keys
+    of the package, extras included, after `dataset_mapping`, and
+    `extra_resource_mapping` additional keys of its resources (see
+    `resource`). See `compile_dataset` for a converter bound to them.
     '''
-    outdict = dict(ckandict)
+    _check_modes(inplace, lazy, compact)
+    watch = instrument.stopwatch()
+    collector = metrics.current
+    if collector is not None:
+        events = collector.events
+    if inplace:
+        outdict = ckandict
+        # keep the values read from the CKAN package below as extras may
+        # overwrite them in place
+        ckandict = {key: ckandict[key]
+                    for key in _dataset_input_keys if key in ckandict}
+    elif lazy:
+        outdict = LazyDict(ckandict)
+    else:
+        outdict = dict(ckandict)
     # Convert the structure of extras
     # structure of extra item is {key: xxx, value: xxx}
     if 'extras' in ckandict:
         for extra in ckandict['extras']:
             key = extra['key']
             value = extra['value']
+            if (lazy and isinstance(value, str) and
+                    value.lstrip()[:1] in ('{', '[')):
+                outdict[key] = Deferred(_extra_value, value)
+                continue
             try:
-                value = json.loads(value)
+                value = json_backend.loads(value)
             except (json_parse_exception, TypeError):
-                pass
+                metrics.incr('dataset.extra_not_json')
             outdict[key] = value
         del outdict['extras']
+        if watch:
+            watch.lap('dataset.extras', len(ckandict['extras']))
 
     # Map dataset keys
-    for key, value in dataset_mapping.items():
+    for key, value in _dataset_renames:
         if key in ckandict:
             outdict[value] = ckandict[key]
             del outdict[key]
+    if extra_mapping:
+        _compiled_dataset_keys(tuple(extra_mapping.items()))(outdict, True)
+    if watch:
+        watch.lap('dataset.keys')
 
     # map resources inside dataset
-    if 'resources' in ckandict:
-        outdict['resources'] = [resource(res) for res in
-                                ckandict['resources']]
-    else:
-        outdict['resources'] = []
-
-    for res in outdict['resources']:
-        if 'name' not in res:
-            res['name'] = 'unnamed-resource'
-
-    # prevent having multiple unanmed resources with the same name
-    # to follow the specs https://specs.frictionlessdata.io/data-resource/#name
-    unnamed_num = 1
-    for res in outdict['resources']:
-        if res['name'] == 'unnamed-resource':
-            res['name'] += '-{}'.format(unnamed_num)
-            unnamed_num += 1
-
-    # Deal with resources having the same name
-    name_count = defaultdict(int)
-    resources_names = [r['name'] for r in outdict['resources']]
-
-    for name in resources_names:
-        name_count[name] += 1
-
-    name_index = {n:1 for n in name_count.keys()}
-
-    # If a group of resources have the same name
-    # add a count to the name and save the original name in the metadata
-    for res in outdict['resources']:
-        if name_count[res['name']] > 1:
-            res_name = res['name']
-            res['original_name'] = res_name
-            res['name'] = f'{res_name}-{name_index[res_name]}'
-            name_index[res_name] += 1
+    outdict['resources'] = list(_resources(ckandict.get('resources', ()),
+                                           inplace, watch, lazy, compact,
+                                           datastore_fields_by_id,
+                                           extra_resource_mapping))
 
     # tags
     if ckandict.get('tags'):
         outdict['keywords'] = [tag['name'] for tag in ckandict['tags']]
     outdict.pop('tags', None)
+    if watch:
+        watch.lap('dataset.tags')
 
     # author, maintainer => contributors
     # what to do if contributors already there? Options:
@@ -204,6 +427,8 @@ def dataset(ckandict):
 
     for key in ['author', 'author_email', 'maintainer', 'maintainer_email']:
         outdict.pop(key, None)
+    if watch:
+        watch.lap('dataset.contributors')
 
     # Algorithm for licenses
     # 1. Use extras first
@@ -217,29 +442,72 @@ def dataset(ckandict):
         if key in outdict and 'licenses' not in outdict:
             outdict['licenses'] = [{}]
             break  # check to create list of dicts only once
+    if collector is not None and not outdict.get('license_id'):
+        metrics.incr('dataset.no_license_name')
     if 'license_id' in outdict:
         outdict['licenses'][0]['name'] = outdict.get('license_id') or 'no_licerse_name'
         outdict.pop('license_id', None)
     else:
         outdict['licenses'][0]['name'] = 'no_license_name'
 
+    if collector is not None and not outdict.get('license_title'):
+        metrics.incr('dataset.no_license_title')
     if 'license_title' in outdict:
         outdict['licenses'][0]['title'] = outdict.get('license_title') or 'no_license_title'
         outdict.pop('license_title', None)
     else:
         outdict['licenses'][0]['title'] = 'no_license_title'
 
+    if collector is not None and not outdict.get('license_url'):
+        metrics.incr('dataset.no_license_path')
     if 'license_url' in outdict:
         outdict['licenses'][0]['path'] = outdict.get('license_url') or 'no_path'
         outdict.pop('license_url', None)
     else:
         outdict['licenses'][0]['path'] = 'no_license_path'
+    if watch:
+        watch.lap('dataset.licenses')
+
+    # remove unneeded keys and keys with null values
+    outdict = _cleanup_dataset(outdict, inplace=True)
+    if watch:
+        watch.lap('dataset.cleanup')
+    if collector is not None:
+        collector.converted('dataset', outdict.get('name'), events)
+    if compact:
+        outdict = compact_package(outdict)
+    return outdict
 
-    for key in dataset_keys_to_remove:
-        outdict.pop(key, None)
 
-    for key in list(outdict.keys()):
-        if outdict[key] is None:
-            del outdict[key]
+def compile_dataset(extra_mapping=None, extra_resource_mapping=None):
+    '''Return a CKAN to Frictionless package converter mapping additional
+    keys.
 
-    return outdict
+    The converter takes the arguments of `dataset`, with `extra_mapping`
+    and `extra_resource_mapping` bound (see `dataset`), whose tables are
+    compiled once. Unlike a closure it can be pickled, for `datasets` or the
+    `convert` argument of `harvest`, `sync` or `store`.
+    '''
+    extra_mapping = dict(extra_mapping or {})
+    extra_resource_mapping = dict(extra_resource_mapping or {})
+    if extra_mapping:
+        _compiled_dataset_keys(tuple(extra_mapping.items()))
+    if extra_resource_mapping:
+        _compiled_resource(tuple(extra_resource_mapping.items()), False)
+    return functools.partial(dataset, extra_mapping=extra_mapping,
+                             extra_resource_mapping=extra_resource_mapping)
+
+
+def datasets(ckandicts, workers=None, chunksize=1, ordered=True,
+             convert=None):
+    '''Convert many CKAN Packages (Datasets) to Frictionless Packages.
+
+    Runs `dataset` (or `convert`, e.g. a converter of `compile_dataset`)
+    over `ckandicts` (any iterable, e.g. a generator reading a catalog dump)
+    on a pool of `workers` processes and returns a generator of Frictionless
+    Packages. See `parallel.map_records` for the meaning of `chunksize` and
+    `ordered`.
+    '''
+    return parallel.map_records(convert or dataset, ckandicts,
+                                workers=workers, chunksize=chunksize,
+                                ordered=ordered)
@@ -0,0 +1,200 @@
+# coding=utf-8
+'''Command line interface.
+
+    frictionless-ckan-mapper convert ckan-dump.jsonl frictionless.jsonl
+    frictionless-ckan-mapper sync yesterday.jsonl today.jsonl changed.jsonl
+    frictionless-ckan-mapper load data-lake/ ckan.jsonl
+
+Use `-` for stdin / stdout.
+'''
+import argparse
+import contextlib
+import io
+import sys
+
+from frictionless_ckan_mapper import bulk
+from frictionless_ckan_mapper import loader
+from frictionless_ckan_mapper import stream
+from frictionless_ckan_mapper import sync
+
+
+def _open(path, mode):
+    if path == '-':
+        return sys.stdin if 'r' in mode else sys.stdout
+    return io.open(path, mode, encoding='utf-8')
+
+
+def _close(fileobj):
+    '''Close `fileobj` unless it is None, stdin or stdout.'''
+    if fileobj not in (None, sys.stdin, sys.stdout):
+        fileobj.close()
+
+
+@contextlib.contextmanager
+def _opened(path, mode):
+    '''`_open` for a with block, leaving stdin and stdout open.'''
+    fileobj = _open(path, mode)
+    try:
+        yield fileobj
+    finally:
+        _close(fileobj)
+
+
+def convert(args):
+    infile = _open(args.input, 'r')
+    outfile = _open(args.output, 'w')
+    quarantine = report = None
+    if args.quarantine:
+        quarantine = _open(args.quarantine, 'w')
+        report = bulk.Report()
+    try:
+        count = stream.convert(infile, outfile, format=args.format,
+                               workers=args.workers,
+                               chunksize=args.chunksize,
+                               quarantine=quarantine, report=report)
+    finally:
+        for fileobj in (infile, outfile, quarantine):
+            _close(fileobj)
+    if report is not None:
+        sys.stderr.write('{}\n'.format(report))
+        if report.failed:
+            sys.stderr.write('Failed packages written to {}\n'.format(
+                args.quarantine))
+    else:
+        sys.stderr.write('Converted {} packages\n'.format(count))
+
+
+def sync_command(args):
+    with _opened(args.old, 'r') as oldfile:
+        if args.old_format == 'index':
+            old_index = sync.read_index(oldfile)
+        else:
+            old_index = sync.build_index(
+                stream.iter_packages(oldfile, format=args.old_format))
+    new_index = {}
+    infile = _open(args.new, 'r')
+    outfile = _open(args.output, 'w')
+    manifest = _open(args.manifest, 'w') if args.manifest else None
+    try:
+        changes = sync.sync(old_index,
+                             stream.iter_packages(infile, format=args.format),
+                             outfile, manifest, new_index=new_index)
+    finally:
+        for fileobj in (infile, outfile, manifest):
+            _close(fileobj)
+    if args.save_index:
+        with _opened(args.save_index, 'w') as indexfile:
+            sync.write_index(new_index, indexfile)
+    sys.stderr.write('{}\n'.format(changes))
+
+
+def load(args):
+    # a resumed run adds to the output of the previous ones, without the
+    # package a crash may have cut short
+    if args.checkpoint and args.output != '-':
+        loader.drop_partial_line(args.output)
+    outfile = _open(args.output, 'a' if args.checkpoint else 'w')
+    quarantine = _open(args.quarantine, 'w') if args.quarantine else None
+    try:
+        report = loader.load(args.source, outfile, workers=args.workers,
+                             chunksize=args.chunksize,
+                             checkpoint=args.checkpoint,
+                             quarantine=quarantine)
+    finally:
+        for fileobj in (outfile, quarantine):
+            _close(fileobj)
+    sys.stderr.write('{}\n'.format(report))
+    if report.failed:
+        sys.stderr.write('Failed descriptors written to {}\n'.format(
+            args.quarantine or 'no quarantine file, use --quarantine'))
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='frictionless-ckan-mapper',
+        description='Map CKAN metadata <=> Frictionless metadata.')
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    convert_parser = subparsers.add_parser(
+        'convert',
+        help='Convert a CKAN dump (JSONL or package_search response) to '
+             'Frictionless JSONL, one package at a time.')
+    convert_parser.add_argument('input', help='CKAN dump, - for stdin')
+    convert_parser.add_argument('output', help='Frictionless JSONL, - for '
+                                               'stdout')
+    convert_parser.add_argument(
+        '--format', choices=['auto', 'jsonl', 'envelope'], default='auto',
+        help='Input format (default: detected from the first key)')
+    convert_parser.add_argument(
+        '--workers', type=int, default=1,
+        help='Number of worker processes (default: 1)')
+    convert_parser.add_argument(
+        '--chunksize', type=int, default=64,
+        help='Packages sent to a worker at a time (default: 64)')
+    convert_parser.add_argument(
+        '--quarantine', metavar='PATH',
+        help='Write the packages failing to convert (with the error) to this '
+             'JSONL file and carry on, instead of stopping at the first '
+             'failure')
+    convert_parser.set_defaults(func=convert)
+
+    sync_parser = subparsers.add_parser(
+        'sync',
+        help='Convert only the packages added or modified between two CKAN '
+             'dumps to Frictionless JSONL.')
+    sync_parser.add_argument('old', help='Previous CKAN dump, or index '
+                                         'saved with --save-index')
+    sync_parser.add_argument('new', help='Current CKAN dump, - for stdin')
+    sync_parser.add_argument('output', help='Frictionless JSONL of the '
+                                            'changed packages, - for stdout')
+    sync_parser.add_argument(
+        '--manifest', metavar='PATH',
+        help='Write the changes (added, modified and deleted packages) to '
+             'this JSONL file')
+    sync_parser.add_argument(
+        '--save-index', metavar='PATH',
+        help='Save the index of the current dump to this file, to pass as '
+             'the previous dump of the next sync with --old-format index')
+    sync_parser.add_argument(
+        '--format', choices=['auto', 'jsonl', 'envelope'], default='auto',
+        help='Format of the current dump (default: detected)')
+    sync_parser.add_argument(
+        '--old-format', choices=['auto', 'jsonl', 'envelope', 'index'],
+        default='auto',
+        help='Format of the previous dump (default: detected)')
+    sync_parser.set_defaults(func=sync_command)
+
+    load_parser = subparsers.add_parser(
+        'load',
+        help='Convert the datapackage.json files of a directory, tarball or '
+             'zip file to CKAN JSONL.')
+    load_parser.add_argument('source', help='Directory, tarball or zip file')
+    load_parser.add_argument('output', help='CKAN JSONL, - for stdout')
+    load_parser.add_argument(
+        '--workers', type=int, default=1,
+        help='Number of worker processes (default: 1)')
+    load_parser.add_argument(
+        '--chunksize', type=int, default=64,
+        help='Descriptors sent to a worker at a time (default: 64)')
+    load_parser.add_argument(
+        '--checkpoint', metavar='PATH',
+        help='Skip the descriptors listed in this file and add the ones '
+             'converted to it, to resume an interrupted run. The output is '
+             'then appended to')
+    load_parser.add_argument(
+        '--quarantine', metavar='PATH',
+        help='Write the descriptors failing to convert (with the error) to '
+             'this JSONL file')
+    load_parser.set_defaults(func=load)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+# coding=utf-8
+'''Minimal asyncio client for the CKAN action API.
+
+Only what harvesting and writing need, using nothing but the standard
+library: GET and JSON POST requests over HTTP/1.1 keep-alive connections, a
+pool of at most `max_connections` connections per client, gzip and chunked
+responses, an optional rate limit, and retries with exponential backoff on
+connection errors, timeouts and 429 / 5xx responses.
+
+    async with Client('https://demo.ckan.org') as client:
+        result = await client.action('package_search', rows=10)
+        await client.action('package_patch', {'id': 'gdp', 'notes': '...'})
+'''
+import asyncio
+import json
+import random
+import zlib
+from urllib.parse import urlencode, urlsplit
+
+# Responses worth trying again, anything else is returned to the caller
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class CKANError(Exception):
+    '''The CKAN API did not return a successful response.'''
+
+    def __init__(self, message, status=None, error=None):
+        super(CKANError, self).__init__(message)
+        self.status = status
+        self.error = error
+
+
+class Client(object):
+    '''Pooled HTTP client for a CKAN portal.
+
+    * `base_url` is the portal root, e.g. 'https://demo.ckan.org'.
+    * `timeout` applies to every attempt of a request, in seconds.
+    * A request is tried again up to `retries` times, waiting
+      `backoff * 2 ** attempt` seconds (with jitter, or the `Retry-After` of
+      a 429 / 503 response) in between.
+    * `rate` limits the number of requests per second, retries included.
+    * `headers` are added to every request, e.g. {'Authorization': api_key}.
+
+    `requests`, `connections` and `retried` count what the client did.
+    '''
+
+    def __init__(self, base_url, max_connections=10, timeout=30, retries=3,
+                 backoff=0.5, headers=None, rate=None):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError('Unsupported URL: {}'.format(base_url))
+        self.ssl = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port or (443 if self.ssl else 80)
+        self.prefix = parts.path.rstrip('/')
+        default_port = self.port == (443 if self.ssl else 80)
+        self.headers = {
+            'Host': self.host if default_port else '{}:{}'.format(
+                self.host, self.port),
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+            'User-Agent': 'frictionless-ckan-mapper',
+        }
+        self.headers.update(headers or {})
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.interval = 1.0 / rate if rate else 0
+        self._next_slot = 0
+        self.requests = 0
+        self.connections = 0
+        self.retried = 0
+        self._idle = []
+        # created on first use so that the client can be built outside of a
+        # running event loop
+        self._slots = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        '''Close the idle connections.'''
+        while self._idle:
+            self._idle.pop()[1].close()
+
+    async def action(self, name, data=None, **params):
+        '''Call action `name` of the CKAN API and return its `result`.
+
+        `data` is POSTed as JSON if given, else `params` are sent in the
+        query string of a GET request. Raises `CKANError` if CKAN reports an
+        error.
+        '''
+        path = '/api/3/action/' + name
+        if data is None:
+            status, body = await self.get(path, params)
+        else:
+            status, body = await self.post(path, data)
+        try:
+            data = json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise CKANError('{} returned a non JSON response (HTTP {})'.format(
+                name, status), status)
+        if status != 200 or not data.get('success'):
+            error = data.get('error') or {}
+            raise CKANError('{} failed (HTTP {}): {}'.format(
+                name, status, error.get('message', error)), status, error)
+        return data['result']
+
+    async def get(self, path, params=None):
+        '''Return the (status, body) of a GET request, retrying on failure.'''
+        target = self.prefix + path
+        if params:
+            target += '?' + urlencode(params)
+        return await self.request('GET', target)
+
+    async def post(self, path, data):
+        '''Return the (status, body) of a POST request of `data` as JSON,
+        retrying on failure.'''
+        body = json.dumps(data).encode('utf-8')
+        return await self.request('POST', self.prefix + path, body)
+
+    async def request(self, method, target, body=None):
+        '''Return the (status, body) of a request, retrying on failure.'''
+        for attempt in range(self.retries + 1):
+            delay = self.backoff * 2 ** attempt * (0.5 + random.random())
+            try:
+                status, headers, body_ = await asyncio.wait_for(
+                    self._request(method, target, body), self.timeout)
+            except (OSError, EOFError, ValueError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            else:
+                if status not in RETRY_STATUSES or attempt == self.retries:
+                    return status, body_
+                retry_after = headers.get('retry-after', '')
+                if retry_after.isdigit():
+                    delay = int(retry_after)
+            self.retried += 1
+            await asyncio.sleep(delay)
+
+    async def _throttle(self):
+        now = asyncio.get_event_loop().time()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _connect(self):
+        self.connections += 1
+        return await asyncio.open_connection(self.host, self.port,
+                                             ssl=self.ssl or None)
+
+    async def _request(self, method, target, body=None):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_connections)
+        request = ['{} {} HTTP/1.1'.format(method, target)]
+        request.extend('{}: {}'.format(*item) for item in self.headers.items())
+        if body is not None:
+            request.append('Content-Type: application/json')
+            request.append('Content-Length: {}'.format(len(body)))
+        request = ('\r\n'.join(request) + '\r\n\r\n').encode('latin-1')
+        if body is not None:
+            request += body
+        if self.interval:
+            await self._throttle()
+        async with self._slots:
+            self.requests += 1
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else \
+                await self._connect()
+            while True:
+                try:
+                    writer.write(request)
+                    await writer.drain()
+                    response = await _read_response(reader)
+                    break
+                except (OSError, EOFError):
+                    writer.close()
+                    # the server may have closed an idle keep-alive
+                    # connection before reading the request, send it again
+                    # on a new one
+                    if not reused:
+                        raise
+                    reused = False
+                    reader, writer = await self._connect()
+                except BaseException:
+                    writer.close()
+                    raise
+            status, headers, body, keep_alive = response
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+        if headers.get('content-encoding') == 'gzip':
+            body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+        return status, headers, body
+
+
+def run(coroutine):
+    '''Run `coroutine` in a new event loop and return its result.
+
+    Stands in for `asyncio.run`, which is missing from Python 3.6.
+    '''
+    loop = asyncio.new_event_loop()
+    try:
+        asyncio.set_event_loop(loop)
+        return loop.run_until_complete(coroutine)
+    finally:
+        try:
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
+
+async def as_completed(calls, concurrency):
+    '''Run the coroutine functions of `calls` with at most `concurrency` of
+    them at a time, yield their results as they complete.
+
+    `calls` is consumed lazily so it can be a generator over a huge input.
+    '''
+    calls = iter(calls)
+    pending = set()
+    try:
+        while True:
+            for call in calls:
+                pending.add(asyncio.ensure_future(call()))
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def _read_response(reader):
+    '''Read an HTTP/1.1 response, return (status, headers, body, keep alive).
+
+    Raises EOFError if the connection is closed before the end of the
+    response.
+    '''
+    line = await reader.readline()
+    if not line:
+        raise EOFError('Connection closed by the server')
+    version, status = line.split(None, 2)[:2]
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise EOFError('Connection closed by the server')
+        if line in (b'\r\n', b'\n'):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    keep_alive = (version == b'HTTP/1.1' and
+                  headers.get('connection', '').lower() != 'close')
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if not size:
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        # skip trailers
+        while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+            pass
+        body = b''.join(chunks)
+    elif 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return int(status), headers, body, keep_alive
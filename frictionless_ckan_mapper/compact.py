@@ -0,0 +1,188 @@
+# coding=utf-8
+'''Compact in-memory representation of converted packages.
+
+Catalogs of millions of resources kept in memory (e.g. to index them) mostly
+store the same keys and a few values over and over: every decoded package
+has its own copy of 'name', 'path', 'format', 'CSV', 'text/csv'... and every
+resource is a dict sized for growth. `package` and `resource` return
+equivalent objects that share them:
+
+    fdpackage = compact.package(fdpackage)
+    # or directly
+    fdpackage = ckan_to_frictionless.dataset(ckandict, compact=True)
+
+* keys, at any depth, are interned with `sys.intern`;
+* string values of keys that repeat across a catalog (`INTERNED_VALUE_KEYS`,
+  e.g. `format`, `mediatype`, `package_id`, licenses and keywords) are
+  interned too;
+* resources become `ResourceRecord`s, mutable mappings storing the usual
+  resource keys in `__slots__` and others in a dict.
+
+Packages stay dicts. A `ResourceRecord` compares equal to the dict it was
+made from, but is not a dict: use `dict(record)` or `compact.default` with
+`json.dumps(..., default=compact.default)` (`stream`, `sync`, `store` and
+`cache` write them that way). Its usual keys come first, in
+the fixed order of `RESOURCE_SLOTS` whatever the order they were set in,
+then the other keys in insertion order: the JSON of a compact package has
+the same keys as that of a plain one but not in the same order (compare
+with `sort_keys=True`).
+'''
+import sys
+from collections.abc import MutableMapping
+
+# Resource keys stored in slots, in iteration order
+RESOURCE_SLOTS = (
+    'created',
+    'description',
+    'encoding',
+    'format',
+    'hash',
+    'id',
+    'last_modified',
+    'name',
+    'package_id',
+    'schema',
+    'title',
+    'url_type',
+    'bytes',
+    'mediatype',
+    'path',
+    'original_name',
+)
+
+# Keys whose (string) values repeat across a catalog, interned at any depth
+# under them
+INTERNED_VALUE_KEYS = frozenset([
+    'encoding',
+    'format',
+    'keywords',
+    'licenses',
+    'mediatype',
+    'owner_org',
+    'package_id',
+    'profile',
+    'resource_type',
+    'role',
+    'type',
+    'url_type',
+])
+
+_slots = frozenset(RESOURCE_SLOTS)
+_intern = sys.intern
+
+
+def _compact(value, intern_strings=False):
+    '''Return `value` with interned keys (and strings if `intern_strings`).'''
+    kind = type(value)
+    if kind is str:
+        return _intern(value) if intern_strings else value
+    if kind is dict:
+        return {_intern(key) if type(key) is str else key: _compact(
+            item, intern_strings or key in INTERNED_VALUE_KEYS)
+            for key, item in value.items()}
+    if kind is list:
+        return [_compact(item, intern_strings) for item in value]
+    return value
+
+
+class ResourceRecord(MutableMapping):
+    '''Mutable mapping of a resource, the keys of `RESOURCE_SLOTS` in slots.
+    '''
+
+    __slots__ = RESOURCE_SLOTS + ('_extra',)
+
+    def __init__(self, items=()):
+        self._extra = None
+        if items:
+            self.update(items)
+
+    def __getitem__(self, key):
+        if key in _slots:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in _slots:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key):
+        if key in _slots:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key)
+        elif self._extra is None:
+            raise KeyError(key)
+        else:
+            del self._extra[key]
+            if not self._extra:
+                self._extra = None
+
+    def __contains__(self, key):
+        if key in _slots:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in RESOURCE_SLOTS:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            for key in self._extra:
+                yield key
+
+    def __len__(self):
+        count = sum(1 for key in RESOURCE_SLOTS if hasattr(self, key))
+        return count + (len(self._extra) if self._extra is not None else 0)
+
+    def __repr__(self):
+        return 'ResourceRecord({!r})'.format(dict(self))
+
+    def __reduce__(self):
+        return ResourceRecord, (list(self.items()),)
+
+
+def resource(fddict):
+    '''Return the `ResourceRecord` of Frictionless resource `fddict`.'''
+    record = ResourceRecord()
+    extra = None
+    for key, value in fddict.items():
+        value = _compact(value, key in INTERNED_VALUE_KEYS)
+        if key in _slots:
+            setattr(record, key, value)
+        else:
+            if extra is None:
+                extra = record._extra = {}
+            extra[_intern(key) if type(key) is str else key] = value
+    return record
+
+
+def package(fddict):
+    '''Return a compact copy of Frictionless package `fddict`.'''
+    outdict = {}
+    for key, value in fddict.items():
+        if key == 'resources' and type(value) is list:
+            outdict['resources'] = [
+                res if isinstance(res, ResourceRecord) else resource(res)
+                for res in value]
+        else:
+            outdict[_intern(key) if type(key) is str else key] = _compact(
+                value, key in INTERNED_VALUE_KEYS)
+    return outdict
+
+
+def default(value):
+    '''`default` for `json.dumps`, encoding `ResourceRecord`s as dicts.'''
+    if isinstance(value, ResourceRecord):
+        return dict(value)
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        type(value).__name__))
@@ -0,0 +1,238 @@
+# coding=utf-8
+'''Table Schema <=> CKAN DataStore data dictionary.
+
+The DataStore describes the columns of a resource with a list of fields,
+`{'id': name, 'type': postgres type, 'info': {...}}`, where `info` is the
+data dictionary entered in CKAN (`label`, `notes` and `type_override`).
+`schema` turns them into a Frictionless Table Schema and `fields` does the
+opposite, for `datastore_create`:
+
+    fdschema = datastore.schema(ckan_fields)
+    ckan_fields = datastore.fields(fdschema)
+
+`fetch` gets the fields of many resources at once, with `datastore_search`
+calls (`limit=0`, no records) running concurrently over a pool of keep-alive
+connections, and `ckan_to_frictionless.dataset` takes them as
+`datastore_fields_by_id`:
+
+    fields_by_id = datastore.run('https://demo.ckan.org',
+                                 datastore.resource_ids(ckandicts))
+    fdpackages = [ckan_to_frictionless.dataset(
+        ckandict, datastore_fields_by_id=fields_by_id)
+        for ckandict in ckandicts]
+
+DataStore types are lower cased and stripped of their parameters
+(`numeric(10,2)`) before their lookup in `schema_types`, and the result is
+kept in a bounded LRU cache: a catalog repeats the same few types. Array
+types (`_text`, `int4[]`) are `array` fields and unknown types `any` fields.
+The `_id` column added by the DataStore is left out.
+'''
+import functools
+import re
+
+# Number of distinct DataStore types kept in the cache
+CACHE_SIZE = 1024
+
+# Columns added by the DataStore itself
+INTERNAL_FIELDS = frozenset(['_id', '_full_text'])
+
+# DataStore (PostgreSQL) type: Table Schema type
+schema_types = {
+    'text': 'string',
+    'varchar': 'string',
+    'character varying': 'string',
+    'char': 'string',
+    'character': 'string',
+    'name': 'string',
+    'citext': 'string',
+    'uuid': 'string',
+    'int': 'integer',
+    'int2': 'integer',
+    'int4': 'integer',
+    'int8': 'integer',
+    'integer': 'integer',
+    'smallint': 'integer',
+    'bigint': 'integer',
+    'serial': 'integer',
+    'bigserial': 'integer',
+    'numeric': 'number',
+    'decimal': 'number',
+    'float': 'number',
+    'float4': 'number',
+    'float8': 'number',
+    'real': 'number',
+    'double precision': 'number',
+    'money': 'number',
+    'bool': 'boolean',
+    'boolean': 'boolean',
+    'timestamp': 'datetime',
+    'timestamp without time zone': 'datetime',
+    'timestamp with time zone': 'datetime',
+    'timestamptz': 'datetime',
+    'date': 'date',
+    'time': 'time',
+    'time without time zone': 'time',
+    'time with time zone': 'time',
+    'timetz': 'time',
+    'interval': 'duration',
+    'json': 'object',
+    'jsonb': 'object',
+}
+
+# Table Schema type: DataStore type, anything else is text
+datastore_types = {
+    'string': 'text',
+    'integer': 'int',
+    'number': 'numeric',
+    'boolean': 'bool',
+    'object': 'json',
+    'array': 'json',
+    'geojson': 'json',
+    'datetime': 'timestamp',
+    'date': 'date',
+    'time': 'time',
+    'year': 'int',
+    'duration': 'interval',
+}
+
+_parameters = re.compile(r'\([^)]*\)')
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def schema_type(ckan_type):
+    '''Return the Table Schema type of DataStore type `ckan_type`.'''
+    if not isinstance(ckan_type, str):
+        return 'any'
+    name = ' '.join(_parameters.sub('', ckan_type).lower().split())
+    if name.startswith('_') or name.endswith('[]'):
+        return 'array'
+    return schema_types.get(name, 'any')
+
+
+def datastore_type(fd_type):
+    '''Return the DataStore type of Table Schema type `fd_type`.'''
+    return datastore_types.get(fd_type, 'text')
+
+
+def cache_info():
+    '''Return the hits and misses of the `schema_type` cache.'''
+    return schema_type.cache_info()
+
+
+def cache_clear():
+    schema_type.cache_clear()
+
+
+def schema_field(ckan_field):
+    '''Convert a DataStore field to a Table Schema field.
+
+    `info.type_override`, the type chosen in the data dictionary, wins over
+    `type`; `info.label` is the `title` and `info.notes` the `description`.
+    '''
+    info = ckan_field.get('info') or {}
+    field = {
+        'name': ckan_field['id'],
+        'type': schema_type(info.get('type_override') or
+                            ckan_field.get('type')),
+    }
+    if info.get('label'):
+        field['title'] = info['label']
+    if info.get('notes'):
+        field['description'] = info['notes']
+    return field
+
+
+def schema(ckan_fields):
+    '''Return the Table Schema of the DataStore fields `ckan_fields`.'''
+    return {'fields': [schema_field(ckan_field) for ckan_field in ckan_fields
+                       if ckan_field['id'] not in INTERNAL_FIELDS]}
+
+
+def datastore_field(fd_field):
+    '''Convert a Table Schema field to a DataStore field.'''
+    ckan_field = {
+        'id': fd_field['name'],
+        'type': datastore_type(fd_field.get('type', 'string')),
+    }
+    info = {}
+    if fd_field.get('title'):
+        info['label'] = fd_field['title']
+    if fd_field.get('description'):
+        info['notes'] = fd_field['description']
+    if info:
+        ckan_field['info'] = info
+    return ckan_field
+
+
+def fields(fdschema):
+    '''Return the DataStore fields of Table Schema `fdschema`.
+
+    Returns [] if `fdschema` is not a descriptor (e.g. the path or URL of
+    one) or has no fields.
+    '''
+    if not isinstance(fdschema, dict):
+        return []
+    return [datastore_field(fd_field)
+            for fd_field in fdschema.get('fields') or ()]
+
+
+def resource_ids(ckandicts):
+    '''Generate the ids of the resources of CKAN packages `ckandicts` that
+    are in the DataStore.'''
+    for ckandict in ckandicts:
+        for resource in ckandict.get('resources') or ():
+            if resource.get('datastore_active') and resource.get('id'):
+                yield resource['id']
+
+
+def _search_calls(client, resource_ids):
+    for resource_id in resource_ids:
+        yield lambda resource_id=resource_id: _search(client, resource_id)
+
+
+async def _search(client, resource_id):
+    from frictionless_ckan_mapper.client import CKANError
+    try:
+        result = await client.action('datastore_search',
+                                     resource_id=resource_id, limit=0)
+    except CKANError as error:
+        if error.status == 404:
+            return resource_id, None
+        raise
+    return resource_id, result['fields']
+
+
+async def fetch(base_url, resource_ids, concurrency=8, client=None):
+    '''Return {resource id: DataStore fields} of `resource_ids`.
+
+    * Repeated ids are fetched once.
+    * At most `concurrency` `datastore_search` requests run at a time.
+    * Resources missing from the DataStore get None.
+    * `client` is a `client.Client` to use instead of a new one with
+      `max_connections=concurrency`; it is left open.
+
+    The fields are those of the DataStore, `_id` included; `schema` and the
+    converters leave it out. Raises `client.CKANError` if a request fails
+    after all its retries.
+    '''
+    # imported here: asyncio is slow to import and only needed to fetch
+    from frictionless_ckan_mapper.client import Client, as_completed
+    own_client = client is None
+    if own_client:
+        client = Client(base_url, max_connections=concurrency)
+    out = {}
+    try:
+        calls = _search_calls(client, dict.fromkeys(resource_ids))
+        async for resource_id, ckan_fields in as_completed(calls,
+                                                           concurrency):
+            out[resource_id] = ckan_fields
+    finally:
+        if own_client:
+            client.close()
+    return out
+
+
+def run(*args, **kwargs):
+    '''Run `fetch` in a new event loop, for scripts.'''
+    from frictionless_ckan_mapper import client
+    return client.run(fetch(*args, **kwargs))
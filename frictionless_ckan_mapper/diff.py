@@ -0,0 +1,124 @@
+# coding=utf-8
+'''Minimal CKAN API payloads to go from one Frictionless package to another.
+
+Sending the whole `frictionless_to_ckan.package` output to `package_update`
+costs bandwidth and CKAN indexing time for every resource, even when only the
+description changed. `diff` compares two versions of a Frictionless package
+and returns the CKAN actions to apply instead:
+
+    for action, payload in diff.diff(old_fdpackage, new_fdpackage):
+        ckan.call_action(action, payload)
+
+Both versions go through `frictionless_to_ckan.package`, so the key mappings
+and the extras packing rules are the ones of the converter. Then:
+
+* changed package keys go in a `package_patch`, removed ones are set to
+  None (or [] for lists). As CKAN replaces `extras` as a whole, the complete
+  new `extras` list is sent if any extra changed.
+* resources are matched on their `id`: changed keys go in a
+  `resource_patch`, resources with removed keys get a `resource_update`,
+  new resources a `resource_create`, missing ones a `resource_delete` and a
+  `package_resource_reorder` fixes the order if needed.
+* when resources cannot be matched (no `id`) or more than
+  `max_resource_actions` resource actions would be needed, the full
+  `resources` list goes in the `package_patch` instead (CKAN reindexes the
+  package on every action).
+'''
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+# Package keys holding lists, cleared with [] rather than None
+_list_keys = frozenset(['extras', 'groups', 'tags', 'resources'])
+
+
+def _extras(ckandict):
+    return {extra['key']: extra['value']
+            for extra in ckandict.get('extras') or []}
+
+
+def _changed(old, new, skip=()):
+    '''Return {key: new value} of the keys changed from `old` to `new`, and
+    the removed keys.'''
+    changed = {}
+    for key, value in new.items():
+        if key not in skip and (key not in old or old[key] != value):
+            changed[key] = value
+    removed = [key for key in old if key not in new and key not in skip]
+    return changed, removed
+
+
+def _resource_actions(package_id, old_resources, new_resources):
+    '''Return the resource actions, or None if resources can't be matched.'''
+    if not all(res.get('id') for res in old_resources):
+        return None
+    old_by_id = {res['id']: res for res in old_resources}
+    actions = []
+    new_ids = set()
+    for res in new_resources:
+        resource_id = res.get('id')
+        new_ids.add(resource_id)
+        if resource_id not in old_by_id:
+            actions.append(('resource_create', dict(res,
+                                                    package_id=package_id)))
+            continue
+        changed, removed = _changed(old_by_id[resource_id], res)
+        if removed:
+            # resource_patch only adds and updates keys
+            actions.append(('resource_update', res))
+        elif changed:
+            changed['id'] = resource_id
+            actions.append(('resource_patch', changed))
+    for res in old_resources:
+        if res['id'] not in new_ids:
+            actions.append(('resource_delete', {'id': res['id']}))
+
+    # resource_create appends, check the resulting order
+    order = [res['id'] for res in old_resources if res['id'] in new_ids]
+    order.extend(res.get('id') for res in new_resources
+                 if res.get('id') not in old_by_id)
+    wanted = [res.get('id') for res in new_resources]
+    if order != wanted:
+        if not all(wanted):
+            # new resources without an id can't be put in place
+            return None
+        actions.append(('package_resource_reorder',
+                        {'id': package_id, 'order': wanted}))
+    return actions
+
+
+def diff(old, new, max_resource_actions=20):
+    '''Return the CKAN actions turning Frictionless package `old` into `new`.
+
+    Returns a list of (action name, payload) to run in order, empty if
+    nothing changed. Raises ValueError if the package has neither an `id`
+    nor a `name`.
+    '''
+    old = frictionless_to_ckan.package(old)
+    new = frictionless_to_ckan.package(new)
+    # the name may be what changed, CKAN still knows the old one
+    package_id = (old.get('id') or new.get('id') or old.get('name') or
+                  new.get('name'))
+    if not package_id:
+        raise ValueError('The package needs an id or a name to be patched')
+
+    patch, removed = _changed(old, new, skip=('extras', 'resources'))
+    for key in removed:
+        patch[key] = [] if key in _list_keys else None
+    if _extras(old) != _extras(new):
+        patch['extras'] = new.get('extras') or []
+
+    old_resources = old.get('resources') or []
+    new_resources = new.get('resources') or []
+    resource_actions = []
+    if old_resources != new_resources:
+        resource_actions = _resource_actions(package_id, old_resources,
+                                             new_resources)
+        if (resource_actions is None or
+                len(resource_actions) > max_resource_actions):
+            patch['resources'] = new_resources
+            resource_actions = []
+
+    actions = []
+    if patch:
+        patch['id'] = package_id
+        actions.append(('package_patch', patch))
+    return actions + resource_actions
@@ -0,0 +1,258 @@
+# coding=utf-8
+'''Columnar export of converted packages for analytics.
+
+`export` flattens the output of `ckan_to_frictionless.dataset` into two
+tables, one row per package (`PACKAGE_COLUMNS`) and one row per resource
+(`RESOURCE_COLUMNS`), and writes them in row groups of `row_group_size`
+rows, so memory stays bounded whatever the size of the catalog:
+
+    fdpackages = (ckan_to_frictionless.dataset(ckandict)
+                  for ckandict in stream.iter_packages(infile))
+    with io.open('packages.csv', 'w', newline='') as packages, \\
+            io.open('resources.csv', 'w', newline='') as resources:
+        export.export(fdpackages, packages, resources)
+    # or, with pyarrow installed
+    export.export(fdpackages, 'packages.parquet', 'resources.parquet',
+                  format='parquet')
+
+`format` is 'csv' (file objects), or 'parquet' or 'arrow' (Arrow IPC file
+format, paths or pyarrow sinks), which need pyarrow. `columns` returns the
+columns of a batch of packages as lists, for consumers working on columns
+directly.
+
+The `id` of a package without one is its `name`, and resources are joined
+to their package by `package_id`, that `id`. `license` is the name of the
+first license. Keywords are a list of strings in Parquet and Arrow and a
+JSON array in CSV. `bytes`, `position` and `num_resources` are integers,
+null if not a number, and other columns are strings: strings as found in
+the package, other values (numbers, booleans, objects...) JSON encoded.
+'''
+import csv
+import json
+
+ROW_GROUP_SIZE = 65536
+
+PACKAGE_COLUMNS = (
+    'id',
+    'name',
+    'title',
+    'owner_org',
+    'license',
+    'keywords',
+    'version',
+    'created',
+    'modified',
+    'num_resources',
+)
+
+RESOURCE_COLUMNS = (
+    'package_id',
+    'position',
+    'id',
+    'name',
+    'title',
+    'path',
+    'format',
+    'mediatype',
+    'bytes',
+    'hash',
+    'created',
+    'last_modified',
+)
+
+# columns that are not strings: arrow type name
+_types = {
+    'keywords': 'list_of_strings',
+    'num_resources': 'int64',
+    'position': 'int64',
+    'bytes': 'int64',
+}
+
+# package column: key of the package when not the column name
+_package_keys = {
+    'created': 'metadata_created',
+    'modified': 'metadata_modified',
+}
+
+
+def _license(fddict):
+    licenses = fddict.get('licenses')
+    if licenses and isinstance(licenses[0], dict):
+        return licenses[0].get('name')
+
+
+def _integer(value):
+    if type(value) is int:
+        return value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _string(value):
+    if value is None or type(value) is str:
+        return value
+    return json.dumps(value, default=str)
+
+
+_string_types = frozenset([str, type(None)])
+
+
+def _strings(values):
+    if _string_types.issuperset(map(type, values)):
+        return values
+    return [_string(value) for value in values]
+
+
+def columns(fddicts):
+    '''Return the (package columns, resource columns) of packages
+    `fddicts`, each a dict of column name: list of values.'''
+    fddicts = list(fddicts)
+    packages = {}
+    for name in PACKAGE_COLUMNS:
+        key = _package_keys.get(name, name)
+        packages[name] = [fddict.get(key) for fddict in fddicts]
+    packages['id'] = [package_id or name for package_id, name in zip(
+        packages['id'], packages['name'])]
+    packages['license'] = [_license(fddict) for fddict in fddicts]
+    packages['keywords'] = [_strings(list(keywords)) if keywords else []
+                            for keywords in packages['keywords']]
+    resource_lists = [fddict.get('resources') or () for fddict in fddicts]
+    packages['num_resources'] = [len(resource_list)
+                                 for resource_list in resource_lists]
+
+    rows = [resource for resource_list in resource_lists
+            for resource in resource_list]
+    resources = {
+        'package_id': [package_id for package_id, resource_list in zip(
+            packages['id'], resource_lists) for _ in resource_list],
+        'position': [position for resource_list in resource_lists
+                     for position in range(len(resource_list))],
+    }
+    for name in RESOURCE_COLUMNS[2:]:
+        resources[name] = [resource.get(name) for resource in rows]
+    resources['bytes'] = [_integer(value) for value in resources['bytes']]
+    for table in (packages, resources):
+        for name, values in table.items():
+            if name not in _types:
+                table[name] = _strings(values)
+    return packages, resources
+
+
+class CSVWriter(object):
+    '''Write columns to a CSV file object, header first.'''
+
+    def __init__(self, fileobj, names):
+        self.names = names
+        self.writer = csv.writer(fileobj)
+        self.writer.writerow(names)
+
+    def write(self, columns):
+        values = [columns[name] for name in self.names]
+        if 'keywords' in self.names:
+            position = self.names.index('keywords')
+            values[position] = [json.dumps(keywords)
+                                for keywords in values[position]]
+        self.writer.writerows(zip(*values))
+
+    def close(self):
+        pass
+
+
+def _arrow_schema(names):
+    import pyarrow
+    types = {
+        'list_of_strings': pyarrow.list_(pyarrow.string()),
+        'int64': pyarrow.int64(),
+    }
+    return pyarrow.schema([(name, types[_types[name]] if name in _types
+                            else pyarrow.string()) for name in names])
+
+
+class ArrowWriter(object):
+    '''Write columns as row groups of a Parquet or Arrow IPC file.'''
+
+    def __init__(self, sink, names, format='parquet'):
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError('pyarrow is needed to export to {}'.format(
+                format))
+        self.names = names
+        self.schema = _arrow_schema(names)
+        self.table = pyarrow.Table.from_pydict
+        if format == 'parquet':
+            import pyarrow.parquet
+            self.writer = pyarrow.parquet.ParquetWriter(sink, self.schema)
+        else:
+            import pyarrow.ipc
+            self.writer = pyarrow.ipc.new_file(sink, self.schema)
+
+    def write(self, columns):
+        self.writer.write_table(self.table(
+            {name: columns[name] for name in self.names},
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def _writer(sink, names, format):
+    if format == 'csv':
+        return CSVWriter(sink, names)
+    if format in ('parquet', 'arrow'):
+        return ArrowWriter(sink, names, format)
+    raise ValueError('Unknown export format: {}'.format(format))
+
+
+def export(fddicts, packages, resources=None, format='csv',
+           row_group_size=ROW_GROUP_SIZE):
+    '''Write the package and resource tables of packages `fddicts`.
+
+    * `packages` and `resources` are file objects for CSV, paths or pyarrow
+      sinks for Parquet and Arrow. Resources are not exported if
+      `resources` is None.
+    * Rows are written in groups, closed once they have `row_group_size`
+      packages or resources: a group of resources may go over by the
+      resources of its last package.
+
+    Returns the number of (packages, resources) written.
+    '''
+    package_writer = _writer(packages, PACKAGE_COLUMNS, format)
+    resource_writer = None
+    if resources is not None:
+        resource_writer = _writer(resources, RESOURCE_COLUMNS, format)
+    package_count = resource_count = 0
+    batch = []
+    batch_resources = 0
+    try:
+        for fddict in fddicts:
+            batch.append(fddict)
+            batch_resources += len(fddict.get('resources') or ())
+            if (len(batch) >= row_group_size or
+                    batch_resources >= row_group_size):
+                resource_count += _write_batch(batch, package_writer,
+                                               resource_writer)
+                package_count += len(batch)
+                batch = []
+                batch_resources = 0
+        if batch or not package_count:
+            # an empty export still gets its header or schema
+            resource_count += _write_batch(batch, package_writer,
+                                           resource_writer)
+            package_count += len(batch)
+    finally:
+        package_writer.close()
+        if resource_writer is not None:
+            resource_writer.close()
+    return package_count, resource_count
+
+
+def _write_batch(batch, package_writer, resource_writer):
+    '''Write a batch of packages, return the number of its resources.'''
+    package_columns, resource_columns = columns(batch)
+    package_writer.write(package_columns)
+    if resource_writer is not None:
+        resource_writer.write(resource_columns)
+    return len(resource_columns['package_id'])
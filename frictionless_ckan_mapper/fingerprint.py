@@ -0,0 +1,114 @@
+# coding=utf-8
+'''Stable fingerprints of packages, to dedupe them across mirrors.
+
+    if fingerprint.fingerprint(fdpackage) != known[fdpackage['name']]:
+        ...
+
+The fingerprint is a BLAKE2b digest of a canonical serialization of the
+package:
+
+* keys are sorted, so key order doesn't matter;
+* volatile keys (`VOLATILE_KEYS`: timestamps, revision ids, resource
+  positions...) of the package and of its resources are left out;
+* the package is first brought to one form, the Frictionless package it
+  converts to: `ckan_to_frictionless.dataset(frictionless_to_ckan.package(
+  package))`. CKAN packages go through `package` unchanged but for their
+  unknown keys, packed in extras, and Frictionless packages come back the
+  same but for what CKAN can't hold. So a package, Frictionless or CKAN,
+  hashes like its conversion, and the order and JSON formatting of extras
+  don't matter.
+
+The canonical serialization is the compact JSON of the normalized package
+with sorted keys. It is fed to the hash a few dozen resources at a time
+instead of being built as a whole. The standard `json` module serializes
+whatever the JSON backend: fingerprints must not depend on what is
+installed.
+'''
+import hashlib
+import json
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+# Keys that change without the content of a package or resource changing
+VOLATILE_KEYS = frozenset([
+    'cache_last_updated',
+    'cache_url',
+    'metadata_created',
+    'metadata_modified',
+    'position',
+    'revision_id',
+    'revision_timestamp',
+    'tracking_summary',
+])
+
+# Resources serialized at a time
+RESOURCES_PER_CHUNK = 64
+
+_encoder = json.JSONEncoder(sort_keys=True, separators=(',', ':'))
+
+
+def _dumps(value):
+    return _encoder.encode(value).encode('utf-8')
+
+
+def _without(resource, volatile):
+    if isinstance(resource, dict) and not volatile.isdisjoint(resource):
+        return {key: value for key, value in resource.items()
+                if key not in volatile}
+    return resource
+
+
+def normalized(package):
+    '''Return `package`, Frictionless or CKAN, as the Frictionless package
+    it converts to.'''
+    package = dict(package)
+    # `package` adds to the extras list in place
+    if isinstance(package.get('extras'), list):
+        package['extras'] = list(package['extras'])
+    ckandict = frictionless_to_ckan.package(package)
+    # `dataset` fills in the first license in place, and needs one
+    licenses = ckandict.get('licenses')
+    ckandict['licenses'] = [dict(licenses[0])] + licenses[1:] \
+        if licenses else [{}]
+    # the resources are the new ones of `package`
+    return ckan_to_frictionless.dataset(ckandict, inplace=True)
+
+
+def canonical(package, volatile=VOLATILE_KEYS):
+    '''Yield the canonical serialization of `package` in chunks of bytes.
+
+    `volatile` are keys of the normalized (Frictionless) package and
+    resources.
+    '''
+    items = {key: value for key, value in normalized(package).items()
+             if key not in volatile}
+
+    resources = items.get('resources')
+    if not isinstance(resources, list) or not resources:
+        yield _dumps(items)
+        return
+    # the other keys sort before or after 'resources', encode each side at
+    # once and the resources by chunks in between
+    before = _dumps({key: value for key, value in items.items()
+                     if key < 'resources'})
+    after = _dumps({key: value for key, value in items.items()
+                    if key > 'resources'})
+    yield before[:-1] + (b',' if len(before) > 2 else b'') + b'"resources":'
+    for start in range(0, len(resources), RESOURCES_PER_CHUNK):
+        chunk = _dumps([_without(resource, volatile) for resource in
+                        resources[start:start + RESOURCES_PER_CHUNK]])
+        yield (b',' if start else b'[') + chunk[1:-1]
+    yield b']' + (b',' + after[1:] if len(after) > 2 else b'}')
+
+
+def fingerprint(package, volatile=VOLATILE_KEYS, digest_size=16):
+    '''Return the fingerprint of `package` as a hex string.
+
+    `package` is a Frictionless or a CKAN package. `volatile` are the keys
+    left out, `digest_size` the size of the BLAKE2b digest in bytes.
+    '''
+    digest = hashlib.blake2b(digest_size=digest_size)
+    for chunk in canonical(package, volatile):
+        digest.update(chunk)
+    return digest.hexdigest()
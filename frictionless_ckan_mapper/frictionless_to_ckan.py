@@ -1,10 +1,14 @@
 # coding=utf-8
+import functools
 import json
 
-try:
-    json_parse_exception = json.decoder.JSONDecodeError
-except AttributeError:  # Testing against Python 2
-    json_parse_exception = ValueError
+from frictionless_ckan_mapper import instrument
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import mapping
+from frictionless_ckan_mapper import metrics
+from frictionless_ckan_mapper import parallel
+
+json_parse_exception = json.decoder.JSONDecodeError
 
 
 resource_mapping = {
@@ -55,27 +59,63 @@ frictionless_package_keys_to_exclude = [
     'extras'
 ]
 
+# Keys kept at the root of the CKAN package, everything else goes in extras
+_root_keys = frozenset(ckan_package_keys +
+                       frictionless_package_keys_to_exclude)
+
+
+def compile_resource(extra_mapping=None):
+    '''Return a Frictionless to CKAN resource converter.
+
+    `resource_mapping` is compiled once, together with the user supplied
+    `extra_mapping` ({frictionless key: ckan key}) if any, into a function
+    with the same signature as `resource`.
+    '''
+    return mapping.compile_mapping(resource_mapping,
+                                   extra_mapping=extra_mapping)
+
+
+_resource = compile_resource()
+_package_keys = mapping.compile_mapping(package_mapping)
 
-def resource(fddict):
+# Converters compiled for user supplied extra mappings, kept by the items of
+# the mapping
+COMPILED_CACHE_SIZE = 64
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compiled_resource(extra_items):
+    return compile_resource(dict(extra_items))
+
+
+@functools.lru_cache(maxsize=COMPILED_CACHE_SIZE)
+def _compiled_package_keys(extra_items):
+    return mapping.compile_mapping(package_mapping,
+                                   extra_mapping=dict(extra_items))
+
+
+def resource(fddict, inplace=False, extra_mapping=None):
     '''Convert a Frictionless resource to a CKAN resource.
 
     # TODO: (the following is inaccurate)
 
     1. Map keys from Frictionless to CKAN (and reformat if needed).
     2. Apply special formatting (if any) for key fields e.g. slugify.
-    '''
-    resource = dict(fddict)
 
-    # Remap differences from Frictionless to CKAN resource
-    for key, value in resource_mapping.items():
-        if key in resource:
-            resource[value] = resource[key]
-            del resource[key]
+    With `inplace=True` `fddict` itself is converted and returned instead of a
+    copy.
 
-    return resource
+    `extra_mapping` ({frictionless key: ckan key}) maps additional keys, see
+    `compile_resource`. The converter is compiled once per mapping.
+    '''
+    if extra_mapping:
+        return _compiled_resource(tuple(extra_mapping.items()))(fddict,
+                                                                 inplace)
+    return _resource(fddict, inplace)
 
 
-def package(fddict):
+def package(fddict, inplace=False, extra_mapping=None,
+            extra_resource_mapping=None):
     '''Convert a Frictionless package to a CKAN package (dataset).
 
     # TODO: (the following is inaccurate)
@@ -83,18 +123,36 @@ def package(fddict):
     1. Map keys from Frictionless to CKAN (and reformat if needed).
     2. Apply special formatting (if any) for key fields.
     3. Copy extras across inside the "extras" key.
+
+    With `inplace=True` `fddict` and its resources are converted and returned
+    instead of copies.
+
+    `extra_mapping` ({frictionless key: ckan key}) renames additional keys
+    of the package along with `package_mapping`, before extras are made,
+    and `extra_resource_mapping` additional keys of its resources (see
+    `resource`). See `compile_package` for a converter bound to them.
     '''
-    outdict = dict(fddict)
+    watch = instrument.stopwatch()
+    collector = metrics.current
+    if collector is not None:
+        events = collector.events
+    outdict = fddict if inplace else dict(fddict)
 
     # Map data package keys
-    for key, value in package_mapping.items():
-        if key in fddict:
-            outdict[value] = fddict[key]
-            del outdict[key]
+    if extra_mapping:
+        _compiled_package_keys(tuple(extra_mapping.items()))(outdict, True)
+    else:
+        _package_keys(outdict, True)
+    if watch:
+        watch.lap('package.keys')
 
     # map resources inside dataset
-    if 'resources' in fddict:
-        outdict['resources'] = [resource(res) for res in fddict['resources']]
+    if 'resources' in outdict:
+        outdict['resources'] = [
+            resource(res, inplace, extra_mapping=extra_resource_mapping)
+            for res in outdict['resources']]
+        if watch:
+            watch.lap('package.resources', len(outdict['resources']))
 
     if 'licenses' in outdict and outdict['licenses']:
         outdict['license_id'] = outdict['licenses'][0].get('name')
@@ -103,6 +161,8 @@ def package(fddict):
         # remove it so it won't get put in extras
         if len(outdict['licenses']) == 1:
             outdict.pop('licenses', None)
+    if watch:
+        watch.lap('package.licenses')
 
     if outdict.get('contributors'):
         for c in outdict['contributors']:
@@ -136,27 +196,66 @@ def package(fddict):
                     ['author', 'author']))
                     ):
             outdict.pop('contributors', None)
+    if watch:
+        watch.lap('package.contributors')
 
     if outdict.get('keywords'):
         outdict['tags'] = [
             {'name': keyword} for keyword in outdict['keywords']
         ]
         del outdict['keywords']
+    if watch:
+        watch.lap('package.tags')
 
-    final_dict = dict(outdict)
-    for key, value in outdict.items():
-        if (
-            key not in ckan_package_keys and
-            key not in frictionless_package_keys_to_exclude
-        ):
+    # iterating over a snapshot of the items as outdict is changed in the loop
+    for key, value in list(outdict.items()):
+        if key not in _root_keys:
+            metrics.incr('package.extra_spilled')
             if isinstance(value, (dict, list)):
-                value = json.dumps(value)
-            if not final_dict.get('extras'):
-                final_dict['extras'] = []
-            final_dict['extras'].append(
+                metrics.incr('package.extra_json_encoded')
+                value = json_backend.dumps(value)
+            if not outdict.get('extras'):
+                outdict['extras'] = []
+            outdict['extras'].append(
                 {'key': key, 'value': value}
             )
-            del final_dict[key]
-    outdict = dict(final_dict)
+            del outdict[key]
+    if watch:
+        watch.lap('package.extras', len(outdict.get('extras', ())))
+    if collector is not None:
+        collector.converted('package', outdict.get('name'), events)
 
     return outdict
+
+
+def compile_package(extra_mapping=None, extra_resource_mapping=None):
+    '''Return a Frictionless to CKAN package converter mapping additional
+    keys.
+
+    The converter takes the arguments of `package`, with `extra_mapping`
+    and `extra_resource_mapping` bound (see `package`), whose tables are
+    compiled once. Unlike a closure it can be pickled, for `packages` or the
+    `convert` argument of `store`.
+    '''
+    extra_mapping = dict(extra_mapping or {})
+    extra_resource_mapping = dict(extra_resource_mapping or {})
+    if extra_mapping:
+        _compiled_package_keys(tuple(extra_mapping.items()))
+    if extra_resource_mapping:
+        _compiled_resource(tuple(extra_resource_mapping.items()))
+    return functools.partial(package, extra_mapping=extra_mapping,
+                             extra_resource_mapping=extra_resource_mapping)
+
+
+def packages(fddicts, workers=None, chunksize=1, ordered=True,
+             convert=None):
+    '''Convert many Frictionless packages to CKAN packages (datasets).
+
+    Runs `package` (or `convert`, e.g. a converter of `compile_package`)
+    over `fddicts` (any iterable) on a pool of `workers` processes and
+    returns a generator of CKAN packages. See `parallel.map_records` for the
+    meaning of `chunksize` and `ordered`.
+    '''
+    return parallel.map_records(convert or package, fddicts,
+                                workers=workers, chunksize=chunksize,
+                                ordered=ordered)
@@ -0,0 +1,65 @@
+# coding=utf-8
+'''Harvest a CKAN portal into Frictionless packages.
+
+Pages of `package_search` (or `package_show` calls for a list of ids) are
+fetched concurrently over a pool of keep-alive connections and every package
+is converted with `ckan_to_frictionless.dataset` as soon as its page arrives:
+
+    async for fdpackage in harvest('https://demo.ckan.org', concurrency=8):
+        ...
+
+Packages come in the order their page arrives, not in search order.
+'''
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper.client import Client, as_completed
+
+
+def _search_pages(client, count, rows, params):
+    for start in range(rows, count, rows):
+        yield lambda start=start: client.action(
+            'package_search', start=start, rows=rows, **params)
+
+
+def _show_calls(client, ids):
+    for package_id in ids:
+        yield lambda package_id=package_id: client.action(
+            'package_show', id=package_id)
+
+
+async def harvest(base_url, ids=None, rows=100, concurrency=8, params=None,
+                  convert=ckan_to_frictionless.dataset, client=None):
+    '''Yield the packages of a CKAN portal converted to Frictionless.
+
+    * Without `ids` all the packages matching `package_search` (with extra
+      `params` such as `q`, `fq` or `sort`) are harvested, `rows` per page.
+      Pass a `sort` on a unique key (e.g. 'id asc') for stable pages on a
+      portal that changes during the harvest.
+    * With `ids` (package ids or names) each package is fetched with
+      `package_show`.
+    * At most `concurrency` requests run at a time.
+    * `convert` is applied to each CKAN package, use `None` to get the CKAN
+      packages as is.
+    * `client` is a `client.Client` to use instead of a new one with
+      `max_connections=concurrency`; it is left open.
+
+    Raises `client.CKANError` if a request fails after all its retries.
+    '''
+    own_client = client is None
+    if own_client:
+        client = Client(base_url, max_connections=concurrency)
+    params = params or {}
+    try:
+        if ids is not None:
+            calls = _show_calls(client, ids)
+        else:
+            first = await client.action('package_search', start=0, rows=rows,
+                                        **params)
+            for ckandict in first['results']:
+                yield convert(ckandict) if convert else ckandict
+            calls = _search_pages(client, first['count'], rows, params)
+        async for result in as_completed(calls, concurrency):
+            for ckandict in result['results'] if ids is None else [result]:
+                yield convert(ckandict) if convert else ckandict
+    finally:
+        if own_client:
+            client.close()
@@ -0,0 +1,334 @@
+# coding=utf-8
+'''Inverted indexes over converted packages, to find packages without a scan.
+
+A `CatalogIndex` is fed the output of `ckan_to_frictionless.dataset` and
+maps the values of a few fields to the packages having them:
+
+    catalog_index = index.build(fdpackages)
+    catalog_index.search(keywords='water', license='cc-by')
+    catalog_index.count(format='CSV')
+
+    catalog_index.add(fdpackage)    # a new or changed package
+    catalog_index.remove(package_id)
+
+The indexed fields (`FIELDS`) are `keywords`, `license` (the name of the
+first of `licenses`), the `format` and `mediatype` of the resources and
+`owner_org`. Values are matched exactly: a package with a 'CSV' and a
+'csv' resource is found by both. `search` returns the ids (or names, for
+packages without an id) of the packages matching all the criteria, in the
+order they were added.
+
+Packages are numbered as they are added and each value has a sorted
+`array('I')` of package numbers. A changed or removed package leaves its
+number behind as a tombstone, skipped by queries; once tombstones are half
+of the numbers given, the arrays are rewritten without them. Values of
+`DENSE` packages or more get bitmaps of their packages, built on first use
+and kept up to date. Queries on several values AND the bitmaps of the
+dense ones, and walk the shortest array against the result unless it is
+dense too. The AND is skipped for a short array in a big catalog (fewer
+numbers than bitmap bytes / `AND_BYTES`), which tests its numbers one by
+one against the bitmaps.
+'''
+import bisect
+import re
+from array import array
+
+FIELDS = ('keywords', 'license', 'format', 'mediatype', 'owner_org')
+
+# Tombstones are only purged once there are at least this many
+MIN_PURGE = 1000
+
+# Values of at least this many packages get a bitmap of their packages for
+# intersections, built on first use
+DENSE = 1024
+
+# Bitmap bytes ANDed for the cost of testing one number against the bitmaps
+AND_BYTES = 128
+
+_nonzero = re.compile(b'[^\x00]')
+
+
+def _license(fddict):
+    licenses = fddict.get('licenses')
+    if licenses and isinstance(licenses[0], dict):
+        name = licenses[0].get('name')
+        if name:
+            yield name
+
+
+def _keywords(fddict):
+    seen = set()
+    for keyword in fddict.get('keywords') or ():
+        if keyword not in seen:
+            seen.add(keyword)
+            yield keyword
+
+
+def _resource_values(key):
+    def values(fddict):
+        seen = set()
+        for resource in fddict.get('resources') or ():
+            value = resource.get(key)
+            if value and value not in seen:
+                seen.add(value)
+                yield value
+    return values
+
+
+def _owner_org(fddict):
+    value = fddict.get('owner_org')
+    if value:
+        yield value
+
+
+# field: function returning the values of a package
+_extractors = {
+    'keywords': _keywords,
+    'license': _license,
+    'format': _resource_values('format'),
+    'mediatype': _resource_values('mediatype'),
+    'owner_org': _owner_org,
+}
+
+
+def _key(fddict):
+    return fddict.get('id') or fddict.get('name')
+
+
+class CatalogIndex(object):
+    '''Inverted indexes of `FIELDS` over packages.'''
+
+    def __init__(self):
+        # field => value => sorted numbers of the packages with the value
+        self.postings = {field: {} for field in FIELDS}
+        # number => id (or name) of the package, None for tombstones
+        self._keys = []
+        # id (or name) => number
+        self._numbers = {}
+        self._tombstones = 0
+        # bit n is set if package number n is not a tombstone
+        self._alive = bytearray()
+        # (field, value) => bitmap of the packages with the value
+        self._bitmaps = {}
+
+    def __len__(self):
+        return len(self._numbers)
+
+    def __contains__(self, key):
+        return key in self._numbers
+
+    def add(self, fddict):
+        '''Index package `fddict`, replacing the package with its id (or
+        name) if any.'''
+        key = _key(fddict)
+        if not key:
+            raise ValueError('A package needs an id or a name to be indexed')
+        if key in self._numbers:
+            self._bury(key)
+        number = len(self._keys)
+        self._keys.append(key)
+        self._numbers[key] = number
+        _set_bit(self._alive, number)
+        bitmaps = self._bitmaps
+        for field, values in _extractors.items():
+            postings = self.postings[field]
+            for value in values(fddict):
+                numbers = postings.get(value)
+                if numbers is None:
+                    numbers = postings[value] = array('I')
+                # numbers only grow: the array stays sorted
+                numbers.append(number)
+                if bitmaps:
+                    bitmap = bitmaps.get((field, value))
+                    if bitmap is not None:
+                        _set_bit(bitmap, number)
+        self._purge_if_needed()
+
+    def remove(self, key):
+        '''Forget the package of id (or name) `key`. Raises KeyError if
+        missing.'''
+        if key not in self._numbers:
+            raise KeyError(key)
+        self._bury(key)
+        self._purge_if_needed()
+
+    def _bury(self, key):
+        number = self._numbers.pop(key)
+        self._keys[number] = None
+        self._alive[number >> 3] &= ~(1 << (number & 7))
+        self._tombstones += 1
+
+    def _purge_if_needed(self):
+        if (self._tombstones >= MIN_PURGE and
+                self._tombstones * 2 >= len(self._keys)):
+            self.purge()
+
+    def purge(self):
+        '''Rewrite the arrays without tombstones and renumber packages.'''
+        renumbered = array('I', [0]) * len(self._keys)
+        keys = []
+        for number, key in enumerate(self._keys):
+            if key is not None:
+                renumbered[number] = len(keys)
+                keys.append(key)
+        alive = self._keys
+        for postings in self.postings.values():
+            for value in list(postings):
+                numbers = array('I', [renumbered[number]
+                                      for number in postings[value]
+                                      if alive[number] is not None])
+                if numbers:
+                    postings[value] = numbers
+                else:
+                    del postings[value]
+        self._keys = keys
+        self._numbers = {key: number for number, key in enumerate(keys)}
+        self._tombstones = 0
+        self._alive = bytearray(b'\xff') * (len(keys) // 8)
+        if len(keys) % 8:
+            self._alive.append((1 << len(keys) % 8) - 1)
+        self._bitmaps = {}
+
+    def _lists(self, criteria):
+        '''Return the (field, value, numbers) of `criteria`, shortest
+        first, or [] if a value has no package.'''
+        lists = []
+        for field, value in criteria.items():
+            if field not in self.postings:
+                raise ValueError('Not an indexed field: {}'.format(field))
+            numbers = self.postings[field].get(value)
+            if not numbers:
+                return []
+            lists.append((field, value, numbers))
+        if not lists:
+            raise ValueError('At least one criterion is needed')
+        lists.sort(key=lambda item: len(item[2]))
+        return lists
+
+    def _bitmap(self, field, value):
+        bitmap = self._bitmaps.get((field, value))
+        if bitmap is None:
+            bitmap = self._bitmaps[field, value] = bytearray(
+                (len(self._keys) + 7) // 8)
+            for number in self.postings[field][value]:
+                bitmap[number >> 3] |= 1 << (number & 7)
+        return bitmap
+
+    def _matches(self, lists):
+        '''Generate the numbers of the packages in all `lists`.'''
+        if not lists:
+            return
+        if len(lists) > 1 and len(lists[0][2]) >= DENSE:
+            # only frequent values: AND their bitmaps
+            bits = self._and(lists).to_bytes(len(self._alive), 'little')
+            for match in _nonzero.finditer(bits):
+                position = match.start()
+                byte = bits[position]
+                for bit in range(8):
+                    if byte >> bit & 1:
+                        yield position * 8 + bit
+            return
+        numbers = lists[0][2]
+        dense = [item for item in lists[1:] if len(item[2]) >= DENSE]
+        tests = [_bisect_test(item[2]) for item in lists[1:]
+                 if len(item[2]) < DENSE]
+        if dense and len(numbers) * AND_BYTES >= len(self._alive):
+            # AND the frequent values once, tombstones included, then test
+            # each number with a byte lookup
+            bits = self._and(dense).to_bytes(len(self._alive), 'little')
+            candidates = (number for number in numbers
+                          if bits[number >> 3] >> (number & 7) & 1)
+        else:
+            tests.extend(_bit_test(self._bitmap(field, value))
+                         for field, value, _ in dense)
+            keys = self._keys
+            candidates = (number for number in numbers
+                          if keys[number] is not None)
+        if not tests:
+            yield from candidates
+            return
+        for number in candidates:
+            if all(test(number) for test in tests):
+                yield number
+
+    def search(self, limit=None, **criteria):
+        '''Return the ids (or names) of the packages matching all
+        `criteria`, field=value, e.g. `search(format='CSV')`.
+
+        Returns the first `limit` packages only if given.
+        '''
+        keys = self._keys
+        out = []
+        for number in self._matches(self._lists(criteria)):
+            out.append(keys[number])
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def count(self, **criteria):
+        '''Return the number of packages matching all `criteria`.'''
+        lists = self._lists(criteria)
+        if not lists:
+            return 0
+        if len(lists) == 1 and not self._tombstones:
+            return len(lists[0][2])
+        if len(lists[0][2]) < DENSE:
+            return sum(1 for _ in self._matches(lists))
+        return _bit_count(self._and(lists))
+
+    def _and(self, lists):
+        '''Return the bits of the packages in all `lists`, as an int.'''
+        bits = int.from_bytes(self._alive, 'little')
+        for field, value, numbers in lists:
+            bits &= int.from_bytes(self._bitmap(field, value), 'little')
+        return bits
+
+    def values(self, field):
+        '''Return {value: number of packages} of `field`.'''
+        if not self._tombstones:
+            return {value: len(numbers)
+                    for value, numbers in self.postings[field].items()}
+        return {value: self.count(**{field: value})
+                for value in self.postings[field]}
+
+
+def _set_bit(bitmap, number):
+    position = number >> 3
+    if position >= len(bitmap):
+        bitmap.extend(bytes(position + 1 - len(bitmap)))
+    bitmap[position] |= 1 << (number & 7)
+
+
+def _bit_test(bitmap):
+    size = len(bitmap) * 8
+
+    def test(number):
+        return number < size and bitmap[number >> 3] >> (number & 7) & 1
+    return test
+
+
+def _bisect_test(numbers):
+    # the numbers tested grow: start the search where the last one ended
+    state = [0]
+    end = len(numbers)
+
+    def test(number):
+        position = state[0] = bisect.bisect_left(numbers, number, state[0])
+        return position < end and numbers[position] == number
+    return test
+
+
+def _bit_count(bits):
+    try:
+        return bits.bit_count()
+    except AttributeError:
+        # Python < 3.10
+        return bin(bits).count('1')
+
+
+def build(fddicts):
+    '''Return the `CatalogIndex` of packages `fddicts`.'''
+    catalog_index = CatalogIndex()
+    for fddict in fddicts:
+        catalog_index.add(fddict)
+    return catalog_index
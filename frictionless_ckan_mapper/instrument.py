@@ -0,0 +1,127 @@
+# coding=utf-8
+'''Opt-in per stage timings of the converters.
+
+`dataset` and `package` time each of their stages (extras decoding, resource
+conversion and naming, licenses...) when instrumentation is enabled:
+
+    with instrument.enabled() as timings:
+        for ckandict in ckandicts:
+            ckan_to_frictionless.dataset(ckandict)
+    print(timings.summary())
+
+`enabled` also takes a callback, `callback(stage, seconds, count)` is then
+called after every stage instead. When disabled the converters only check
+for a stopwatch once per stage.
+
+Stages are named after the function they belong to: `dataset.*`,
+`resource.*` (per resource, within `dataset`) and `package.*`. They do not
+overlap, except `resource.slugify` which is part of `resource.convert`.
+
+Timings are recorded in the current process only, not in the worker
+processes of `datasets` and `packages`.
+'''
+import contextlib
+import time
+
+clock = time.perf_counter
+
+# callback(stage, seconds, count) receiving the timings, None when disabled
+recorder = None
+
+
+class Stopwatch(object):
+    '''Time consecutive stages, starting now.'''
+
+    def __init__(self, record):
+        self.record = record
+        self.last = clock()
+
+    def lap(self, stage, count=1):
+        '''Record the time since the previous lap as `stage`, which processed
+        `count` items (extras, resources...).'''
+        now = clock()
+        self.record(stage, now - self.last, count)
+        self.last = now
+
+
+def stopwatch():
+    '''Return a `Stopwatch`, or None when disabled.'''
+    if recorder is None:
+        return None
+    return Stopwatch(recorder)
+
+
+class Timings(object):
+    '''Aggregate the timings of each stage.
+
+    `stages` is {stage: [calls, items, total seconds, max seconds]}.
+    '''
+
+    def __init__(self):
+        self.stages = {}
+
+    def __call__(self, stage, seconds, count=1):
+        stats = self.stages.get(stage)
+        if stats is None:
+            self.stages[stage] = [1, count, seconds, seconds]
+        else:
+            stats[0] += 1
+            stats[1] += count
+            stats[2] += seconds
+            if seconds > stats[3]:
+                stats[3] = seconds
+
+    def reset(self):
+        self.stages.clear()
+
+    def summary(self):
+        '''Return a table of the stages, slowest first.'''
+        lines = ['{:<28} {:>8} {:>10} {:>10} {:>10} {:>10}'.format(
+            'stage', 'calls', 'items', 'total ms', 'mean us', 'max us')]
+        for stage, (calls, items, seconds, longest) in sorted(
+                self.stages.items(), key=lambda item: -item[1][2]):
+            lines.append(
+                '{:<28} {:>8} {:>10} {:>10.2f} {:>10.2f} {:>10.2f}'.format(
+                    stage, calls, items, seconds * 1e3,
+                    seconds / calls * 1e6, longest * 1e6))
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix='frictionless_ckan_mapper'):
+        '''Return the timings in the Prometheus text exposition format.'''
+        metrics = [
+            ('stage_seconds_total', 'counter',
+             'Time spent in each conversion stage.', 2),
+            ('stage_calls_total', 'counter',
+             'Number of times each conversion stage ran.', 0),
+            ('stage_items_total', 'counter',
+             'Number of items processed by each conversion stage.', 1),
+            ('stage_max_seconds', 'gauge',
+             'Longest run of each conversion stage.', 3),
+        ]
+        lines = []
+        for name, kind, help_text, index in metrics:
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} {}'.format(name, kind))
+            for stage, stats in sorted(self.stages.items()):
+                lines.append('{}{{stage="{}"}} {!r}'.format(
+                    name, stage, stats[index]))
+        return '\n'.join(lines) + '\n'
+
+
+@contextlib.contextmanager
+def enabled(callback=None):
+    '''Enable instrumentation in a `with` block.
+
+    Timings go to `callback(stage, seconds, count)` if given, else to a new
+    `Timings` aggregator. Yields the callback or aggregator.
+    '''
+    global recorder
+    if callback is None:
+        callback = Timings()
+    previous = recorder
+    recorder = callback
+    try:
+        yield callback
+    finally:
+        recorder = previous
@@ -0,0 +1,161 @@
+# coding=utf-8
+'''Pluggable JSON backend for extras decoding and encoding.
+
+`loads` and `dumps` use `orjson` or `ujson` when installed and the standard
+library `json` module otherwise. Results are always identical to `json.loads`
+and `json.dumps` with default arguments (but for the `default` of `dumps`):
+
+* whenever the fast backend fails (NaN, out of range floats, lone surrogates,
+  invalid JSON, non string input...) the standard library decides, so the
+  same values and the same exceptions come out.
+* numbers with 19 digits or more go to the standard library, fast backends
+  may turn big integers into floats.
+* a backend is only used for a direction if it passes a set of probes
+  comparing its output with the standard library. orjson has no way to emit
+  `json.dumps` separators and ASCII escapes, so encoding with orjson
+  installed still uses the standard library.
+
+The backend is picked on first use, so that importing this module does not
+import the (slow to import) fast backends. Set the
+`FRICTIONLESS_CKAN_MAPPER_JSON` environment variable to 'orjson', 'ujson' or
+'json' or call `use(name)` to select one explicitly.
+
+Callers must go through the module, i.e. `json_backend.loads(value)`, as
+`use` rebinds `loads` and `dumps`.
+'''
+import json
+import os
+
+from frictionless_ckan_mapper import metrics
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+ENV_VAR = 'FRICTIONLESS_CKAN_MAPPER_JSON'
+
+# Digits are mapped to '0' so that a run of 19 digits can be found with a
+# plain substring search, a regex is several times slower than the backends.
+_digits_to_zero = bytes.maketrans(b'123456789', b'000000000')
+_long_number = b'0' * 19
+
+_loads_probes = [
+    '{"a": 1, "b": [1.5, -0.0, 1e-7, 1E5, 3.141592653589793], "a": 2}',
+    '[0.1, 2.2250738585072014e-308, -1.7976931348623157e308, 5e-324]',
+    '{"\\u00e9": "\\ud83d\\ude00\\n\\"", "x": null, "y": true, "z": false}',
+    '[9007199254740993, -9223372036854775808, 18446744073709551615]',
+    '12345678901234567890123',
+    ' [1, [2, [3, {}]]] ',
+]
+
+_dumps_probes = [
+    {'a': [1, 2.5, -0.0, 1e16, 1e-7, 0.1, None, True, False]},
+    {u'é': u'ü /\U0001f600\x00', 'b': {'c': []}, '1': ''},
+    [12345678901234567890123, 3.141592653589793, 1.7976931348623157e308],
+]
+
+# name of the backend used by `loads` and `dumps`, None until first use
+loads_backend = None
+dumps_backend = None
+
+
+def _guarded_loads(fast_loads):
+    def loads(value):
+        if not isinstance(value, str):
+            return json.loads(value)
+        if _long_number in value.encode(
+                'utf-8', 'surrogatepass').translate(_digits_to_zero):
+            metrics.incr('json_backend.fallback')
+            return json.loads(value)
+        try:
+            return fast_loads(value)
+        except Exception:
+            # invalid JSON raises here and is not counted
+            value = json.loads(value)
+            metrics.incr('json_backend.fallback')
+            return value
+    return loads
+
+
+def _guarded_dumps(fast_dumps):
+    def dumps(value, default=None):
+        try:
+            return fast_dumps(value, default=default)
+        except Exception:
+            metrics.incr('json_backend.fallback')
+            return json.dumps(value, default=default)
+    return dumps
+
+
+def _candidates(name):
+    '''Return the (loads, dumps) of backend `name`, None where the backend
+    cannot be used. Raises ImportError if it is not installed.'''
+    if name == 'json':
+        return json.loads, json.dumps
+    if name == 'orjson':
+        import orjson
+        return _guarded_loads(orjson.loads), None
+    if name == 'ujson':
+        import ujson
+
+        def ujson_dumps(value, default=None):
+            # older versions of ujson have no `default`
+            extra = {} if default is None else {'default': default}
+            return ujson.dumps(value, ensure_ascii=True,
+                               escape_forward_slashes=False,
+                               separators=(', ', ': '), **extra)
+        return _guarded_loads(ujson.loads), _guarded_dumps(ujson_dumps)
+    raise ValueError('Unknown JSON backend: {}'.format(name))
+
+
+def _passes(func, probes, reference):
+    # probes are not conversions, don't count their fallbacks
+    collector, metrics.current = metrics.current, None
+    try:
+        return all(repr(func(probe)) == repr(reference(probe))
+                   for probe in probes)
+    except Exception:
+        return False
+    finally:
+        metrics.current = collector
+
+
+def use(name=None):
+    '''Select the JSON backend.
+
+    `name` is one of `BACKENDS`. With None the environment variable or else
+    the fastest installed backend is used. Returns the (loads, dumps) backend
+    names.
+    '''
+    global loads, dumps, loads_backend, dumps_backend
+    name = name or os.environ.get(ENV_VAR)
+    names = [name] if name else BACKENDS
+    new_loads = new_dumps = None
+    for candidate in names:
+        try:
+            fast_loads, fast_dumps = _candidates(candidate)
+        except ImportError:
+            if name:
+                raise
+            continue
+        if new_loads is None and fast_loads is not None and _passes(
+                fast_loads, _loads_probes, json.loads):
+            new_loads = (candidate, fast_loads)
+        if new_dumps is None and fast_dumps is not None and _passes(
+                fast_dumps, _dumps_probes, json.dumps):
+            new_dumps = (candidate, fast_dumps)
+    loads_backend, loads = new_loads or ('json', json.loads)
+    dumps_backend, dumps = new_dumps or ('json', json.dumps)
+    return loads_backend, dumps_backend
+
+
+def loads(value):
+    '''Same as `json.loads(value)`.'''
+    # selects the backend and rebinds `loads` on first use
+    use()
+    return loads(value)
+
+
+def dumps(value, default=None):
+    '''Same as `json.dumps(value, default=default)`.'''
+    # selects the backend and rebinds `dumps` on first use
+    use()
+    return dumps(value, default=default)
@@ -0,0 +1,109 @@
+# coding=utf-8
+'''Dicts decoding their JSON values on first access.
+
+With `lazy=True`, `ckan_to_frictionless.dataset` and `resource` return a
+`LazyDict` where the JSON strings they would decode (extras and resource
+values starting with `{` or `[`, e.g. a GeoJSON `spatial` extra or an
+embedded schema) are kept as is until read:
+
+    fdpackage = ckan_to_frictionless.dataset(ckandict, lazy=True)
+    if fdpackage['name'] in wanted:     # nothing decoded
+        fdpackage['spatial']            # decoded now, and kept
+
+A `LazyDict` is a `dict` and behaves like the eagerly converted one: reading
+a value, iterating over `items()` or `values()`, comparing, copying it into
+a dict, pickling and `json.dumps` all see the decoded values, so serialized
+output is identical. Code reaching under the hood with `dict.items(d)` or
+C extensions reading the dict storage directly (e.g. `orjson.dumps`) see
+`Deferred` placeholders instead.
+'''
+
+
+class Deferred(object):
+    '''A value to decode with `decode(text)` on first access.'''
+
+    __slots__ = ('decode', 'text')
+
+    def __init__(self, decode, text):
+        self.decode = decode
+        self.text = text
+
+    def __reduce__(self):
+        return Deferred, (self.decode, self.text)
+
+    def __repr__(self):
+        return 'Deferred({!r})'.format(self.text[:40])
+
+
+class LazyDict(dict):
+    '''dict whose `Deferred` values are decoded when first read.'''
+
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if type(value) is Deferred:
+            value = value.decode(value.text)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            dict.__setitem__(self, key, default)
+        return self[key]
+
+    def pop(self, key, *default):
+        value = dict.pop(self, key, *default)
+        if type(value) is Deferred:
+            value = value.decode(value.text)
+        return value
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        if type(value) is Deferred:
+            value = value.decode(value.text)
+        return key, value
+
+    def decode(self):
+        '''Decode all the values now.'''
+        for key, value in dict.items(self):
+            if type(value) is Deferred:
+                dict.__setitem__(self, key, value.decode(value.text))
+
+    def items(self):
+        self.decode()
+        return dict.items(self)
+
+    def values(self):
+        self.decode()
+        return dict.values(self)
+
+    # dict(d), {**d} and update(d) copy the storage of a dict directly,
+    # unless its type overrides __iter__: then they use keys() and
+    # __getitem__
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def copy(self):
+        # a shallow copy, with the values still to decode
+        return LazyDict(dict.items(self))
+
+    def __eq__(self, other):
+        self.decode()
+        if isinstance(other, LazyDict):
+            other.decode()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        self.decode()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        return LazyDict, (list(dict.items(self)),)
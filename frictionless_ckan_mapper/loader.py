@@ -0,0 +1,349 @@
+# coding=utf-8
+'''Convert trees of `datapackage.json` files to CKAN packages.
+
+`load` finds every `datapackage.json` in a directory, a tarball or a zip
+file, converts each descriptor with `frictionless_to_ckan.package` and
+writes the CKAN packages to a file object, one JSON package per line, ready
+for `writer.write` or `package_create`:
+
+    with io.open('ckan.jsonl', 'w') as outfile:
+        report = loader.load('data-lake/', outfile, workers=4,
+                             checkpoint='loaded.txt')
+    print(report)
+
+* Descriptors are read, decoded and converted on a pool of `workers`
+  processes (see `parallel.map_records`); archives are read in the main
+  process, in a single pass.
+* Converted packages are written `BATCH_SIZE` at a time.
+* The location of each descriptor converted (its path in the directory or
+  archive) is added to the `checkpoint` file once its package is written;
+  a run started again with the same checkpoint skips them. A crash between
+  the two may write the packages of the last batch twice, and a crash while
+  writing a batch leaves its last package cut short: call
+  `drop_partial_line` on the output file before appending to it again.
+* Descriptors that can't be read, decoded or converted are written to the
+  `quarantine` file object with their location and the error, and the run
+  carries on. They are not added to the checkpoint, so the next run tries
+  them again.
+'''
+import importlib
+import io
+import json
+import os
+import time
+import traceback
+import zipfile
+
+from frictionless_ckan_mapper import bulk
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import parallel
+from frictionless_ckan_mapper.writer import Checkpoint
+
+DESCRIPTOR = 'datapackage.json'
+
+# Converted packages written at a time
+BATCH_SIZE = 1000
+
+_BLOCK = 512
+_ZERO_BLOCK = bytes(_BLOCK)
+# tar types of regular files
+_FILE_TYPES = (b'0', b'\0', b'7')
+# tar types of links, devices, directories and fifos, whose size is not
+# followed by data
+_NO_DATA_TYPES = (b'1', b'2', b'3', b'4', b'5', b'6')
+# tar types of headers describing the next member: long name, long link
+# name, pax and global pax records
+_META_TYPES = (b'L', b'K', b'x', b'g')
+_KNOWN_TYPES = frozenset(_FILE_TYPES + _NO_DATA_TYPES + _META_TYPES)
+# magic number: module opening the compressed file
+_compressions = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ', 'lzma'),
+]
+
+
+class Report(bulk.Report):
+    '''Counts and timing of a load.'''
+
+    def __init__(self):
+        super(Report, self).__init__()
+        self.skipped = 0
+
+    def as_dict(self):
+        out = super(Report, self).as_dict()
+        out['skipped'] = self.skipped
+        return out
+
+    def __str__(self):
+        return '{}, {} skipped'.format(super(Report, self).__str__(),
+                                       self.skipped)
+
+
+def _is_archive(source, suffixes):
+    return os.path.isfile(source) and source.lower().endswith(suffixes)
+
+
+def iter_descriptors(source, skip=()):
+    '''Generate the (location, path, data) of the descriptors in `source`.
+
+    `source` is a directory, a tarball (.tar, .tar.gz, .tgz, .tar.bz2,
+    .tar.xz) or a zip file. For a directory `path` is the path of the file
+    and `data` None, for archives `path` is None and `data` the bytes of the
+    descriptor. `location` is the path relative to `source` (or in the
+    archive) and descriptors whose location is in `skip` are left out.
+    Directories are walked in sorted order.
+    '''
+    if os.path.isdir(source):
+        return _iter_directory(source, skip)
+    if _is_archive(source, ('.zip',)):
+        return _iter_zip(source, skip)
+    if _is_archive(source, ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2',
+                            '.tar.xz', '.txz')):
+        return _iter_tar(source, skip)
+    raise ValueError('Not a directory, tarball or zip file: {}'.format(
+        source))
+
+
+def _iter_directory(source, skip, prefix=''):
+    # os.walk and os.path.relpath cost more than reading the descriptors
+    with os.scandir(source) as scan:
+        entries = sorted(scan, key=lambda entry: entry.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            for item in _iter_directory(entry.path, skip,
+                                        prefix + entry.name + '/'):
+                yield item
+        elif entry.name == DESCRIPTOR and entry.is_file():
+            location = prefix + DESCRIPTOR
+            if location not in skip:
+                yield location, entry.path, None
+
+
+def _iter_zip(source, skip):
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            name = info.filename
+            if (name.rsplit('/', 1)[-1] == DESCRIPTOR and
+                    not info.is_dir() and name not in skip):
+                yield name, None, archive.read(info)
+
+
+def _open_archive(source):
+    '''Open a (compressed) tarball for reading.'''
+    with io.open(source, 'rb') as infile:
+        magic = infile.read(6)
+    for prefix, module in _compressions:
+        if magic.startswith(prefix):
+            return importlib.import_module(module).open(source, 'rb')
+    return io.open(source, 'rb')
+
+
+def _tar_number(field):
+    if field[0] & 0x80:
+        # GNU base-256 (sizes of 8 GB and more): two's complement big endian
+        # number in the bits after the marker bit
+        bits = len(field) * 8 - 1
+        value = int.from_bytes(field, 'big') & ((1 << bits) - 1)
+        if field[0] & 0x40:
+            value -= 1 << bits
+        return value
+    return int(field.split(b'\0', 1)[0].strip(b' ') or b'0', 8)
+
+
+def _signed_checksum(header):
+    '''Return the checksum of `header` summing signed bytes, as some old
+    tars do.'''
+    # the checksum field counts as spaces
+    return sum(byte - 256 if byte & 0x80 else byte
+               for byte in header[:148] + header[156:]) + 256
+
+
+def _pax_records(data):
+    '''Return {key: value} of pax extended header records `data`.'''
+    records = {}
+    position = 0
+    while position < len(data) and data[position:position + 1] != b'\0':
+        space = data.index(b' ', position)
+        length = int(data[position:space])
+        key, _, value = data[space + 1:position + length - 1].partition(b'=')
+        records[key] = value
+        position += length
+    return records
+
+
+def _iter_tar(source, skip):
+    # tarfile spends most of its time parsing headers: read the ustar, GNU
+    # and pax headers here, with the checksums, and only the descriptors.
+    # Other member types (e.g. GNU sparse files) are left to tarfile.
+    members = 0
+    with _open_archive(source) as archive:
+        long_name = None
+        pax_size = None
+        while True:
+            header = archive.read(_BLOCK)
+            if len(header) < _BLOCK or header == _ZERO_BLOCK:
+                return
+            stored = _tar_number(header[148:156])
+            # the checksum field counts as spaces
+            if (sum(header) - sum(header[148:156]) + 256 != stored and
+                    _signed_checksum(header) != stored):
+                raise ValueError('Not a tarball, or a corrupted one: '
+                                 '{}'.format(source))
+            kind = header[156:157]
+            if kind not in _KNOWN_TYPES:
+                break
+            size = _tar_number(header[124:136])
+            if pax_size is not None and kind not in _META_TYPES:
+                size = pax_size
+            padded = -(-size // _BLOCK) * _BLOCK
+            if kind in _META_TYPES:
+                data = archive.read(padded)[:size]
+                if kind == b'L':
+                    long_name = data.split(b'\0', 1)[0]
+                elif kind == b'x':
+                    records = _pax_records(data)
+                    long_name = records.get(b'path', long_name)
+                    if b'size' in records:
+                        pax_size = int(records[b'size'])
+                continue
+            name = long_name or header[:100].split(b'\0', 1)[0]
+            if not long_name and header[257:265] == b'ustar\x0000':
+                prefix = header[345:500].split(b'\0', 1)[0]
+                if prefix:
+                    name = prefix + b'/' + name
+            long_name = pax_size = None
+            members += 1
+            name = name.decode('utf-8', 'surrogateescape')
+            if kind in _NO_DATA_TYPES:
+                continue
+            if (name.rsplit('/', 1)[-1] == DESCRIPTOR and
+                    name not in skip):
+                yield name, None, archive.read(padded)[:size]
+            elif padded:
+                archive.seek(padded, io.SEEK_CUR)
+    for item in _iter_tarfile(source, skip, members):
+        yield item
+
+
+def _iter_tarfile(source, skip, start=0):
+    '''Generate the descriptors of tarball `source` from its member number
+    `start` on, with tarfile.'''
+    import tarfile
+    with tarfile.open(source, 'r|*') as archive:
+        for number, info in enumerate(archive):
+            if (number >= start and info.isfile() and
+                    info.name.rsplit('/', 1)[-1] == DESCRIPTOR and
+                    info.name not in skip):
+                yield info.name, None, archive.extractfile(info).read()
+
+
+def convert_descriptor(item):
+    '''Return the (location, CKAN package JSON) of an item of
+    `iter_descriptors`.'''
+    location, path, data = item
+    if data is None:
+        with io.open(path, 'rb') as infile:
+            data = infile.read()
+    fddict = json_backend.loads(data.decode('utf-8-sig'))
+    return location, json_backend.dumps(frictionless_to_ckan.package(fddict))
+
+
+class _Skip(object):
+    '''Locations to skip, counting the ones skipped.'''
+
+    def __init__(self, locations):
+        self.locations = locations
+        self.hits = 0
+
+    def __contains__(self, location):
+        if location in self.locations:
+            self.hits += 1
+            return True
+        return False
+
+
+def _tolerant(item):
+    try:
+        return True, convert_descriptor(item)
+    except Exception as error:
+        return False, {
+            'location': item[0],
+            'error': '{}: {}'.format(type(error).__name__, error),
+            'traceback': traceback.format_exc(),
+        }
+
+
+def load(source, outfile, workers=1, chunksize=64, checkpoint=None,
+         quarantine=None, report=None):
+    '''Convert the descriptors of `source` and write the CKAN packages.
+
+    * `source` is a directory, tarball or zip file, see `iter_descriptors`.
+    * Packages are written to the `outfile` text file object, one per line.
+    * `workers` and `chunksize` are passed to `parallel.map_records`.
+    * `checkpoint` is the path of the file of the locations already
+      converted, if any.
+    * Failed descriptors are written to the `quarantine` file object, one
+      JSON object per line with the `location`, `error` and `traceback`.
+
+    Returns the `Report`.
+    '''
+    if report is None:
+        report = Report()
+    done = Checkpoint(checkpoint) if checkpoint is not None else None
+    skip = _Skip(done.done if done is not None else ())
+    results = parallel.map_records(_tolerant, iter_descriptors(source, skip),
+                                   workers=workers, chunksize=chunksize,
+                                   ordered=False)
+    lines = []
+    locations = []
+    try:
+        for ok, value in results:
+            if ok:
+                locations.append(value[0])
+                lines.append(value[1] + '\n')
+                report.converted += 1
+                if len(lines) >= BATCH_SIZE:
+                    _write(outfile, lines, done, locations)
+                    lines, locations = [], []
+            else:
+                report.failed += 1
+                if quarantine is not None:
+                    quarantine.write(json.dumps(value) + '\n')
+        _write(outfile, lines, done, locations)
+    finally:
+        if done is not None:
+            done.close()
+    report.skipped = skip.hits
+    report.finished = time.time()
+    return report
+
+
+def drop_partial_line(path):
+    '''Truncate the file at `path` after its last newline, if any.
+
+    Returns the number of bytes dropped, 0 if the file is missing.
+    '''
+    if not os.path.exists(path):
+        return 0
+    with io.open(path, 'r+b') as outfile:
+        size = end = outfile.seek(0, os.SEEK_END)
+        while end:
+            start = max(0, end - _BLOCK)
+            outfile.seek(start)
+            newline = outfile.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        outfile.truncate(end)
+    return size - end
+
+
+def _write(outfile, lines, done, locations):
+    outfile.write(''.join(lines))
+    if done is not None and locations:
+        # the packages must be on disk before they are marked done
+        outfile.flush()
+        done.add_many(locations)
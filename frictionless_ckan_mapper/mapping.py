@@ -0,0 +1,55 @@
+# coding=utf-8
+'''Compile key mapping tables into specialized converter functions.
+
+The converters describe their work with plain tables (`resource_mapping`,
+`resource_keys_to_remove`, ...). Those tables are compiled once into a
+converter function, together with any user supplied extra mappings, instead
+of being looked up and walked on every call.
+'''
+
+
+def compile_mapping(mapping, keys_to_remove=(), extra_mapping=None,
+                    transform=None, drop_none=False, factory=dict):
+    '''Return a function converting a dict according to the given tables.
+
+    The returned function `convert(indict, inplace=False)` copies its input
+    into a `factory` (or, with `inplace=True`, modifies and returns `indict`
+    itself) and then, in this order:
+
+    1. removes `keys_to_remove`
+    2. calls `transform(outdict)` (if given) to convert values in place
+    3. renames keys following `mapping` ({old key: new key}) and then
+       `extra_mapping` (user supplied, same format). A renamed key moves to
+       the end of the dict unless the new key is already there.
+    4. removes keys with a `None` value if `drop_none`
+
+    Stages with nothing to do are left out of the compiled function.
+    '''
+    renames = list(mapping.items())
+    if extra_mapping:
+        renames.extend(extra_mapping.items())
+    renames = tuple(renames)
+    remove = tuple(keys_to_remove)
+
+    def convert(indict, inplace=False):
+        outdict = indict if inplace else factory(indict)
+        if remove:
+            for key in remove:
+                if key in outdict:
+                    del outdict[key]
+        if transform is not None:
+            transform(outdict)
+        if renames:
+            for old, new in renames:
+                if old in outdict:
+                    outdict[new] = outdict.pop(old)
+        if drop_none:
+            # dict.items leaves the values of a lazy.LazyDict undecoded,
+            # they are never None
+            nulls = [key for key, value in dict.items(outdict)
+                     if value is None]
+            for key in nulls:
+                del outdict[key]
+        return outdict
+
+    return convert
@@ -0,0 +1,162 @@
+# coding=utf-8
+'''Opt-in counters of the fallback and degenerate paths of the converters.
+
+The converters count events such as extras that are not JSON, unnamed or
+duplicate resource names, placeholder license values or keys spilled into
+extras when a collector is enabled:
+
+    collector = metrics.Collector()
+    with metrics.enabled(collector, portal='demo.ckan.org'):
+        for ckandict in ckandicts:
+            ckan_to_frictionless.dataset(ckandict)
+    print(collector.summary())
+
+Counts are kept per portal (any label given to `enabled`, None by default)
+along with the number of converted packages, and the packages with the most
+events are kept to find the pathological ones. Events are only counted on
+the paths they describe, so the common path costs nothing, and nothing is
+logged per record.
+
+Events are counted in the current process only, not in the worker processes
+of `datasets` and `packages`.
+
+Events:
+
+* `dataset.extra_not_json`: extra value kept as a string
+* `dataset.no_license_name`, `dataset.no_license_title`,
+  `dataset.no_license_path`: placeholder license values
+* `resource.value_not_json`: resource value starting with [ or { kept as a
+  string
+* `resource.unnamed`: resource named `unnamed-resource-<n>`
+* `resource.renamed_duplicate`: resource renamed because its name is used
+  more than once, with the name kept in `original_name`
+* `package.extra_spilled`: package key moved to extras
+* `package.extra_json_encoded`: extra value encoded to JSON
+* `json_backend.fallback`: the fast JSON backend handed over to the standard
+  library
+'''
+import collections
+import contextlib
+import heapq
+
+# Collector counting the events, None when disabled
+current = None
+
+
+def incr(name, count=1):
+    '''Count `count` events `name` if a collector is enabled.'''
+    if current is not None:
+        current.incr(name, count)
+
+
+class Collector(object):
+    '''Count events per portal.
+
+    * `counts` is {(portal, event): count}
+    * `records` is {(portal, 'dataset' or 'package'): converted packages}
+    * `top` packages with the most events are kept, see `worst`
+    '''
+
+    def __init__(self, top=10):
+        self.counts = collections.Counter()
+        self.records = collections.Counter()
+        self.portal = None
+        self.events = 0
+        self.top = top
+        self._worst = []
+
+    def incr(self, name, count=1):
+        self.counts[self.portal, name] += count
+        self.events += count
+
+    def converted(self, kind, package, events):
+        '''Count a converted package, `events` is the value of `self.events`
+        before the conversion.'''
+        self.records[self.portal, kind] += 1
+        events = self.events - events
+        if events and self.top:
+            entry = (events, str(self.portal or ''), kind,
+                     str(package or ''))
+            if len(self._worst) < self.top:
+                heapq.heappush(self._worst, entry)
+            elif entry > self._worst[0]:
+                heapq.heapreplace(self._worst, entry)
+
+    def worst(self):
+        '''Return the (events, portal, kind, package name) of the packages
+        with the most events, most first.'''
+        return sorted(self._worst, reverse=True)
+
+    def totals(self):
+        '''Return {event: count} over all portals.'''
+        totals = collections.Counter()
+        for (_, name), count in self.counts.items():
+            totals[name] += count
+        return dict(totals)
+
+    def reset(self):
+        self.counts.clear()
+        self.records.clear()
+        self.events = 0
+        self._worst = []
+
+    def summary(self):
+        '''Return a table of the counts, with the rate per converted
+        package.'''
+        packages = collections.Counter()
+        for (portal, _), records in self.records.items():
+            packages[portal] += records
+        lines = ['{:<24} {:<28} {:>10} {:>10}'.format(
+            'portal', 'event', 'count', 'per pkg')]
+        for (portal, name), count in sorted(
+                self.counts.items(), key=lambda item: (str(item[0][0]),
+                                                       item[0][1])):
+            rate = (count / float(packages[portal]) if packages[portal]
+                    else 0.0)
+            lines.append('{:<24} {:<28} {:>10} {:>10.3f}'.format(
+                str(portal or '-'), name, count, rate))
+        return '\n'.join(lines)
+
+    def prometheus(self, prefix='frictionless_ckan_mapper'):
+        '''Return the counts in the Prometheus text exposition format.'''
+        lines = []
+        for name, help_text, counts, label in [
+                ('events_total', 'Fallback and degenerate conversion paths '
+                 'taken.', self.counts, 'event'),
+                ('packages_total', 'Packages converted.', self.records,
+                 'kind')]:
+            name = '{}_{}'.format(prefix, name)
+            lines.append('# HELP {} {}'.format(name, help_text))
+            lines.append('# TYPE {} counter'.format(name))
+            for (portal, value), count in sorted(
+                    counts.items(), key=lambda item: (str(item[0][0]),
+                                                      item[0][1])):
+                lines.append('{}{{portal="{}",{}="{}"}} {}'.format(
+                    name, _escape(portal or ''), label, _escape(value),
+                    count))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+@contextlib.contextmanager
+def enabled(collector=None, portal=None):
+    '''Count events in a `with` block.
+
+    Events go to `collector` (a new `Collector` if None), counted for
+    `portal`. Yields the collector.
+    '''
+    global current
+    if collector is None:
+        collector = Collector()
+    previous, previous_portal = current, collector.portal
+    current = collector
+    collector.portal = portal
+    try:
+        yield collector
+    finally:
+        collector.portal = previous_portal
+        current = previous
@@ -0,0 +1,78 @@
+# coding=utf-8
+import collections
+import itertools
+import os
+
+
+def _convert_chunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def _chunks(iterable, chunksize):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def map_records(func, iterable, workers=None, chunksize=1, ordered=True):
+    '''Apply `func` to every record of `iterable` on a pool of processes.
+
+    This is the engine behind `ckan_to_frictionless.datasets` and
+    `frictionless_to_ckan.packages`.
+
+    * `func` must be picklable, i.e. a module level function.
+    * `workers` defaults to the number of CPUs. With `workers=1` everything
+      runs in the current process and no pool is started.
+    * Records are sent to the workers in chunks of `chunksize` records.
+      Only a couple of chunks per worker are in flight at any time so the
+      input is consumed lazily and memory stays bounded on huge catalogs.
+    * With `ordered=False` results are yielded as soon as their chunk is
+      done, which keeps all the workers busy when records vary in size.
+
+    Returns a generator of converted records.
+    '''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError('workers must be at least 1')
+    if chunksize < 1:
+        raise ValueError('chunksize must be at least 1')
+
+    if workers == 1:
+        return (func(item) for item in iterable)
+    return _map_pool(func, iterable, workers, chunksize, ordered)
+
+
+def _map_pool(func, iterable, workers, chunksize, ordered):
+    # Imported here to keep `import frictionless_ckan_mapper...` cheap, this
+    # pulls in multiprocessing.
+    from concurrent import futures
+
+    max_pending = workers * 2
+    chunks = _chunks(iterable, chunksize)
+    with futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = collections.deque()
+        for chunk in itertools.islice(chunks, max_pending):
+            pending.append(executor.submit(_convert_chunk, func, chunk))
+
+        while pending:
+            if ordered:
+                done = [pending.popleft()]
+            else:
+                completed, _ = futures.wait(
+                    pending, return_when=futures.FIRST_COMPLETED)
+                done = [f for f in pending if f in completed]
+                for f in done:
+                    pending.remove(f)
+
+            # refill before yielding so the workers never wait on the
+            # consumer of the generator
+            for chunk in itertools.islice(chunks, len(done)):
+                pending.append(executor.submit(_convert_chunk, func, chunk))
+
+            for f in done:
+                for item in f.result():
+                    yield item
@@ -0,0 +1,55 @@
+# coding=utf-8
+'''Slugify CKAN resource names into Frictionless resource names.
+
+Resource names repeat a lot across a catalog ("data", "csv", "download"...)
+so slugs are kept in a bounded LRU cache. Pure ASCII names skip the
+transliteration step, and `unidecode` is only imported once a non ASCII name
+is seen.
+'''
+import functools
+import re
+
+# Number of distinct names kept in the cache
+CACHE_SIZE = 4096
+
+_separators = re.compile(r'(\||[^\w|.|\|])+')
+
+
+def _is_ascii(value):
+    try:
+        value.encode('ascii')
+    except UnicodeError:
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def slugify(name):
+    '''Return the slug of the resource `name` (a unicode string).
+
+    1. Transliterate to ASCII (only if there are non ASCII characters)
+    2. Lower case and strip
+    3. Replace runs of characters other than letters, digits, "_" and "."
+       with "-"
+
+    An empty slug becomes 'unnamed-resource'.
+    '''
+    if not _is_ascii(name):
+        # imported here as it is slow to import and rarely needed
+        import unidecode
+        name = unidecode.unidecode(name)
+    name = name.lower().strip()
+    name = _separators.sub('-', name)
+    if name == '':
+        name = 'unnamed-resource'
+    return name
+
+
+def cache_info():
+    '''Return the cache statistics (hits, misses, maxsize, currsize).'''
+    return slugify.cache_info()
+
+
+def cache_clear():
+    '''Empty the cache and reset its statistics.'''
+    slugify.cache_clear()
@@ -0,0 +1,250 @@
+# coding=utf-8
+'''Catalog of converted packages on disk, read back one package at a time.
+
+A `CatalogStore` appends packages, converted on the way in if given a
+`convert` function, to a data file of one JSON package per line and their
+`id`, `name` and offset to an index file next to it. Reading maps the data
+file in memory with `mmap`: a lookup by id or name decodes the requested
+package only.
+
+    with store.CatalogStore('catalog.jsonl',
+                            convert=ckan_to_frictionless.dataset) as catalog:
+        for ckandict in stream.iter_packages(infile):
+            catalog.add(ckandict)
+
+    catalog = store.CatalogStore('catalog.jsonl', readonly=True)
+    fdpackage = catalog.get('my-dataset')   # by name or id
+    body = catalog.raw('my-dataset')        # the JSON bytes, not decoded
+
+Both directions can be stored, `convert=frictionless_to_ckan.package` works
+the same: packages are keyed by their `id` (or `name` without an `id`) and
+found by `name` as well. Adding a package again appends its new version and
+the index points to it; `remove` forgets a package. The space of old
+versions is only given back by writing a new store.
+
+The index file holds one JSON array `[offset, id, name, end]` per package
+added (`offset` is null for removals, `end` is the size of the data file
+after the package) and is read whole on open, so its memory is that of two
+dicts of the ids and names. A store opened for writing after a
+crash drops a package written in part and indexes packages written to the
+data file only. A single process may write to a store; readers see packages
+added since they opened it after `refresh`.
+'''
+import io
+import json
+import mmap
+import os
+
+from frictionless_ckan_mapper import compact
+from frictionless_ckan_mapper import json_backend
+
+INDEX_SUFFIX = '.index'
+
+# Index entries are written once this many are pending
+FLUSH_EVERY = 1000
+
+
+class CatalogStore(object):
+    '''Append-only file of packages with an id/name index.'''
+
+    def __init__(self, path, convert=None, readonly=False):
+        self.path = path
+        self.index_path = path + INDEX_SUFFIX
+        self.convert = convert
+        self.readonly = readonly
+        # id (or name) => offset of the package in the data file
+        self._offsets = {}
+        # name => id, for packages with an id
+        self._names = {}
+        # ids of the packages added more than once, maybe renamed
+        self._updated = set()
+        # end of the last package indexed in the data file
+        self._end = 0
+        # index entries of packages not flushed yet
+        self._pending = []
+        self._index_read = 0
+        self._map = None
+        self._mapped = 0
+        if readonly:
+            self._data = io.open(path, 'rb')
+            self._index = None
+            self.refresh()
+        else:
+            self._data = io.open(path, 'a+b')
+            self._index = io.open(self.index_path, 'a+b')
+            self._recover()
+        self._data.seek(0, os.SEEK_END)
+        self._size = self._data.tell()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def __iter__(self):
+        '''Iterate over the ids (or names) of the packages.'''
+        return iter(list(self._offsets))
+
+    def __contains__(self, key):
+        return self.raw(key) is not None
+
+    def _apply(self, offset, package_id, name, end):
+        key = package_id or name
+        self._end = max(self._end, end)
+        if offset is None:
+            self._offsets.pop(key, None)
+            return
+        if package_id and name:
+            if key in self._offsets:
+                self._updated.add(package_id)
+            self._names[name] = package_id
+        self._offsets[key] = offset
+
+    def refresh(self):
+        '''Read the index entries added since the last read.'''
+        try:
+            with io.open(self.index_path, 'rb') as index:
+                index.seek(self._index_read)
+                lines = index.read().split(b'\n')
+        except IOError:
+            return
+        # the last line is empty or a line still being written
+        lines = lines[:-1]
+        self._index_read += sum(len(line) + 1 for line in lines)
+        # decoding all the lines at once is several times faster
+        entries = b','.join(line for line in lines if line)
+        for entry in json_backend.loads('[{}]'.format(
+                entries.decode('utf-8'))):
+            self._apply(*entry)
+
+    def _recover(self):
+        self.refresh()
+        # an index line written in part, dropped
+        self._index.truncate(self._index_read)
+        self._data.seek(self._end)
+        offset = self._end
+        for line in self._data:
+            if not line.endswith(b'\n'):
+                break
+            package = json_backend.loads(line.decode('utf-8'))
+            self._write_index(offset, package, offset + len(line))
+            offset += len(line)
+        # a package written in part, dropped
+        self._data.truncate(offset)
+        self._flush()
+
+    def _write_index(self, offset, package, end):
+        package_id, name = package.get('id'), package.get('name')
+        self._pending.append(json.dumps([offset, package_id, name, end]))
+        self._apply(offset, package_id, name, end)
+        if len(self._pending) >= FLUSH_EVERY:
+            self._flush()
+
+    def add(self, package):
+        '''Convert `package` with `convert` if any and append it.
+
+        Returns the package stored.
+        '''
+        if self.convert is not None:
+            package = self.convert(package)
+        if not (package.get('id') or package.get('name')):
+            raise ValueError('A package needs an id or a name to be stored')
+        line = json_backend.dumps(
+            package, default=compact.default).encode('utf-8') + b'\n'
+        offset = self._size
+        self._data.write(line)
+        self._size += len(line)
+        self._write_index(offset, package, self._size)
+        return package
+
+    def remove(self, key):
+        '''Forget the package of id or name `key`. Raises KeyError if
+        missing.'''
+        package = self.get(key)
+        if package is None:
+            raise KeyError(key)
+        package_id, name = package.get('id'), package.get('name')
+        self._pending.append(json.dumps([None, package_id, name, self._end]))
+        self._apply(None, package_id, name, self._end)
+
+    def _offset(self, key):
+        offset = self._offsets.get(key)
+        if offset is None and key in self._names:
+            offset = self._offsets.get(self._names[key])
+        return offset
+
+    def _read(self, offset):
+        if offset >= self._mapped:
+            self._remap()
+        end = self._map.find(b'\n', offset)
+        return self._map[offset:end]
+
+    def _remap(self):
+        if not self.readonly:
+            self._data.flush()
+        size = os.fstat(self._data.fileno()).st_size
+        if self._map is not None:
+            self._map.close()
+        self._map = mmap.mmap(self._data.fileno(), size,
+                              access=mmap.ACCESS_READ)
+        self._mapped = size
+
+    def raw(self, key, default=None):
+        '''Return the JSON bytes of the package of id or name `key`.'''
+        offset = self._offset(key)
+        if offset is None:
+            return default
+        data = self._read(offset)
+        if self._renamed(key, data):
+            return default
+        return data
+
+    def get(self, key, default=None):
+        '''Return the package of id or name `key`.'''
+        offset = self._offset(key)
+        if offset is None:
+            return default
+        data = self._read(offset)
+        package = json_backend.loads(data.decode('utf-8'))
+        if self._renamed(key, data, package):
+            return default
+        return package
+
+    def _renamed(self, key, data, package=None):
+        '''Whether the package found by name `key` has another name now.'''
+        if key in self._offsets or self._names[key] not in self._updated:
+            return False
+        if package is None:
+            package = json_backend.loads(data.decode('utf-8'))
+        if package.get('name') == key:
+            return False
+        del self._names[key]
+        return True
+
+    def _flush(self):
+        # packages before their index entries, so that the index never
+        # points past the data
+        self._data.flush()
+        if self._pending:
+            self._pending.append('')
+            self._index.write('\n'.join(self._pending).encode('utf-8'))
+            self._pending = []
+        self._index.flush()
+
+    def flush(self):
+        '''Write buffered packages and index entries to disk.'''
+        if not self.readonly:
+            self._flush()
+
+    def close(self):
+        self.flush()
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._data.close()
+        if self._index is not None:
+            self._index.close()
@@ -0,0 +1,227 @@
+# coding=utf-8
+'''Stream CKAN catalog dumps through the converters one package at a time.
+
+Two input formats are supported:
+
+* JSONL: one CKAN package per line.
+* A CKAN API response envelope as returned by `package_search`, i.e.
+  `{"help": ..., "success": true, "result": {"count": N, "results": [...]}}`.
+  A bare JSON array of packages is accepted too.
+
+Input is read in fixed size blocks and each package is decoded on its own so
+peak memory is bounded by the largest single package, not by the size of the
+dump.
+'''
+import json
+
+from frictionless_ckan_mapper import bulk
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import compact
+
+BLOCK_SIZE = 64 * 1024
+
+# First keys of a CKAN action API response. A package never starts with them.
+ENVELOPE_KEYS = ('help', 'success', 'result', 'error')
+
+_WHITESPACE = ' \t\n\r'
+
+# A value cut by the end of the buffer fails to decode within this many
+# characters of the end (a literal, a number, a \uXXXX\uXXXX escape)
+_TRUNCATED = 16
+
+
+class _Reader(object):
+    '''Minimal incremental JSON reader over a text file object.'''
+
+    def __init__(self, fileobj, block_size=None):
+        self.fileobj = fileobj
+        self.block_size = block_size or BLOCK_SIZE
+        self.buf = ''
+        self.pos = 0
+        self.mark = None
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size=None):
+        data = self.fileobj.read(size or self.block_size)
+        if not data:
+            self.eof = True
+            return False
+        # drop what has already been consumed (and is not marked)
+        cut = self.pos if self.mark is None else self.mark
+        self.buf = self.buf[cut:] + data
+        self.pos -= cut
+        if self.mark is not None:
+            self.mark -= cut
+        return True
+
+    def peek(self):
+        '''Return the next non whitespace character without consuming it.'''
+        while True:
+            buf = self.buf
+            while self.pos < len(buf) and buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(buf):
+                return buf[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expected {!r} at {!r}'.format(
+                char, self.buf[self.pos:self.pos + 20]))
+        self.pos += 1
+
+    def value(self):
+        '''Decode the next JSON value.'''
+        self.peek()
+        size = self.block_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except ValueError as error:
+                # read bigger and bigger blocks so that a huge package is
+                # not decoded from scratch again for every block, but only
+                # while the error may be the end of the buffer: a malformed
+                # package fails without reading the rest of the input
+                if self._truncated(error) and self._fill(size):
+                    size *= 2
+                    continue
+                raise
+            # a number (or literal) touching the end of the buffer may be
+            # truncated, read more and decode again
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def _truncated(self, error):
+        '''Whether decode `error` may come from a value cut by the end of
+        the buffer.'''
+        # strings can't hold raw newlines: an unterminated one runs to the
+        # end of the buffer
+        if error.msg.startswith('Unterminated string'):
+            return True
+        return error.pos >= len(self.buf) - _TRUNCATED
+
+    def first_key(self):
+        '''Return the first key of the object at the current position
+        without consuming anything, or None.'''
+        self.mark = self.pos
+        try:
+            self.expect('{')
+            if self.peek() != '"':
+                return None
+            return self.value()
+        except ValueError:
+            return None
+        finally:
+            self.pos = self.mark
+            self.mark = None
+
+    def members(self):
+        '''Iterate over the keys of an object, leaving the reader positioned
+        on the value of each key.'''
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError('Expected "," or "}}" not {!r}'.format(char))
+
+    def items(self):
+        '''Iterate over the values of an array one at a time.'''
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError('Expected "," or "]" not {!r}'.format(char))
+
+    def values(self):
+        '''Iterate over a sequence of whitespace separated values (JSONL).'''
+        while self.peek():
+            yield self.value()
+
+
+def _envelope_results(reader):
+    for key in reader.members():
+        if key == 'result':
+            for result_key in reader.members():
+                if result_key == 'results':
+                    for package in reader.items():
+                        yield package
+                else:
+                    reader.value()
+        else:
+            reader.value()
+
+
+def iter_packages(fileobj, format='auto'):
+    '''Yield the CKAN packages of a dump one at a time.
+
+    `format` is one of 'jsonl', 'envelope' (a `package_search` response or a
+    JSON array of packages) or 'auto' to detect it from the first key.
+    '''
+    reader = _Reader(fileobj)
+    if format == 'auto':
+        char = reader.peek()
+        if char == '[' or (char == '{' and
+                           reader.first_key() in ENVELOPE_KEYS):
+            format = 'envelope'
+        else:
+            format = 'jsonl'
+
+    if format == 'jsonl':
+        return reader.values()
+    if format == 'envelope':
+        if reader.peek() == '[':
+            return reader.items()
+        return _envelope_results(reader)
+    raise ValueError('Unknown format: {}'.format(format))
+
+
+def convert(infile, outfile, format='auto', workers=1, chunksize=64,
+            quarantine=None, report=None):
+    '''Convert a CKAN dump to Frictionless JSONL.
+
+    Reads CKAN packages from the `infile` file object (see `iter_packages`),
+    converts each one with `ckan_to_frictionless.dataset` and writes one
+    Frictionless package per line to the `outfile` file object.
+    With `workers` > 1 the conversion runs on a process pool, see
+    `ckan_to_frictionless.datasets`.
+
+    With a `quarantine` file object, packages failing to convert are written
+    there instead of aborting the conversion, and `report` (a
+    `bulk.Report`) is updated, see `bulk.convert`.
+
+    Returns the number of packages written.
+    '''
+    count = 0
+    packages = iter_packages(infile, format=format)
+    if quarantine is None:
+        fdpackages = ckan_to_frictionless.datasets(
+            packages, workers=workers, chunksize=chunksize)
+    else:
+        fdpackages = bulk.convert(packages, quarantine=quarantine,
+                                  report=report, workers=workers,
+                                  chunksize=chunksize)
+    for fdpackage in fdpackages:
+        outfile.write(json.dumps(fdpackage, default=compact.default))
+        outfile.write('\n')
+        count += 1
+    return count
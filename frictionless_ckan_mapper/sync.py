@@ -0,0 +1,147 @@
+# coding=utf-8
+'''Convert only the packages that changed between two catalog dumps.
+
+A nightly conversion of a whole catalog mostly converts packages that did
+not change. `sync` reads today's dump once, compares every package with an
+index of yesterday's and converts only the added and modified ones, writing
+a manifest of the changes (deleted packages included):
+
+    with io.open('yesterday.jsonl') as old:
+        old_index = sync.build_index(stream.iter_packages(old))
+    new_index = {}
+    with io.open('today.jsonl') as new, \\
+            io.open('changed.jsonl', 'w') as outfile, \\
+            io.open('manifest.jsonl', 'w') as manifest:
+        changes = sync.sync(old_index, stream.iter_packages(new), outfile,
+                            manifest, new_index=new_index)
+    # save new_index with `write_index` and tomorrow's run skips reading
+    # today's dump again
+
+An index maps the `id` (or `name`) of each package to its
+`metadata_modified` and `fingerprint.fingerprint` (as 16 raw bytes). A
+package is unchanged if its `metadata_modified` is the same, or if its
+fingerprint is: a package touched without a real change (e.g. harvested
+again) is not converted.
+'''
+import binascii
+import json
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import compact
+from frictionless_ckan_mapper import fingerprint
+
+
+class Changes(object):
+    '''Counts of a sync.'''
+
+    def __init__(self):
+        self.added = 0
+        self.modified = 0
+        self.deleted = 0
+        self.unchanged = 0
+
+    def as_dict(self):
+        return {
+            'added': self.added,
+            'modified': self.modified,
+            'deleted': self.deleted,
+            'unchanged': self.unchanged,
+        }
+
+    def __str__(self):
+        return '{} added, {} modified, {} deleted, {} unchanged'.format(
+            self.added, self.modified, self.deleted, self.unchanged)
+
+
+def _key(package):
+    return package.get('id') or package.get('name')
+
+
+def _digest(package):
+    return binascii.unhexlify(fingerprint.fingerprint(package))
+
+
+def build_index(packages):
+    '''Return the index {id: (metadata_modified, fingerprint)} of
+    `packages`.'''
+    return {_key(package): (package.get('metadata_modified'),
+                            _digest(package))
+            for package in packages}
+
+
+def write_index(index, fileobj):
+    '''Write `index` to a text file object, one JSON array per line.'''
+    for key, (modified, digest) in index.items():
+        fileobj.write(json.dumps([key, modified,
+                                  binascii.hexlify(digest).decode('ascii')]))
+        fileobj.write('\n')
+
+
+def read_index(fileobj):
+    '''Return the index written by `write_index` to a text file object.'''
+    index = {}
+    for line in fileobj:
+        if line.strip():
+            key, modified, digest = json.loads(line)
+            index[key] = (modified, binascii.unhexlify(digest))
+    return index
+
+
+def _manifest_line(change, key, package=None, entry=None):
+    line = {'change': change, 'id': key}
+    if package is not None:
+        line['name'] = package.get('name')
+        line['metadata_modified'] = entry[0]
+        line['fingerprint'] = binascii.hexlify(entry[1]).decode('ascii')
+    return json.dumps(line) + '\n'
+
+
+def sync(old_index, packages, outfile, manifest=None, new_index=None,
+         convert=ckan_to_frictionless.dataset):
+    '''Convert the packages added or modified since `old_index`.
+
+    * `packages` are today's CKAN packages, e.g. `stream.iter_packages`.
+    * The changed packages are converted with `convert` and written to the
+      `outfile` file object, one JSON package per line.
+    * Each change is written to the `manifest` file object if any, one JSON
+      object per line with the `change` ('added', 'modified' or 'deleted'),
+      the `id` and, but for deleted packages, the `name`,
+      `metadata_modified` and `fingerprint`.
+    * `new_index`, a dict, is filled with the index of `packages`.
+
+    Returns the `Changes` counts.
+    '''
+    changes = Changes()
+    if new_index is None:
+        new_index = {}
+    for package in packages:
+        key = _key(package)
+        modified = package.get('metadata_modified')
+        old = old_index.get(key)
+        if old is not None and modified and old[0] == modified:
+            # CKAN updates metadata_modified on every change, no need to
+            # hash the package
+            new_index[key] = old
+            changes.unchanged += 1
+            continue
+        entry = new_index[key] = (modified, _digest(package))
+        if old is None:
+            change = 'added'
+        elif old[1] == entry[1]:
+            changes.unchanged += 1
+            continue
+        else:
+            change = 'modified'
+        setattr(changes, change, getattr(changes, change) + 1)
+        outfile.write(json.dumps(convert(package),
+                                 default=compact.default))
+        outfile.write('\n')
+        if manifest is not None:
+            manifest.write(_manifest_line(change, key, package, entry))
+
+    for key in old_index:
+        if key not in new_index:
+            changes.deleted += 1
+            if manifest is not None:
+                manifest.write(_manifest_line('deleted', key))
+    return changes
@@ -0,0 +1,209 @@
+# coding=utf-8
+'''Write CKAN packages to a portal, many at a time.
+
+`write` sends packages (e.g. the output of `frictionless_to_ckan.package`)
+to the CKAN action API concurrently over a pool of keep-alive connections,
+creating the packages that don't exist yet and updating the others:
+
+    fdpackages = ...
+    ckandicts = (frictionless_to_ckan.package(fd) for fd in fdpackages)
+    report = writer.run('https://demo.ckan.org', ckandicts, api_key=api_key,
+                        concurrency=8, checkpoint='written.txt')
+    print(report)
+
+* A package with an `id` is sent to `package_update`, then to
+  `package_create` if CKAN doesn't know it. A package without one is sent to
+  `package_create`, then to `package_update` if its name is taken. So a
+  first load costs one request per package, and so does a reload of packages
+  read back from CKAN.
+* The name (or id) of every package written is appended to the `checkpoint`
+  file; an interrupted run started again with the same file skips them.
+* Packages CKAN refuses (validation or authorization errors) are counted as
+  failed and written to the `quarantine` file object with the error, like
+  `bulk.convert` does, and the run carries on. Connection errors and
+  timeouts left after the client retries stop the run: the checkpoint
+  allows to resume it.
+'''
+import io
+import os
+import time
+
+from frictionless_ckan_mapper import bulk
+from frictionless_ckan_mapper.client import CKANError, Client, as_completed
+
+# Validation error message of CKAN for a name already in use
+NAME_IN_USE = 'That URL is already in use.'
+
+
+class Report(object):
+    '''Counts and timing of a bulk write.'''
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finished = None
+
+    @property
+    def total(self):
+        return self.created + self.updated + self.failed
+
+    @property
+    def seconds(self):
+        return (self.finished or time.time()) - self.started
+
+    @property
+    def records_per_second(self):
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def as_dict(self):
+        return {
+            'created': self.created,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'failed': self.failed,
+            'seconds': self.seconds,
+            'records_per_second': self.records_per_second,
+        }
+
+    def __str__(self):
+        return ('Created {} packages, updated {}, skipped {}, {} failed in '
+                '{:.1f}s ({:.0f} records/s)'.format(
+                    self.created, self.updated, self.skipped, self.failed,
+                    self.seconds, self.records_per_second))
+
+
+class Checkpoint(object):
+    '''Append-only file of the keys of the packages already written.'''
+
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with io.open(path, encoding='utf-8') as infile:
+                # the last line may be cut short by a crash, it is then
+                # written again
+                self.done.update(line[:-1] for line in infile
+                                 if line.endswith('\n'))
+        self._file = io.open(path, 'a', encoding='utf-8')
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add(self, key):
+        self.done.add(key)
+        self._file.write(key + '\n')
+        self._file.flush()
+
+    def add_many(self, keys):
+        '''Add `keys`, with a single write.'''
+        keys = list(keys)
+        self.done.update(keys)
+        self._file.write(''.join(key + '\n' for key in keys))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def _key(ckandict):
+    return ckandict.get('name') or ckandict.get('id')
+
+
+def _name_in_use(error):
+    return (error.status == 409 and isinstance(error.error, dict) and
+            NAME_IN_USE in (error.error.get('name') or ()))
+
+
+async def upsert(client, ckandict):
+    '''Create or update package `ckandict`, return 'created' or 'updated'.
+
+    Raises `client.CKANError` if CKAN refuses the package.
+    '''
+    if ckandict.get('id'):
+        try:
+            await client.action('package_update', ckandict)
+            return 'updated'
+        except CKANError as error:
+            if error.status != 404:
+                raise
+        await client.action('package_create', ckandict)
+        return 'created'
+    try:
+        await client.action('package_create', ckandict)
+        return 'created'
+    except CKANError as error:
+        if not _name_in_use(error):
+            raise
+    await client.action('package_update', dict(ckandict, id=ckandict['name']))
+    return 'updated'
+
+
+async def _write_one(client, index, ckandict):
+    try:
+        return index, ckandict, await upsert(client, ckandict), None
+    except CKANError as error:
+        return index, ckandict, None, error
+
+
+async def write(base_url, ckandicts, api_key=None, concurrency=8, rate=None,
+                checkpoint=None, quarantine=None, report=None, client=None):
+    '''Create or update the CKAN packages `ckandicts` on a portal.
+
+    * `ckandicts` is consumed lazily, it can be a generator of packages.
+    * At most `concurrency` packages are written at a time, and at most
+      `rate` requests are sent per second if given.
+    * `api_key` is sent in the `Authorization` header.
+    * `checkpoint` is the path of the file of the packages already written.
+    * Refused packages are written to the `quarantine` file object, if any.
+    * `report` (a `Report`) is updated as packages are written.
+    * `client` is a `client.Client` to use instead of a new one; it is left
+      open and its own headers and rate limit apply.
+
+    Returns the report. Packages need a `name`, or an `id` to be updated.
+    '''
+    if report is None:
+        report = Report()
+    own_client = client is None
+    if own_client:
+        headers = {'Authorization': api_key} if api_key else None
+        client = Client(base_url, max_connections=concurrency, rate=rate,
+                        headers=headers)
+    done = Checkpoint(checkpoint) if checkpoint else None
+
+    def calls():
+        for index, ckandict in enumerate(ckandicts):
+            if done is not None and _key(ckandict) in done:
+                report.skipped += 1
+                continue
+            yield lambda index=index, ckandict=ckandict: _write_one(
+                client, index, ckandict)
+
+    try:
+        async for index, ckandict, outcome, error in as_completed(
+                calls(), concurrency):
+            if error is not None:
+                report.failed += 1
+                if quarantine is not None:
+                    quarantine.write(bulk._quarantine_line(
+                        index, ckandict, {'error': str(error),
+                                          'status': error.status}))
+                continue
+            setattr(report, outcome, getattr(report, outcome) + 1)
+            if done is not None and _key(ckandict):
+                done.add(_key(ckandict))
+    finally:
+        report.finished = time.time()
+        if done is not None:
+            done.close()
+        if own_client:
+            client.close()
+    return report
+
+
+def run(*args, **kwargs):
+    '''Run `write` in a new event loop, for scripts.'''
+    from frictionless_ckan_mapper import client
+    return client.run(write(*args, **kwargs))
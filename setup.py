@@ -18,7 +18,6 @@ def read(*paths):
 PACKAGE = 'frictionless_ckan_mapper'
 NAME = PACKAGE.replace('_', '-')
 INSTALL_REQUIRES = [
-    'six>=1.9,<2.0',
     'unidecode'
 ]
 TESTS_REQUIRE = [
@@ -36,10 +35,16 @@ setup(
     version=VERSION,
     packages=PACKAGES,
     include_package_data=True,
+    python_requires='>=3.6',
     install_requires=INSTALL_REQUIRES,
     tests_require=TESTS_REQUIRE,
     extras_require={'develop': TESTS_REQUIRE},
     zip_safe=False,
+    entry_points={
+        'console_scripts': [
+            'frictionless-ckan-mapper = frictionless_ckan_mapper.cli:main',
+        ],
+    },
     long_description=README,
     long_description_content_type='text/markdown',
     description='A library for mapping CKAN metadata <=> Frictionless metadata.',
@@ -61,8 +66,9 @@ setup(
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Operating System :: OS Independent',
+        'Programming Language :: Python :: 3',
+        'Programming Language :: Python :: 3 :: Only',
         'Programming Language :: Python :: 3.6',
-        'Programming Language :: Python :: 2.7',
         'Topic :: Internet :: WWW/HTTP :: Dynamic Content',
         'Topic :: Software Development :: Libraries :: Python Modules',
     ],
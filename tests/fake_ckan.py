@@ -0,0 +1,225 @@
+# coding=utf-8
+'''Stand-in CKAN portal for the harvesting, writer and DataStore tests and
+benchmarks.
+
+Serves `package_search`, `package_show`, `package_create`, `package_update`
+and `package_patch` on a list of packages, and `datastore_search` on the
+fields of DataStore resources, over HTTP/1.1 keep-alive connections on a
+local port, actions taking GET parameters or a POSTed JSON body like CKAN
+does:
+
+    with FakeCKAN(packages, latency=0.01, datastore=fields) as portal:
+        ... portal.url ...
+'''
+import gzip
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, urlsplit
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are separate writes, don't let them wait for an ACK
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.portal.count('connections')
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        params = {key: values[0]
+                  for key, values in parse_qs(parts.query).items()}
+        self.dispatch(parts.path.rsplit('/', 1)[-1], params)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        try:
+            params = json.loads(body.decode('utf-8'))
+        except ValueError:
+            return self.respond(400, {'success': False, 'error': {
+                'message': 'Bad request - JSON Error'}})
+        self.dispatch(self.path.rsplit('/', 1)[-1], params)
+
+    def dispatch(self, action, params):
+        portal = self.server.portal
+        portal.count('requests')
+        if portal.latency:
+            time.sleep(portal.latency)
+        if portal.take_failure():
+            return self.respond(503, {'success': False,
+                                      'error': {'message': 'Try again'}})
+        if action == 'package_search':
+            start = int(params.get('start', 0))
+            rows = min(int(params.get('rows', 10)), portal.max_rows)
+            return self.respond(200, {'success': True, 'result': {
+                'count': len(portal.packages),
+                'results': portal.packages[start:start + rows]}})
+        if action == 'package_show':
+            package = portal.find(params.get('id'))
+            if package is None:
+                return self.not_found()
+            return self.respond(200, {'success': True, 'result': package})
+        if action == 'datastore_search':
+            resource_id = params.get('resource_id')
+            fields = portal.datastore.get(resource_id)
+            if fields is None:
+                return self.not_found()
+            # records are not served, only the fields
+            return self.respond(200, {'success': True, 'result': {
+                'resource_id': resource_id,
+                'fields': [{'id': '_id', 'type': 'int'}] + fields,
+                'records': [], 'total': 0,
+                'limit': int(params.get('limit', 100))}})
+        if action in ('package_create', 'package_update', 'package_patch'):
+            if (portal.api_key and
+                    self.headers.get('Authorization') != portal.api_key):
+                return self.respond(403, {'success': False, 'error': {
+                    'message': 'Access denied',
+                    '__type': 'Authorization Error'}})
+            if action == 'package_create':
+                package = portal.create(params)
+                if package is None:
+                    return self.respond(409, {'success': False, 'error': {
+                        '__type': 'Validation Error',
+                        'name': ['That URL is already in use.']}})
+            else:
+                package = portal.update(params,
+                                        patch=action == 'package_patch')
+                if package is None:
+                    return self.not_found()
+            portal.count(action)
+            return self.respond(200, {'success': True, 'result': package})
+        return self.respond(400, {'success': False, 'error': {
+            'message': 'Bad request - Action name not known: ' + action}})
+
+    def not_found(self):
+        return self.respond(404, {'success': False, 'error': {
+            'message': 'Not found', '__type': 'Not Found Error'}})
+
+    def respond(self, status, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=utf-8')
+        if self.server.portal.gzip and 'gzip' in self.headers.get(
+                'Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        if self.server.portal.chunked:
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            half = len(body) // 2
+            for chunk in [body[:half], body[half:], b'']:
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        else:
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+
+class FakeCKAN(object):
+    '''Serve `packages` like a CKAN portal.
+
+    * `latency` seconds are spent on every request.
+    * The first `failures` requests get a 503 response.
+    * Responses are gzipped when the client accepts it if `gzip`, and sent in
+      chunks if `chunked`.
+    * Writes need an `Authorization: api_key` header if `api_key` is set.
+    * `datastore` is {resource id: DataStore fields}, without `_id`, of the
+      resources in the DataStore.
+
+    `stats` counts the requests and connections received, and the successful
+    writes by action name.
+    '''
+
+    def __init__(self, packages=(), latency=0, failures=0, max_rows=1000,
+                 gzip=True, chunked=False, api_key=None, datastore=None):
+        # CKAN packages always have an id
+        self.packages = [package if package.get('id') else
+                         dict(package, id=str(uuid.uuid4()))
+                         for package in packages]
+        self._positions = {}
+        for position, package in enumerate(self.packages):
+            self._index(package, position)
+        self.latency = latency
+        self.failures = failures
+        self.max_rows = max_rows
+        self.gzip = gzip
+        self.chunked = chunked
+        self.api_key = api_key
+        self.datastore = datastore or {}
+        self.stats = {'requests': 0, 'connections': 0}
+        self._lock = threading.Lock()
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.portal = self
+        self.url = 'http://127.0.0.1:{}'.format(self._server.server_port)
+
+    def count(self, name):
+        with self._lock:
+            self.stats[name] = self.stats.get(name, 0) + 1
+
+    def _index(self, package, position):
+        for key in (package.get('id'), package.get('name')):
+            if key:
+                self._positions[key] = position
+
+    def find(self, key):
+        position = self._positions.get(key)
+        return None if position is None else self.packages[position]
+
+    def create(self, package):
+        '''Store a new package, return None if its name or id is taken.'''
+        with self._lock:
+            if (self._positions.get(package.get('name')) is not None or
+                    self._positions.get(package.get('id')) is not None):
+                return None
+            package = dict(package, id=package.get('id') or str(uuid.uuid4()))
+            self._index(package, len(self.packages))
+            self.packages.append(package)
+            return package
+
+    def update(self, package, patch=False):
+        '''Replace (or patch) the package with the `id` or name of `package`,
+        return None if there is none.'''
+        with self._lock:
+            position = self._positions.get(package.get('id'))
+            if position is None:
+                return None
+            old = self.packages[position]
+            package = dict(old if patch else {}, **package)
+            package['id'] = old['id']
+            if old.get('name') != package.get('name'):
+                self._positions.pop(old.get('name'), None)
+            self._index(package, position)
+            self.packages[position] = package
+            return package
+
+    def take_failure(self):
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return True
+            return False
+
+    def __enter__(self):
+        thread = threading.Thread(target=self._server.serve_forever,
+                                  args=(0.05,))
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
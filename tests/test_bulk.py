@@ -0,0 +1,79 @@
+# coding=utf-8
+import io
+import json
+
+from frictionless_ckan_mapper import bulk
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import cli
+
+
+def packages():
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    good = dict(ckandict, name='good')
+    # non integer size
+    bad_size = dict(ckandict, id='bad-size', name='bad-size')
+    bad_size['resources'] = [dict(ckandict['resources'][0], size='12 kB')]
+    # no license keys at all
+    no_license = {'name': 'no-license'}
+    return [good, bad_size, dict(good, name='good-2'), no_license]
+
+
+class TestBulkConvert:
+    def test_failures_are_quarantined(self):
+        indicts = packages()
+        quarantine = io.StringIO()
+        report = bulk.Report()
+        out = list(bulk.convert(indicts, quarantine=quarantine,
+                                report=report))
+        assert out == [ckan_to_frictionless.dataset(indicts[0]),
+                       ckan_to_frictionless.dataset(indicts[2])]
+        lines = [json.loads(line)
+                 for line in quarantine.getvalue().splitlines()]
+        assert [line['index'] for line in lines] == [1, 3]
+        assert lines[0]['id'] == 'bad-size'
+        assert lines[0]['error'].startswith('ValueError: invalid literal')
+        assert 'int(stored)' in lines[0]['traceback']
+        assert lines[0]['record'] == indicts[1]
+        assert lines[1]['name'] == 'no-license'
+        assert lines[1]['error'] == "KeyError: 'licenses'"
+        assert report.converted == 2
+        assert report.failed == 2
+        assert report.failure_rate == 0.5
+        assert report.finished is not None
+        assert 'Converted 2 records, 2 failed (50.00%)' in str(report)
+
+    def test_without_quarantine(self):
+        report = bulk.Report()
+        out = list(bulk.convert(packages(), report=report))
+        assert len(out) == 2
+        assert report.as_dict()['failed'] == 2
+
+    def test_workers(self):
+        indicts = packages() * 3
+        quarantine = io.StringIO()
+        report = bulk.Report()
+        out = list(bulk.convert(indicts, quarantine=quarantine,
+                                report=report, workers=2, chunksize=2,
+                                ordered=False))
+        assert sorted(fd['name'] for fd in out) == ['good'] * 3 + [
+            'good-2'] * 3
+        lines = [json.loads(line)
+                 for line in quarantine.getvalue().splitlines()]
+        assert sorted(line['index'] for line in lines) == [1, 3, 5, 7, 9, 11]
+        assert all(line['record'] == indicts[line['index']]
+                   for line in lines)
+        assert report.failed == 6
+
+    def test_cli_quarantine(self, tmpdir, capsys):
+        inpath = tmpdir.join('dump.jsonl')
+        inpath.write(''.join(json.dumps(p) + '\n' for p in packages()))
+        outpath = tmpdir.join('out.jsonl')
+        quarantine = tmpdir.join('quarantine.jsonl')
+        cli.main(['convert', str(inpath), str(outpath),
+                  '--quarantine', str(quarantine)])
+        assert len(outpath.readlines()) == 2
+        assert len(quarantine.readlines()) == 2
+        err = capsys.readouterr().err
+        assert 'Converted 2 records, 2 failed (50.00%)' in err
+        assert 'quarantine.jsonl' in err
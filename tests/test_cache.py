@@ -0,0 +1,144 @@
+# coding=utf-8
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import cache
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+
+def ckan_package(num=0, modified='2020-06-14T16:46:36.105271'):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    indict = json.load(open(inpath))
+    indict['id'] = 'package-{}'.format(num)
+    indict['metadata_modified'] = modified
+    return indict
+
+
+@pytest.fixture(params=['sqlite', 'directory'])
+def make_cache(request, tmpdir):
+    def make(max_bytes=None):
+        if request.param == 'sqlite':
+            store = cache.SQLiteStore(str(tmpdir.join('cache.sqlite')),
+                                      max_bytes=max_bytes)
+        else:
+            store = cache.DirectoryStore(str(tmpdir.join('cache')),
+                                         max_bytes=max_bytes)
+        return cache.ConversionCache(store)
+    return make
+
+
+class TestConversionCache:
+    def test_hit_returns_stored_conversion(self, make_cache):
+        conversions = make_cache()
+        indict = ckan_package()
+        exp = ckan_to_frictionless.dataset(indict)
+        assert conversions.dataset(indict) == exp
+        assert conversions.dataset(indict) == exp
+        stats = conversions.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+        assert stats['bytes_saved'] == len(json.dumps(exp))
+        assert stats['entries'] == 1
+
+    def test_modified_package_is_converted_again(self, make_cache):
+        conversions = make_cache()
+        conversions.dataset(ckan_package())
+        indict = ckan_package(modified='2021-01-01T00:00:00')
+        indict['title'] = 'New title'
+        assert conversions.dataset(indict)['title'] == 'New title'
+        assert conversions.stats()['misses'] == 2
+        # the previous conversion of the package is dropped
+        assert conversions.stats()['entries'] == 1
+
+    def test_content_hash_without_id(self, make_cache):
+        conversions = make_cache()
+        fddict = {'name': 'gdp', 'description': 'GDP'}
+        exp = frictionless_to_ckan.package(fddict)
+        assert conversions.package(fddict) == exp
+        assert conversions.package(dict(fddict)) == exp
+        assert conversions.package({'name': 'gdp'}) == {'name': 'gdp'}
+        assert conversions.stats()['hits'] == 1
+
+    def test_directions_do_not_clash(self, make_cache):
+        conversions = make_cache()
+        indict = {'id': 'x', 'metadata_modified': '2020', 'name': 'x',
+                  'licenses': [{'name': 'cc-by'}]}
+        conversions.dataset(indict)
+        conversions.package(indict)
+        assert conversions.stats()['misses'] == 2
+
+    def test_invalidate(self, make_cache):
+        conversions = make_cache()
+        conversions.dataset(ckan_package(1))
+        conversions.dataset(ckan_package(2))
+        conversions.invalidate('package-1')
+        assert conversions.stats()['entries'] == 1
+        conversions.dataset(ckan_package(1))
+        assert conversions.stats()['hits'] == 0
+        conversions.invalidate()
+        assert conversions.stats()['entries'] == 0
+        assert conversions.stats()['size'] == 0
+
+    def test_size_based_eviction(self, make_cache):
+        size = len(json.dumps(ckan_to_frictionless.dataset(ckan_package())))
+        conversions = make_cache(max_bytes=size * 3.5)
+        for num in range(3):
+            conversions.dataset(ckan_package(num))
+        # package-0 is the least recently used after this
+        conversions.dataset(ckan_package(0))
+        conversions.dataset(ckan_package(3))
+        stats = conversions.stats()
+        assert stats['size'] <= size * 3.5
+        assert stats['entries'] < 4
+        conversions.dataset(ckan_package(0))
+        assert conversions.stats()['hits'] == 2
+
+    def test_persistence(self, make_cache):
+        conversions = make_cache()
+        conversions.dataset(ckan_package())
+        conversions.close()
+        conversions = make_cache()
+        conversions.dataset(ckan_package())
+        assert conversions.stats()['hits'] == 1
+        assert conversions.stats()['size'] > 0
+
+
+class TestSQLiteStore:
+    def test_hits_are_written_in_batches(self, tmpdir):
+        path = str(tmpdir.join('cache.sqlite'))
+        store = cache.SQLiteStore(path)
+        store.put('ns', 'a', 'a', '{}')
+        store.put('ns', 'b', 'b', '{}')
+        assert store.get('ns', 'a', 'a') == '{}'
+        # the access time is only in memory until the next flush
+        accessed = 'SELECT key FROM conversions ORDER BY accessed'
+        assert [row[0] for row in store.db.execute(accessed)] == ['a', 'b']
+        store.close()
+        store = cache.SQLiteStore(path)
+        assert [row[0] for row in store.db.execute(accessed)] == ['b', 'a']
+        store.close()
+
+    def test_eviction_sees_pending_hits(self, tmpdir):
+        store = cache.SQLiteStore(str(tmpdir.join('cache.sqlite')))
+        for key in 'abc':
+            store.put('ns', key, key, '{}')
+        store.get('ns', 'a', 'a')
+        store.evict(4)
+        assert store.get('ns', 'a', 'a') == '{}'
+        assert store.get('ns', 'b', 'b') is None
+        store.close()
+
+
+class TestCacheKey:
+    def test_id_and_metadata_modified(self):
+        assert cache.cache_key({'id': 'a', 'metadata_modified': 'b'}) == (
+            'a', 'a@b')
+
+    def test_content_hash_ignores_key_order(self):
+        first = cache.cache_key({'id': 'a', 'name': 'x', 'title': 'y'})
+        second = cache.cache_key({'title': 'y', 'name': 'x', 'id': 'a'})
+        assert first == second
+        assert first[1].startswith('sha256:')
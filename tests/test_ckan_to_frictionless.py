@@ -1,6 +1,7 @@
 # coding=utf-8
 
 import json
+import tracemalloc
 
 import frictionless_ckan_mapper.ckan_to_frictionless as converter
 
@@ -111,6 +112,22 @@ class TestResourceConversion:
         out = converter.resource(indict)
         assert out == exp
 
+    def test_output_key_order(self):
+        inpath = 'tests/fixtures/ckan_resource.json'
+        indict = json.load(open(inpath))
+        out = converter.resource(indict)
+        assert list(out.keys()) == [
+            'hash', 'description', 'extras', 'name', 'format', 'package_id',
+            'created', 'revision_id', 'id', 'path'
+        ]
+
+    def test_compile_resource_with_extra_mapping(self):
+        resource = converter.compile_resource({'format': 'fmt'})
+        indict = {'url': 'http://x.com/data.csv', 'format': 'CSV',
+                  'position': 1}
+        exp = {'path': 'http://x.com/data.csv', 'fmt': 'CSV'}
+        assert resource(indict) == exp
+
     def test_nulls_are_stripped(self):
         indict = {
             'abc': 'xxx',
@@ -272,6 +289,28 @@ class TestPackageConversion:
         out = converter.dataset(indict)
         assert out == exp
 
+    def test_extra_mappings(self):
+        indict = {
+            'license_id': 'cc-by',
+            'notes': 'GDP',
+            'extras': [{'key': 'source', 'value': 'World Bank'}],
+            'resources': [{'name': 'data', 'format': 'CSV'}],
+        }
+        exp = {
+            'description': 'GDP',
+            'sources': 'World Bank',
+            'resources': [{'name': 'data', 'fmt': 'CSV'}],
+        }
+        out = converter.dataset(indict, extra_mapping={'source': 'sources'},
+                                extra_resource_mapping={'format': 'fmt'})
+        del out['licenses']
+        assert out == exp
+        compiled = converter.compile_dataset({'source': 'sources'},
+                                             {'format': 'fmt'})
+        assert compiled(indict) == converter.dataset(
+            indict, extra_mapping={'source': 'sources'},
+            extra_resource_mapping={'format': 'fmt'})
+
     def test_dataset_author_and_maintainer(self):
         indict = {
             'author': 'World Bank and OECD',
@@ -432,3 +471,141 @@ class TestPackageConversion:
         exp = {}
         out = converter.dataset(indict)
         assert out == exp
+
+
+class TestResourceNames:
+    def test_unnamed_resources_are_numbered(self):
+        indicts = [{'url': 'a.csv'}, {'name': 'data'}, {'name': ''},
+                   {'name': 'unnamed-resource'}]
+        out = [res['name'] for res in converter.resources(indicts)]
+        assert out == ['unnamed-resource-1', 'data', 'unnamed-resource-2',
+                       'unnamed-resource-3']
+
+    def test_duplicate_names_are_numbered(self):
+        indicts = [{'name': 'data'}, {'name': 'other'}, {'name': 'Data'},
+                   {'name': 'data'}]
+        out = list(converter.resources(indicts))
+        assert out == [
+            {'name': 'data-1', 'original_name': 'data'},
+            {'name': 'other'},
+            {'name': 'data-2', 'original_name': 'data'},
+            {'name': 'data-3', 'original_name': 'data'},
+        ]
+
+    def test_lazy_iterables(self):
+        indicts = ({'name': 'data', 'url': str(i)} for i in range(3))
+        out = converter.resources(indicts)
+        first = next(out)
+        assert first['name'] == 'data'
+        # renamed once the duplicate shows up
+        next(out)
+        assert first['name'] == 'data-1'
+        assert [res['name'] for res in out] == ['data-3']
+
+    def test_dataset_resources_from_generator(self):
+        indict = {'name': 'gdp', 'license_id': 'cc-by',
+                  'resources': [{'name': 'data'}, {'name': 'data'}]}
+        exp = converter.dataset(indict)
+        indict['resources'] = iter(indict['resources'])
+        assert converter.dataset(indict) == exp
+        assert [res['name'] for res in exp['resources']] == ['data-1',
+                                                             'data-2']
+
+
+class TestBatchConversion:
+    def _packages(self, num):
+        inpath = 'tests/fixtures/full_ckan_package.json'
+        ckandict = json.load(open(inpath))
+        packages = []
+        for i in range(num):
+            indict = dict(ckandict)
+            indict['name'] = 'package-{}'.format(i)
+            packages.append(indict)
+        return packages
+
+    def test_datasets_keeps_input_order(self):
+        indicts = self._packages(20)
+        exp = [converter.dataset(indict) for indict in indicts]
+        out = list(converter.datasets(iter(indicts), workers=2, chunksize=3))
+        assert out == exp
+
+    def test_datasets_unordered(self):
+        indicts = self._packages(20)
+        out = converter.datasets(indicts, workers=2, ordered=False)
+        names = sorted(fd['name'] for fd in out)
+        assert names == sorted(indict['name'] for indict in indicts)
+
+    def test_datasets_with_compiled_converter(self):
+        indicts = self._packages(6)
+        convert = converter.compile_dataset({'version': 'release'})
+        out = list(converter.datasets(indicts, workers=2, chunksize=2,
+                                      convert=convert))
+        assert out == [convert(indict) for indict in indicts]
+        assert 'release' in out[0] and 'version' not in out[0]
+
+    def test_datasets_in_process(self):
+        indicts = self._packages(3)
+        out = list(converter.datasets(indicts, workers=1))
+        assert out == [converter.dataset(indict) for indict in indicts]
+
+
+def big_ckan_package(num_resources):
+    return {
+        'name': 'big',
+        'license_id': 'cc-by',
+        'notes': 'A package with many resources',
+        'resources': [{
+            'id': 'res-{}'.format(i),
+            'name': 'Resource {}'.format(i),
+            'url': 'http://example.com/{}.csv'.format(i),
+            'format': 'CSV',
+            'mimetype': 'text/csv',
+            'size': 1000 + i,
+            'position': i,
+            'state': 'active',
+            'datastore_active': False,
+            'description': 'Resource number {}'.format(i),
+            'hash': None,
+            'created': '2020-06-14T16:46:36.105271',
+        } for i in range(num_resources)]
+    }
+
+
+class TestInplaceConversion:
+    def test_resource_inplace(self):
+        indict = {'url': 'http://x.com/data.csv', 'position': 1, 'hash': None}
+        out = converter.resource(indict, inplace=True)
+        assert out is indict
+        assert out == {'path': 'http://x.com/data.csv'}
+
+    def test_dataset_inplace_is_identical(self):
+        inpath = 'tests/fixtures/full_ckan_package.json'
+        exp = converter.dataset(json.load(open(inpath)))
+        indict = json.load(open(inpath))
+        out = converter.dataset(indict, inplace=True)
+        assert out is indict
+        assert json.dumps(out) == json.dumps(exp)
+
+    def test_dataset_inplace_extras_do_not_shadow_ckan_keys(self):
+        indict = {
+            'notes': 'from ckan',
+            'license_id': 'cc-by',
+            'extras': [{'key': 'notes', 'value': 'from extras'}]
+        }
+        exp = converter.dataset(dict(indict))
+        assert converter.dataset(indict, inplace=True) == exp
+
+    def test_dataset_inplace_peak_memory(self):
+        tracemalloc.start()
+        try:
+            indict = big_ckan_package(2000)
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            converter.dataset(indict, inplace=True)
+            peak = tracemalloc.get_traced_memory()[1] - start
+        finally:
+            tracemalloc.stop()
+        # slugified names and the duplicate name bookkeeping only, the copy
+        # mode allocates most of the input size again
+        assert peak < size * 0.3
@@ -0,0 +1,138 @@
+# coding=utf-8
+import copy
+import functools
+import io
+import json
+import pickle
+
+import pytest
+
+from frictionless_ckan_mapper import cache
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import compact
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import store
+from frictionless_ckan_mapper import sync
+
+
+def ckan_package():
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    return json.load(open(inpath))
+
+
+class TestCompactDataset:
+    def test_same_as_plain(self):
+        ckandict = ckan_package()
+        exp = ckan_to_frictionless.dataset(copy.deepcopy(ckandict))
+        out = ckan_to_frictionless.dataset(ckandict, compact=True)
+        assert out == exp
+        assert all(isinstance(res, compact.ResourceRecord)
+                   for res in out['resources'])
+        # the usual keys first, in slot order, then the others
+        record = compact.ResourceRecord([('path', 'a.csv'), ('name', 'a'),
+                                         ('zeta', 1), ('format', 'CSV')])
+        assert list(record) == ['format', 'name', 'path', 'zeta']
+        assert list(out['resources'][0])[-3:] == [
+            'revision_id', 'tracking_summary', 'versions_upload_timestamp']
+        assert (json.dumps(out, default=compact.default, sort_keys=True) ==
+                json.dumps(exp, sort_keys=True))
+
+    def test_keys_and_values_are_shared(self):
+        first = ckan_to_frictionless.dataset(ckan_package(), compact=True)
+        second = ckan_to_frictionless.dataset(ckan_package(), compact=True)
+        first_key = [key for key in first if key == 'name'][0]
+        second_key = [key for key in second if key == 'name'][0]
+        assert first_key is second_key
+        assert (first['resources'][0]['format'] is
+                second['resources'][0]['format'])
+        assert (first['resources'][0]['package_id'] is
+                second['resources'][0]['package_id'])
+
+    def test_inplace(self):
+        exp = ckan_to_frictionless.dataset(ckan_package())
+        out = ckan_to_frictionless.dataset(ckan_package(), inplace=True,
+                                           compact=True)
+        assert out == exp
+
+    def test_lazy_is_refused(self):
+        with pytest.raises(ValueError):
+            ckan_to_frictionless.dataset(ckan_package(), lazy=True,
+                                         compact=True)
+        with pytest.raises(ValueError):
+            ckan_to_frictionless.resource({}, lazy=True, compact=True)
+
+
+class TestCompactResources:
+    def test_duplicate_names_are_renamed(self):
+        ckandicts = [{'name': 'data'}, {'name': 'data'}]
+        out = list(ckan_to_frictionless.resources(ckandicts, compact=True))
+        assert [res['name'] for res in out] == ['data-1', 'data-2']
+        assert isinstance(out[0], compact.ResourceRecord)
+
+
+class TestResourceRecord:
+    def test_mapping(self):
+        record = compact.resource({'path': 'http://x.org/a.csv',
+                                   'format': 'CSV', 'sheet': 'B'})
+        assert record == {'path': 'http://x.org/a.csv', 'format': 'CSV',
+                          'sheet': 'B'}
+        assert list(record) == ['format', 'path', 'sheet']
+        assert len(record) == 3
+        assert 'format' in record and 'sheet' in record
+        assert 'name' not in record
+        assert record.get('name') is None
+        record['name'] = 'a'
+        record['other'] = 1
+        del record['format']
+        del record['sheet']
+        assert list(record.items()) == [
+            ('name', 'a'), ('path', 'http://x.org/a.csv'), ('other', 1)]
+        with pytest.raises(KeyError):
+            del record['format']
+        with pytest.raises(KeyError):
+            record['sheet']
+        assert not hasattr(record, '__dict__')
+
+    def test_pickle(self):
+        record = compact.resource({'name': 'a', 'sheet': 'B'})
+        out = pickle.loads(pickle.dumps(record))
+        assert isinstance(out, compact.ResourceRecord)
+        assert list(out.items()) == [('name', 'a'), ('sheet', 'B')]
+
+    def test_default_refuses_other_objects(self):
+        with pytest.raises(TypeError):
+            json.dumps({'a': object()}, default=compact.default)
+
+
+def compact_dataset(ckandict):
+    return ckan_to_frictionless.dataset(ckandict, compact=True)
+
+
+class TestSerialization:
+    def test_json_backend(self):
+        fddict = compact_dataset(ckan_package())
+        assert json.loads(json_backend.dumps(
+            fddict, default=compact.default)) == fddict
+
+    def test_store(self, tmpdir):
+        path = str(tmpdir.join('catalog.jsonl'))
+        convert = functools.partial(ckan_to_frictionless.dataset,
+                                    compact=True)
+        with store.CatalogStore(path, convert=convert) as catalog:
+            fddict = catalog.add(ckan_package())
+            assert catalog.get(fddict['name']) == fddict
+
+    def test_sync(self):
+        outfile = io.StringIO()
+        sync.sync({}, [ckan_package()], outfile, convert=compact_dataset)
+        assert json.loads(outfile.getvalue()) == \
+            ckan_to_frictionless.dataset(ckan_package())
+
+    def test_cache(self, tmpdir):
+        conversions = cache.ConversionCache(
+            cache.SQLiteStore(str(tmpdir.join('cache.sqlite'))))
+        exp = ckan_to_frictionless.dataset(ckan_package())
+        assert conversions.convert(compact_dataset, ckan_package()) == exp
+        assert conversions.convert(compact_dataset, ckan_package()) == exp
+        assert conversions.stats()['hits'] == 1
+        conversions.close()
@@ -0,0 +1,179 @@
+# coding=utf-8
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import client
+from frictionless_ckan_mapper import datastore
+from frictionless_ckan_mapper import frictionless_to_ckan
+from tests.fake_ckan import FakeCKAN
+
+CKAN_FIELDS = [
+    {'id': '_id', 'type': 'int'},
+    {'id': 'city', 'type': 'text',
+     'info': {'label': 'City', 'notes': 'Name of the city'}},
+    {'id': 'population', 'type': 'int8', 'info': {'label': ''}},
+    {'id': 'area', 'type': 'numeric(10,2)'},
+    {'id': 'capital', 'type': 'bool'},
+    {'id': 'founded', 'type': 'text', 'info': {'type_override': 'date'}},
+    {'id': 'updated', 'type': 'timestamp without time zone'},
+    {'id': 'tags', 'type': '_text'},
+    {'id': 'shape', 'type': 'tsvector'},
+]
+
+SCHEMA = {'fields': [
+    {'name': 'city', 'type': 'string', 'title': 'City',
+     'description': 'Name of the city'},
+    {'name': 'population', 'type': 'integer'},
+    {'name': 'area', 'type': 'number'},
+    {'name': 'capital', 'type': 'boolean'},
+    {'name': 'founded', 'type': 'date'},
+    {'name': 'updated', 'type': 'datetime'},
+    {'name': 'tags', 'type': 'array'},
+    {'name': 'shape', 'type': 'any'},
+]}
+
+
+def package(num, datastore_active=True):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    ckandict['id'] = 'id-{}'.format(num)
+    ckandict['name'] = 'package-{}'.format(num)
+    ckandict['resources'] = [
+        {'id': 'res-{}-{}'.format(num, position), 'name': 'data',
+         'url': 'http://example.com/data.csv',
+         'datastore_active': datastore_active}
+        for position in range(2)]
+    return ckandict
+
+
+class TestTypes:
+    def test_schema_types(self):
+        assert datastore.schema_type('int4') == 'integer'
+        assert datastore.schema_type('NUMERIC(10, 2)') == 'number'
+        assert datastore.schema_type('double  precision') == 'number'
+        assert datastore.schema_type('varchar(255)') == 'string'
+        assert datastore.schema_type('timestamp(6) with time zone') == \
+            'datetime'
+        assert datastore.schema_type('_int4') == 'array'
+        assert datastore.schema_type('text[]') == 'array'
+        assert datastore.schema_type('jsonb') == 'object'
+        assert datastore.schema_type('box') == 'any'
+        assert datastore.schema_type(None) == 'any'
+
+    def test_datastore_types(self):
+        assert datastore.datastore_type('string') == 'text'
+        assert datastore.datastore_type('integer') == 'int'
+        assert datastore.datastore_type('geojson') == 'json'
+        assert datastore.datastore_type('yearmonth') == 'text'
+
+    def test_types_are_cached(self):
+        datastore.cache_clear()
+        for _ in range(3):
+            datastore.schema(CKAN_FIELDS)
+        info = datastore.cache_info()
+        assert info.misses == 8
+        assert info.hits == 16
+
+
+class TestSchema:
+    def test_schema(self):
+        assert datastore.schema(CKAN_FIELDS) == SCHEMA
+
+    def test_fields(self):
+        out = datastore.fields(SCHEMA)
+        assert out[0] == {'id': 'city', 'type': 'text', 'info': {
+            'label': 'City', 'notes': 'Name of the city'}}
+        assert [field['type'] for field in out] == [
+            'text', 'int', 'numeric', 'bool', 'date', 'timestamp', 'json',
+            'text']
+
+    def test_fields_of_no_schema(self):
+        assert datastore.fields(None) == []
+        assert datastore.fields('schema.json') == []
+        assert datastore.fields({}) == []
+
+    def test_roundtrip(self):
+        fdschema = {'fields': [field for field in SCHEMA['fields']
+                               if field['type'] not in ('array', 'any')]}
+        assert datastore.schema(datastore.fields(fdschema)) == fdschema
+
+
+class TestConverters:
+    def test_ckan_resource(self):
+        ckandict = {'id': 'res', 'name': 'data', 'datastore_active': True}
+        out = ckan_to_frictionless.resource(ckandict,
+                                            datastore_fields=CKAN_FIELDS)
+        assert out == {'id': 'res', 'name': 'data', 'schema': SCHEMA}
+        # the same with lazy and compact resources
+        lazy = ckan_to_frictionless.resource(ckandict, lazy=True,
+                                             datastore_fields=CKAN_FIELDS)
+        assert lazy['schema'] == SCHEMA
+        compact = ckan_to_frictionless.resource(
+            ckandict, compact=True, datastore_fields=CKAN_FIELDS)
+        assert compact['schema'] == SCHEMA
+
+    def test_ckan_resource_schema_is_kept(self):
+        ckandict = {'id': 'res', 'schema': '{"fields": []}'}
+        out = ckan_to_frictionless.resource(ckandict,
+                                            datastore_fields=CKAN_FIELDS)
+        assert out['schema'] == {'fields': []}
+
+    def test_ckan_dataset(self):
+        ckandict = package(0)
+        out = ckan_to_frictionless.dataset(
+            ckandict, datastore_fields_by_id={'res-0-1': CKAN_FIELDS})
+        assert 'schema' not in out['resources'][0]
+        assert out['resources'][1]['schema'] == SCHEMA
+        inplace = ckan_to_frictionless.dataset(
+            package(0), inplace=True,
+            datastore_fields_by_id={'res-0-1': CKAN_FIELDS})
+        assert inplace == out
+
+    def test_ckan_resources(self):
+        out = list(ckan_to_frictionless.resources(
+            package(0)['resources'],
+            datastore_fields_by_id={'res-0-0': CKAN_FIELDS}))
+        assert out[0]['schema'] == SCHEMA
+        assert 'schema' not in out[1]
+
+    def test_frictionless_resource(self):
+        fddict = {'name': 'data', 'path': 'data.csv', 'schema': SCHEMA}
+        out = frictionless_to_ckan.resource(fddict)
+        # the schema is kept as is, `datastore.fields` gives the fields
+        assert out['schema'] == SCHEMA
+        assert datastore.fields(out['schema'])[0] == {
+            'id': 'city', 'type': 'text',
+            'info': {'label': 'City', 'notes': 'Name of the city'}}
+
+
+class TestFetch:
+    def test_fetch(self):
+        ckandicts = [package(num) for num in range(5)]
+        ckandicts.append(package(5, datastore_active=False))
+        ids = list(datastore.resource_ids(ckandicts))
+        assert len(ids) == 10
+        fields = {resource_id: CKAN_FIELDS[1:] for resource_id in ids}
+        with FakeCKAN(ckandicts, datastore=fields) as portal:
+            out = datastore.run(portal.url, ids + ids, concurrency=3)
+        # repeated ids are fetched once
+        assert portal.stats['requests'] == 10
+        assert portal.stats['connections'] <= 3
+        assert out == {resource_id: CKAN_FIELDS for resource_id in ids}
+        fddicts = [ckan_to_frictionless.dataset(ckandict,
+                                                datastore_fields_by_id=out)
+                   for ckandict in ckandicts]
+        assert fddicts[0]['resources'][0]['schema'] == SCHEMA
+        assert 'schema' not in fddicts[5]['resources'][0]
+
+    def test_missing_resources(self):
+        with FakeCKAN(datastore={'res': CKAN_FIELDS[1:]}) as portal:
+            out = datastore.run(portal.url, ['res', 'gone'])
+        assert out == {'res': CKAN_FIELDS, 'gone': None}
+
+    def test_errors(self):
+        with FakeCKAN(failures=10) as portal:
+            with pytest.raises(client.CKANError):
+                datastore.run(portal.url, ['res'], client=client.Client(
+                    portal.url, retries=1, backoff=0.01))
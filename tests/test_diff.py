@@ -0,0 +1,129 @@
+# coding=utf-8
+import copy
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import diff
+
+
+def fd_package(num_resources=3):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    resource = ckandict['resources'][0]
+    ckandict['resources'] = [
+        dict(resource, id='res-{}'.format(i), name='data-{}'.format(i),
+             position=i)
+        for i in range(num_resources)]
+    ckandict['extras'] = [{'key': 'spatial', 'value': '{"type": "Point"}'},
+                          {'key': 'source', 'value': 'census'}]
+    return ckan_to_frictionless.dataset(ckandict)
+
+
+class TestDiff:
+    def test_no_change(self):
+        old = fd_package()
+        assert diff.diff(old, copy.deepcopy(old)) == []
+
+    def test_package_key_change_is_mapped(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        new['description'] = 'New description'
+        assert diff.diff(old, new) == [('package_patch', {
+            'id': old['id'], 'notes': 'New description'})]
+
+    def test_removed_keys(self):
+        old = fd_package()
+        old['keywords'] = ['economy']
+        new = copy.deepcopy(old)
+        del new['title']
+        del new['keywords']
+        actions = diff.diff(old, new)
+        assert actions == [('package_patch', {'id': old['id'],
+                                              'title': None, 'tags': []})]
+
+    def test_extras_are_sent_whole(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        new['source'] = 'survey'
+        new['spatial']['coordinates'] = [1, 2]
+        [(action, patch)] = diff.diff(old, new)
+        assert action == 'package_patch'
+        assert sorted(patch) == ['extras', 'id']
+        assert sorted(patch['extras'], key=lambda e: e['key']) == [
+            {'key': 'source', 'value': 'survey'},
+            {'key': 'spatial',
+             'value': '{"type": "Point", "coordinates": [1, 2]}'}]
+
+    def test_extras_order_is_not_a_change(self):
+        old = fd_package()
+        new = dict(reversed(list(copy.deepcopy(old).items())))
+        assert diff.diff(old, new) == []
+
+    def test_resource_patch_is_mapped(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        new['resources'][1]['bytes'] = 1000
+        new['resources'][1]['path'] = 'http://example.com/data.csv'
+        assert diff.diff(old, new) == [('resource_patch', {
+            'id': 'res-1', 'size': 1000,
+            'url': 'http://example.com/data.csv'})]
+
+    def test_resource_key_removed(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        del new['resources'][0]['format']
+        [(action, payload)] = diff.diff(old, new)
+        assert action == 'resource_update'
+        assert payload['id'] == 'res-0'
+        assert 'format' not in payload
+        assert payload['url'] == old['resources'][0]['path']
+
+    def test_resources_created_deleted_and_reordered(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        added = dict(new['resources'][0], id='res-new', name='new')
+        new['resources'] = [added, new['resources'][2], new['resources'][0]]
+        actions = diff.diff(old, new)
+        assert [action for action, _ in actions] == [
+            'resource_create', 'resource_delete', 'package_resource_reorder']
+        assert actions[0][1]['package_id'] == old['id']
+        assert actions[0][1]['id'] == 'res-new'
+        assert actions[1][1] == {'id': 'res-1'}
+        assert actions[2][1] == {'id': old['id'],
+                                 'order': ['res-new', 'res-2', 'res-0']}
+
+    def test_append_needs_no_reorder(self):
+        old = fd_package()
+        new = copy.deepcopy(old)
+        new['resources'].append({'name': 'extra', 'path': 'http://a.org'})
+        assert diff.diff(old, new) == [('resource_create', {
+            'name': 'extra', 'url': 'http://a.org',
+            'package_id': old['id']})]
+
+    def test_full_resources_when_too_many_actions(self):
+        old = fd_package(num_resources=5)
+        new = copy.deepcopy(old)
+        for res in new['resources']:
+            res['description'] = 'changed'
+        [(action, patch)] = diff.diff(old, new, max_resource_actions=4)
+        assert action == 'package_patch'
+        assert len(patch['resources']) == 5
+        assert patch['resources'][0]['url'] == old['resources'][0]['path']
+
+    def test_full_resources_without_ids(self):
+        old = {'name': 'gdp', 'resources': [{'name': 'a', 'path': 'a.csv'}]}
+        new = {'name': 'gdp', 'resources': [{'name': 'a', 'path': 'b.csv'}]}
+        assert diff.diff(old, new) == [('package_patch', {
+            'id': 'gdp', 'resources': [{'name': 'a', 'url': 'b.csv'}]})]
+
+    def test_renamed_package_is_patched_by_old_name(self):
+        old = {'name': 'gdp'}
+        new = {'name': 'gdp-2020'}
+        assert diff.diff(old, new) == [('package_patch', {
+            'id': 'gdp', 'name': 'gdp-2020'})]
+
+    def test_package_needs_an_id(self):
+        with pytest.raises(ValueError):
+            diff.diff({'title': 'a'}, {'title': 'b'})
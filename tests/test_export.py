@@ -0,0 +1,131 @@
+# coding=utf-8
+import csv
+import io
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import export
+
+
+def packages(num=3):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    ckandict['tags'] = [{'name': 'water'}, {'name': 'health'}]
+    ckandict['resources'].append({'name': 'second'})
+    out = []
+    for i in range(num):
+        out.append(ckan_to_frictionless.dataset(
+            dict(ckandict, id='id-{}'.format(i),
+                 name='package-{}'.format(i))))
+    return out
+
+
+def read_csv(fileobj):
+    return list(csv.DictReader(io.StringIO(fileobj.getvalue())))
+
+
+class TestColumns:
+    def test_columns(self):
+        package_columns, resource_columns = export.columns(packages(2))
+        assert list(package_columns) == list(export.PACKAGE_COLUMNS)
+        assert package_columns['id'] == ['id-0', 'id-1']
+        assert package_columns['license'] == ['cc-by', 'cc-by']
+        assert package_columns['keywords'] == [['water', 'health']] * 2
+        assert package_columns['num_resources'] == [2, 2]
+        assert set(resource_columns) == set(export.RESOURCE_COLUMNS)
+        assert resource_columns['package_id'] == ['id-0', 'id-0', 'id-1',
+                                                  'id-1']
+        assert resource_columns['position'] == [0, 1, 0, 1]
+        assert resource_columns['format'] == ['CSV', None, 'CSV', None]
+        assert resource_columns['bytes'] == [40, None, 40, None]
+
+    def test_package_without_id(self):
+        package_columns, resource_columns = export.columns(
+            [{'name': 'no-id', 'resources': [{'path': 'a.csv'}]}])
+        assert package_columns['id'] == ['no-id']
+        assert resource_columns['package_id'] == ['no-id']
+        assert package_columns['keywords'] == [[]]
+
+    def test_non_string_values(self):
+        package_columns, resource_columns = export.columns([{
+            'name': 'gdp', 'title': {'en': 'GDP'}, 'version': 2,
+            'keywords': ['gdp', 2020], 'resources': [
+                {'name': 'data', 'format': ['CSV'], 'hash': True}]}])
+        assert package_columns['title'] == ['{"en": "GDP"}']
+        assert package_columns['version'] == ['2']
+        assert package_columns['keywords'] == [['gdp', '2020']]
+        assert resource_columns['format'] == ['["CSV"]']
+        assert resource_columns['hash'] == ['true']
+        assert resource_columns['name'] == ['data']
+
+
+class TestExportCSV:
+    def test_export(self):
+        package_file, resource_file = io.StringIO(), io.StringIO()
+        counts = export.export(packages(), package_file, resource_file,
+                               row_group_size=2)
+        assert counts == (3, 6)
+        rows = read_csv(package_file)
+        assert [row['name'] for row in rows] == ['package-0', 'package-1',
+                                                 'package-2']
+        assert json.loads(rows[0]['keywords']) == ['water', 'health']
+        assert rows[0]['created'] == '2020-06-25T14:33:18.301040'
+        rows = read_csv(resource_file)
+        assert len(rows) == 6
+        assert rows[0]['bytes'] == '40'
+        assert rows[1]['bytes'] == ''
+        assert rows[5]['package_id'] == 'id-2'
+
+    def test_empty(self):
+        package_file = io.StringIO()
+        assert export.export([], package_file) == (0, 0)
+        assert package_file.getvalue().strip() == ','.join(
+            export.PACKAGE_COLUMNS)
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            export.export([], io.StringIO(), format='xlsx')
+
+
+class TestExportArrow:
+    @pytest.mark.parametrize('format', ['parquet', 'arrow'])
+    def test_export(self, tmpdir, format):
+        pyarrow = pytest.importorskip('pyarrow')
+        package_path = str(tmpdir.join('packages'))
+        resource_path = str(tmpdir.join('resources'))
+        # 2 resources a package: a row group for each package
+        counts = export.export(packages(), package_path, resource_path,
+                               format=format, row_group_size=2)
+        assert counts == (3, 6)
+        if format == 'parquet':
+            import pyarrow.parquet
+            package_file = pyarrow.parquet.ParquetFile(package_path)
+            assert package_file.metadata.num_row_groups == 3
+            table = package_file.read()
+            resources = pyarrow.parquet.read_table(resource_path)
+        else:
+            import pyarrow.ipc
+            with pyarrow.ipc.open_file(package_path) as reader:
+                assert reader.num_record_batches == 3
+                table = reader.read_all()
+            with pyarrow.ipc.open_file(resource_path) as reader:
+                resources = reader.read_all()
+        assert table.column('name').to_pylist() == [
+            'package-0', 'package-1', 'package-2']
+        assert table.column('keywords').to_pylist()[0] == ['water',
+                                                          'health']
+        assert str(table.schema.field('num_resources').type) == 'int64'
+        assert resources.column('bytes').to_pylist() == [40, None] * 3
+
+    def test_non_string_values(self, tmpdir):
+        pytest.importorskip('pyarrow')
+        import pyarrow.parquet
+        path = str(tmpdir.join('packages'))
+        export.export([{'name': 'gdp', 'title': {'en': 'GDP'}, 'version': 2,
+                        'keywords': ['gdp', 2020]}], path, format='parquet')
+        table = pyarrow.parquet.read_table(path)
+        assert table.column('title').to_pylist() == ['{"en": "GDP"}']
+        assert table.column('version').to_pylist() == ['2']
+        assert table.column('keywords').to_pylist() == [['gdp', '2020']]
@@ -0,0 +1,121 @@
+# coding=utf-8
+import copy
+import hashlib
+import json
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import fingerprint
+from frictionless_ckan_mapper import frictionless_to_ckan
+
+
+def ckan_package():
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    ckandict['extras'] = [
+        {'key': 'spatial',
+         'value': '{"type": "Point", "coordinates": [1, 2]}'},
+        {'key': 'source', 'value': 'census'}]
+    return ckandict
+
+
+def frictionless_package():
+    inpath = 'tests/fixtures/frictionless_package.json'
+    return json.load(open(inpath))
+
+
+# licenses `dataset` fills in for a package without any
+NO_LICENSES = [{'name': 'no_license_name', 'title': 'no_license_title',
+                'path': 'no_license_path'}]
+
+
+def dumps(value):
+    return json.dumps(value, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class TestFingerprint:
+    def test_is_blake2b_of_the_canonical_json(self):
+        package = {'title': u'Données', 'name': 'gdp', 'resources': [
+            {'name': 'a', 'path': 'a.csv', 'position': 0},
+            {'name': 'b', 'path': 'b.csv'}],
+            'metadata_modified': '2020-06-25T14:33:49'}
+        canonical = dumps(
+            {'name': 'gdp', 'title': u'Données', 'licenses': NO_LICENSES,
+             'resources': [{'name': 'a', 'path': 'a.csv'},
+                           {'name': 'b', 'path': 'b.csv'}]})
+        assert b''.join(fingerprint.canonical(package)) == canonical
+        assert fingerprint.fingerprint(package) == hashlib.blake2b(
+            canonical, digest_size=16).hexdigest()
+
+    def test_many_resources(self):
+        resources = [{'name': str(i), 'path': '{}.csv'.format(i),
+                      'position': i} for i in range(150)]
+        canonical = dumps({'licenses': NO_LICENSES, 'resources': [
+            {'name': res['name'], 'path': res['path']}
+            for res in resources]})
+        assert b''.join(fingerprint.canonical({'resources': resources})) == \
+            canonical
+
+    def test_empty_values(self):
+        canonical = dumps({'licenses': NO_LICENSES, 'resources': []})
+        assert b''.join(fingerprint.canonical({})) == canonical
+        assert b''.join(fingerprint.canonical({'resources': []})) == \
+            canonical
+
+    def test_key_order_and_volatile_keys_are_ignored(self):
+        ckandict = ckan_package()
+        other = dict(reversed(list(copy.deepcopy(ckandict).items())))
+        other['metadata_modified'] = '2030-01-01T00:00:00'
+        other['revision_id'] = 'another-revision'
+        for position, resource in enumerate(reversed(other['resources'])):
+            resource['position'] = position
+        assert fingerprint.fingerprint(ckandict) == \
+            fingerprint.fingerprint(other)
+
+    def test_content_changes_are_not_ignored(self):
+        ckandict = ckan_package()
+        other = copy.deepcopy(ckandict)
+        other['resources'][0]['url'] = 'http://example.com/other.csv'
+        assert fingerprint.fingerprint(ckandict) != \
+            fingerprint.fingerprint(other)
+
+    def test_extras_are_decoded(self):
+        ckandict = ckan_package()
+        other = copy.deepcopy(ckandict)
+        other['extras'] = [
+            {'key': 'source', 'value': 'census'},
+            {'key': 'spatial',
+             'value': '{"coordinates":[1,2],"type":"Point"}'}]
+        expanded = copy.deepcopy(ckandict)
+        del expanded['extras']
+        expanded['source'] = 'census'
+        expanded['spatial'] = {'type': 'Point', 'coordinates': [1, 2]}
+        assert len(set(fingerprint.fingerprint(package)
+                       for package in [ckandict, other, expanded])) == 1
+
+    def test_conversions_hash_alike(self):
+        for ckandict in [ckan_package(), json.load(open(
+                'tests/fixtures/full_ckan_package_first_round_trip.json'))]:
+            fddict = ckan_to_frictionless.dataset(copy.deepcopy(ckandict))
+            assert fingerprint.fingerprint(ckandict) == \
+                fingerprint.fingerprint(fddict)
+            assert fingerprint.fingerprint(fddict) == \
+                fingerprint.fingerprint(
+                    frictionless_to_ckan.package(copy.deepcopy(fddict)))
+        fddict = frictionless_package()
+        assert fingerprint.fingerprint(fddict) == fingerprint.fingerprint(
+            frictionless_to_ckan.package(copy.deepcopy(fddict)))
+
+    def test_package_is_left_as_is(self):
+        for package in [ckan_package(), frictionless_package()]:
+            package['licenses'] = [{'name': 'cc-by'}, {'name': 'odc-by'}]
+            package['organization'] = {'name': 'org'}
+            exp = copy.deepcopy(package)
+            fingerprint.fingerprint(package)
+            assert package == exp
+
+    def test_custom_volatile_keys(self):
+        package = {'name': 'gdp', 'harvested_at': '2020-06-25'}
+        assert fingerprint.fingerprint(
+            package, volatile={'harvested_at'}) == \
+            fingerprint.fingerprint({'name': 'gdp'})
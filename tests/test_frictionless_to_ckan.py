@@ -1,5 +1,6 @@
 # coding=utf-8
 import json
+import tracemalloc
 
 import frictionless_ckan_mapper.frictionless_to_ckan as converter
 
@@ -49,6 +50,11 @@ class TestResourceConversion:
         out = converter.resource(indict)
         assert out == exp
 
+    def test_compile_resource_with_extra_mapping(self):
+        resource = converter.compile_resource({'encoding': 'charset'})
+        indict = {'path': 'data.csv', 'encoding': 'utf-8'}
+        assert resource(indict) == {'url': 'data.csv', 'charset': 'utf-8'}
+
     def test_passthrough(self):
         indict = {
             'description': 'GDPs list',
@@ -89,6 +95,24 @@ class TestPackageConversion:
         out = converter.package(indict)
         assert out == exp
 
+    def test_extra_mappings(self):
+        indict = {
+            'description': 'GDP',
+            'sources': 'World Bank',
+            'resources': [{'path': 'data.csv', 'encoding': 'utf-8'}],
+        }
+        exp = {
+            'notes': 'GDP',
+            'source': 'World Bank',
+            'resources': [{'url': 'data.csv', 'charset': 'utf-8'}],
+        }
+        out = converter.package(indict, extra_mapping={'sources': 'source'},
+                                extra_resource_mapping={'encoding': 'charset'})
+        # a key mapped to a CKAN extra is an extra
+        assert out.pop('extras') == [{'key': 'source', 'value': 'World Bank'}]
+        del exp['source']
+        assert out == exp
+
     def test_dataset_license(self):
         indict = {
             'licenses': [{
@@ -284,3 +308,61 @@ class TestPackageConversion:
         out = converter.package(indict)
         assert out == exp
 
+
+
+class TestBatchConversion:
+    def test_packages_keeps_input_order(self):
+        indicts = [
+            {'name': 'package-{}'.format(i), 'description': 'GDP'}
+            for i in range(20)
+        ]
+        exp = [converter.package(indict) for indict in indicts]
+        out = list(converter.packages(indicts, workers=2, chunksize=4))
+        assert out == exp
+
+    def test_packages_with_compiled_converter(self):
+        indicts = [{'name': 'package-{}'.format(i), 'title': 'GDP'}
+                   for i in range(6)]
+        convert = converter.compile_package({'title': 'notes'})
+        out = list(converter.packages(indicts, workers=2, chunksize=2,
+                                      convert=convert))
+        assert out == [convert(indict) for indict in indicts]
+        assert out[0] == {'name': 'package-0', 'notes': 'GDP'}
+
+
+class TestInplaceConversion:
+    def test_package_inplace(self):
+        indict = {
+            'name': 'gdp',
+            'description': 'GDP',
+            'keywords': ['economy'],
+            'custom': {'a': 1},
+            'resources': [{'path': 'data.csv', 'bytes': 10}]
+        }
+        exp = converter.package(json.loads(json.dumps(indict)))
+        out = converter.package(indict, inplace=True)
+        assert out is indict
+        assert json.dumps(out) == json.dumps(exp)
+
+    def test_package_inplace_peak_memory(self):
+        tracemalloc.start()
+        try:
+            indict = {
+                'name': 'big',
+                'resources': [{
+                    'name': 'resource-{}'.format(i),
+                    'path': 'http://example.com/{}.csv'.format(i),
+                    'bytes': i,
+                    'mediatype': 'text/csv',
+                    'description': 'Resource number {}'.format(i)
+                } for i in range(2000)]
+            }
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+            converter.package(indict, inplace=True)
+            peak = tracemalloc.get_traced_memory()[1] - start
+        finally:
+            tracemalloc.stop()
+        # renamed keys may resize the resource dicts, but nothing is copied
+        assert peak < size * 0.3
@@ -0,0 +1,106 @@
+# coding=utf-8
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import client
+from frictionless_ckan_mapper import harvest
+from tests.fake_ckan import FakeCKAN
+
+
+def packages(num):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    out = []
+    for i in range(num):
+        indict = dict(ckandict)
+        indict['id'] = 'id-{}'.format(i)
+        indict['name'] = 'package-{}'.format(i)
+        out.append(indict)
+    return out
+
+
+def collect(*args, **kwargs):
+    async def run():
+        try:
+            return [item async for item in harvest.harvest(*args, **kwargs)]
+        finally:
+            # connections must be closed before the event loop
+            if kwargs.get('client'):
+                kwargs['client'].close()
+    return client.run(run())
+
+
+def by_name(fddicts):
+    return sorted(fddicts, key=lambda fddict: fddict['name'])
+
+
+class TestHarvest:
+    def test_all_pages_converted(self):
+        ckandicts = packages(23)
+        exp = [ckan_to_frictionless.dataset(indict) for indict in ckandicts]
+        with FakeCKAN(ckandicts) as portal:
+            out = collect(portal.url, rows=5, concurrency=3)
+        assert by_name(out) == by_name(exp)
+        # 5 pages of 5 packages
+        assert portal.stats['requests'] == 5
+
+    def test_connections_are_pooled(self):
+        with FakeCKAN(packages(40)) as portal:
+            out = collect(portal.url, rows=2, concurrency=4)
+        assert len(out) == 40
+        assert portal.stats['requests'] == 20
+        assert portal.stats['connections'] <= 4
+
+    def test_ids_with_package_show(self):
+        ckandicts = packages(6)
+        with FakeCKAN(ckandicts) as portal:
+            out = collect(portal.url, ids=['id-1', 'package-4'],
+                          concurrency=2)
+        assert by_name(out) == [
+            ckan_to_frictionless.dataset(ckandicts[1]),
+            ckan_to_frictionless.dataset(ckandicts[4])]
+
+    def test_convert_none_returns_ckan_packages(self):
+        ckandicts = packages(3)
+        with FakeCKAN(ckandicts, chunked=True, gzip=False) as portal:
+            out = collect(portal.url, convert=None)
+        assert out == ckandicts
+
+    def test_retries_after_server_errors(self):
+        with FakeCKAN(packages(4), failures=2) as portal:
+            pool = client.Client(portal.url, backoff=0)
+            out = collect(portal.url, rows=2, client=pool)
+        assert len(out) == 4
+        assert pool.retried == 2
+
+    def test_errors_are_raised(self):
+        with FakeCKAN(packages(1)) as portal:
+            with pytest.raises(client.CKANError) as excinfo:
+                collect(portal.url, ids=['missing'])
+        assert excinfo.value.status == 404
+        assert excinfo.value.error['__type'] == 'Not Found Error'
+
+    def test_gives_up_after_retries(self):
+        with FakeCKAN(packages(1), failures=10) as portal:
+            pool = client.Client(portal.url, retries=2, backoff=0)
+            with pytest.raises(client.CKANError) as excinfo:
+                collect(portal.url, client=pool)
+        assert excinfo.value.status == 503
+        assert portal.stats['requests'] == 3
+
+
+class TestRun:
+    def test_run_in_new_loop(self):
+        async def answer():
+            return 42
+        assert client.run(answer()) == 42
+        # a second call gets a fresh loop, the first one is closed
+        assert client.run(answer()) == 42
+
+    def test_run_raises(self):
+        async def fail():
+            raise ValueError('boom')
+        with pytest.raises(ValueError):
+            client.run(fail())
@@ -0,0 +1,75 @@
+# coding=utf-8
+'''Import time regression tests, based on `python -X importtime`.
+
+Short lived worker processes pay the import time of the converters on every
+start, so slow and optional dependencies must only be imported when needed.
+'''
+import os
+import subprocess
+import sys
+
+# Modules which must not be imported by `import <converter module>`
+LAZY_MODULES = [
+    'unidecode',           # only for non ASCII resource names
+    'six',
+    'orjson',              # JSON backends are picked on first use
+    'ujson',
+    'multiprocessing',     # only for the batch APIs
+    'concurrent.futures.process',
+]
+
+# Generous cumulative budget in microseconds for importing a converter
+# module, stdlib dependencies included. Override with the
+# IMPORT_TIME_BUDGET_US environment variable on slow machines.
+IMPORT_TIME_BUDGET_US = int(os.environ.get('IMPORT_TIME_BUDGET_US', 50000))
+
+
+def importtime(module):
+    '''Return {module name: cumulative import time in us} for a fresh
+    interpreter importing `module`.'''
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        universal_newlines=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def run(code):
+    return subprocess.run([sys.executable, '-c', code],
+                          stdout=subprocess.PIPE, universal_newlines=True,
+                          check=True).stdout.strip()
+
+
+class TestImportTime:
+    def test_lazy_modules_are_not_imported(self):
+        for module in ['frictionless_ckan_mapper.ckan_to_frictionless',
+                       'frictionless_ckan_mapper.frictionless_to_ckan']:
+            times = importtime(module)
+            assert module in times
+            for lazy in LAZY_MODULES:
+                assert lazy not in times, (
+                    '{} imports {}'.format(module, lazy))
+
+    def test_import_time_budget(self):
+        module = 'frictionless_ckan_mapper.ckan_to_frictionless'
+        # best of a few runs, the first one may also compile the .pyc
+        best = min(importtime(module)[module] for _ in range(3))
+        assert best < IMPORT_TIME_BUDGET_US
+
+    def test_unidecode_is_imported_on_first_non_ascii_name(self):
+        out = run(
+            'import sys\n'
+            'from frictionless_ckan_mapper import ckan_to_frictionless as c\n'
+            'c.resource({"name": "data.csv"})\n'
+            'print("unidecode" in sys.modules)\n'
+            'c.resource({"name": u"donn\\u00e9es"})\n'
+            'print("unidecode" in sys.modules)\n'
+        )
+        assert out.split() == ['False', 'True']
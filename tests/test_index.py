@@ -0,0 +1,141 @@
+# coding=utf-8
+import pytest
+
+from frictionless_ckan_mapper import index
+
+
+def package(num, keywords=(), license='cc-by', formats=('CSV',),
+            owner_org='org-a'):
+    return {
+        'id': 'id-{}'.format(num),
+        'name': 'package-{}'.format(num),
+        'keywords': list(keywords),
+        'licenses': [{'name': license, 'title': license}],
+        'owner_org': owner_org,
+        'resources': [{'format': fmt, 'mediatype': 'text/' + fmt.lower()}
+                      for fmt in formats],
+    }
+
+
+def catalog():
+    return [
+        package(0, ['water', 'health'], formats=('CSV', 'JSON')),
+        package(1, ['water'], license='odc-odbl', owner_org='org-b'),
+        package(2, ['roads'], formats=('XLS', 'CSV', 'CSV')),
+        package(3, [], license='odc-odbl', formats=()),
+    ]
+
+
+class TestCatalogIndex:
+    def test_search(self):
+        catalog_index = index.build(catalog())
+        assert len(catalog_index) == 4
+        assert catalog_index.search(keywords='water') == ['id-0', 'id-1']
+        assert catalog_index.search(format='CSV') == ['id-0', 'id-1', 'id-2']
+        assert catalog_index.search(mediatype='text/json') == ['id-0']
+        assert catalog_index.search(license='odc-odbl') == ['id-1', 'id-3']
+        assert catalog_index.search(owner_org='org-b') == ['id-1']
+        assert catalog_index.search(format='CSV', license='cc-by') == [
+            'id-0', 'id-2']
+        assert catalog_index.search(format='CSV', keywords='nothing') == []
+        assert catalog_index.search(format='CSV', limit=1) == ['id-0']
+        assert catalog_index.count(format='CSV') == 3
+        assert catalog_index.values('license') == {'cc-by': 2,
+                                                   'odc-odbl': 2}
+        with pytest.raises(ValueError):
+            catalog_index.search(title='nothing')
+        with pytest.raises(ValueError):
+            catalog_index.search()
+
+    def test_postings_are_arrays(self):
+        catalog_index = index.build(catalog())
+        numbers = catalog_index.postings['format']['CSV']
+        assert numbers.typecode == 'I'
+        assert list(numbers) == [0, 1, 2]
+
+    def test_repeated_keywords(self):
+        catalog_index = index.build([package(0, ['a', 'a', 'b']),
+                                     package(1, ['a'])])
+        assert catalog_index.search(keywords='a') == ['id-0', 'id-1']
+        assert catalog_index.search(keywords='a', format='CSV') == [
+            'id-0', 'id-1']
+        assert catalog_index.count(keywords='a') == 2
+        assert catalog_index.values('keywords') == {'a': 2, 'b': 1}
+        assert list(catalog_index.postings['keywords']['a']) == [0, 1]
+
+    def test_updates(self):
+        catalog_index = index.build(catalog())
+        catalog_index.add(package(0, ['roads'], formats=('XLS',)))
+        catalog_index.remove('id-2')
+        with pytest.raises(KeyError):
+            catalog_index.remove('id-2')
+        assert len(catalog_index) == 3
+        assert catalog_index.search(keywords='water') == ['id-1']
+        assert catalog_index.search(keywords='roads') == ['id-0']
+        assert catalog_index.search(format='CSV') == ['id-1']
+        assert catalog_index.count(format='XLS') == 1
+        assert catalog_index.values('format') == {'CSV': 1, 'JSON': 0,
+                                                  'XLS': 1}
+
+    def test_purge(self, monkeypatch):
+        monkeypatch.setattr(index, 'MIN_PURGE', 2)
+        catalog_index = index.build(catalog())
+        catalog_index.remove('id-0')
+        assert catalog_index.postings['keywords']['water'].tolist() == [0, 1]
+        catalog_index.remove('id-1')
+        assert 'water' not in catalog_index.postings['keywords']
+        assert catalog_index.postings['format']['CSV'].tolist() == [0]
+        assert catalog_index.search(format='CSV') == ['id-2']
+        catalog_index.add(package(1, ['water']))
+        assert catalog_index.search(format='CSV') == ['id-2', 'id-1']
+
+    def test_intersection_of_short_and_long_lists(self):
+        catalog_index = index.build(
+            package(num, ['rare'] if num % 100 == 0 else ['common'],
+                    formats=('CSV',))
+            for num in range(1000))
+        assert catalog_index.search(keywords='rare', format='CSV') == [
+            'id-{}'.format(num) for num in range(0, 1000, 100)]
+        assert catalog_index.count(format='CSV', keywords='common') == 990
+
+    def test_package_without_id(self):
+        catalog_index = index.build([{'name': 'no-id', 'keywords': ['a']}])
+        assert catalog_index.search(keywords='a') == ['no-id']
+        with pytest.raises(ValueError):
+            catalog_index.add({'keywords': ['a']})
+
+    def test_bitmaps_of_frequent_values(self, monkeypatch):
+        monkeypatch.setattr(index, 'DENSE', 10)
+        catalog_index = index.build(
+            package(num, ['rare'] if num % 100 == 0 else ['common'],
+                    formats=('CSV',) if num % 2 else ('CSV', 'PDF'))
+            for num in range(1000))
+        assert catalog_index.count(format='CSV', keywords='common') == 990
+        assert catalog_index.count(format='PDF', keywords='common') == 490
+        assert catalog_index.search(keywords='rare', format='PDF',
+                                    limit=2) == ['id-0', 'id-100']
+        # bitmaps built by the queries follow changes
+        catalog_index.add(package(1000, ['common'], formats=('PDF',)))
+        catalog_index.add(package(2, ['other'], formats=('PDF',)))
+        catalog_index.remove('id-4')
+        assert catalog_index.count(format='PDF', keywords='common') == 489
+        assert catalog_index.search(format='PDF', keywords='common')[-2:] == [
+            'id-998', 'id-1000']
+
+    @pytest.mark.parametrize('and_bytes', [0, 128])
+    def test_sparse_value_and_dense_values(self, monkeypatch, and_bytes):
+        monkeypatch.setattr(index, 'DENSE', 50)
+        monkeypatch.setattr(index, 'AND_BYTES', and_bytes)
+        catalog_index = index.build(
+            package(num, ['common', 'rare'] if num % 25 == 0 else ['common'],
+                    formats=('CSV',) if num % 2 else ('CSV', 'PDF'),
+                    owner_org='org-{}'.format(num % 3))
+            for num in range(1000))
+        catalog_index.remove('id-300')
+        criteria = {'keywords': 'rare', 'format': 'PDF', 'owner_org': 'org-0'}
+        exp = ['id-{}'.format(num) for num in range(0, 1000, 150)
+               if num != 300]
+        assert catalog_index.search(**criteria) == exp
+        assert catalog_index.count(**criteria) == len(exp)
+        del criteria['owner_org']
+        assert catalog_index.count(**criteria) == 19
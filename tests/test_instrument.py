@@ -0,0 +1,81 @@
+# coding=utf-8
+import json
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import instrument
+
+
+def ckan_package():
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    ckandict['extras'] = [{'key': 'a', 'value': '[1, 2]'},
+                          {'key': 'b', 'value': 'text'}]
+    ckandict['resources'] = ckandict['resources'] * 3
+    return ckandict
+
+
+class TestInstrument:
+    def test_disabled_by_default(self):
+        assert instrument.recorder is None
+        assert instrument.stopwatch() is None
+
+    def test_dataset_stages(self):
+        with instrument.enabled() as timings:
+            ckan_to_frictionless.dataset(ckan_package())
+        stages = timings.stages
+        assert set(stages) == {
+            'dataset.extras', 'dataset.keys', 'resource.convert',
+            'resource.slugify', 'resource.names', 'dataset.tags',
+            'dataset.contributors', 'dataset.licenses', 'dataset.cleanup'}
+        # [calls, items, total seconds, max seconds]
+        assert stages['dataset.extras'][:2] == [1, 2]
+        assert stages['resource.convert'][:2] == [3, 3]
+        assert stages['resource.slugify'][:2] == [3, 3]
+        assert all(stats[2] >= stats[3] >= 0 for stats in stages.values())
+        assert instrument.recorder is None
+
+    def test_package_stages_with_callback(self):
+        fddict = ckan_to_frictionless.dataset(ckan_package())
+        calls = []
+        with instrument.enabled(lambda *args: calls.append(args)):
+            out = frictionless_to_ckan.package(fddict)
+        assert [call[0] for call in calls] == [
+            'package.keys', 'package.resources', 'package.licenses',
+            'package.contributors', 'package.tags', 'package.extras']
+        assert calls[1][2] == 3
+        assert calls[-1][2] == len(out['extras'])
+
+    def test_output_unchanged(self):
+        exp = ckan_to_frictionless.dataset(ckan_package())
+        with instrument.enabled():
+            assert ckan_to_frictionless.dataset(ckan_package()) == exp
+            fddict = frictionless_to_ckan.package(exp)
+        assert fddict == frictionless_to_ckan.package(exp)
+
+    def test_nested_enabled_restores_previous(self):
+        with instrument.enabled() as outer:
+            with instrument.enabled() as inner:
+                ckan_to_frictionless.dataset(ckan_package())
+            assert instrument.recorder is outer
+        assert inner.stages and not outer.stages
+
+    def test_summary_and_prometheus(self):
+        timings = instrument.Timings()
+        timings('dataset.extras', 0.002, 4)
+        timings('dataset.extras', 0.001, 2)
+        timings('dataset.keys', 0.0005)
+        lines = timings.summary().splitlines()
+        assert lines[0].split() == ['stage', 'calls', 'items', 'total',
+                                    'ms', 'mean', 'us', 'max', 'us']
+        assert lines[1].split()[:3] == ['dataset.extras', '2', '6']
+        assert lines[2].startswith('dataset.keys')
+        text = timings.prometheus()
+        assert ('# TYPE frictionless_ckan_mapper_stage_seconds_total counter'
+                in text)
+        assert ('frictionless_ckan_mapper_stage_items_total'
+                '{stage="dataset.extras"} 6' in text)
+        assert ('frictionless_ckan_mapper_stage_max_seconds'
+                '{stage="dataset.extras"} 0.002' in text)
+        timings.reset()
+        assert timings.stages == {}
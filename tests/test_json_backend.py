@@ -0,0 +1,104 @@
+# coding=utf-8
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import metrics
+
+
+def installed_backends():
+    names = []
+    for name in json_backend.BACKENDS:
+        try:
+            json_backend._candidates(name)
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+@pytest.fixture(params=installed_backends())
+def backend(request):
+    json_backend.use(request.param)
+    yield request.param
+    json_backend.use()
+
+
+VALUES = [
+    '{"type": "Polygon", "coordinates": [[[-0.1275, 51.507222], '
+    '[2.3522, 48.8566], [-0.1275, 51.507222]]]}',
+    '[1, 2, 3]',
+    '{"b": 1, "a": 2, "b": 3}',
+    '12345678901234567890123456789',
+    '[1e400, -1e400]',
+    'NaN',
+    '"\\ud800"',
+    '2016',
+    'null',
+    u'國內生產總值',
+    '{"a": ',
+    '',
+]
+
+
+class TestJsonBackend:
+    def test_loads_is_identical(self, backend):
+        for value in VALUES:
+            try:
+                exp = repr(json.loads(value))
+            except ValueError as e:
+                with pytest.raises(type(e)):
+                    json_backend.loads(value)
+            else:
+                assert repr(json_backend.loads(value)) == exp
+
+    def test_loads_non_string(self, backend):
+        with pytest.raises(TypeError):
+            json_backend.loads(2016)
+
+    def test_dumps_is_identical(self, backend):
+        for value in [json.loads(VALUES[0]), {u'é': [1.5, None, u'ü/']},
+                      [float('nan'), 10 ** 30]]:
+            assert json_backend.dumps(value) == json.dumps(value)
+
+    def test_dumps_default(self, backend):
+        value = {'a': {1, 2}, 'b': [1.5]}
+        assert json_backend.dumps(value, default=sorted) == \
+            json.dumps(value, default=sorted)
+        with pytest.raises(TypeError):
+            json_backend.dumps(value)
+
+    def test_conversions_are_identical(self, backend):
+        inpath = 'tests/fixtures/full_ckan_package.json'
+        ckandict = json.load(open(inpath))
+        ckandict['extras'] = [
+            {'key': 'spatial', 'value': VALUES[0]},
+            {'key': 'big', 'value': VALUES[3]},
+            {'key': 'text', 'value': u'國內生產總值'},
+        ]
+        fdpackage = ckan_to_frictionless.dataset(ckandict)
+        json_backend.use('json')
+        exp = ckan_to_frictionless.dataset(ckandict)
+        assert json.dumps(fdpackage) == json.dumps(exp)
+
+        json_backend.use(backend)
+        ckanpackage = frictionless_to_ckan.package(fdpackage)
+        json_backend.use('json')
+        exp = frictionless_to_ckan.package(fdpackage)
+        assert json.dumps(ckanpackage) == json.dumps(exp)
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            json_backend.use('simplejson')
+
+    def test_fallbacks_are_counted(self, backend):
+        with metrics.enabled() as collector:
+            json_backend.loads('[NaN]')
+            json_backend.loads('12345678901234567890123')
+            with pytest.raises(ValueError):
+                json_backend.loads('{"a": ')
+        exp = {} if backend == 'json' else {'json_backend.fallback': 2}
+        assert collector.totals() == exp
@@ -0,0 +1,103 @@
+# coding=utf-8
+import copy
+import json
+import pickle
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import json_backend
+from frictionless_ckan_mapper import lazy
+from frictionless_ckan_mapper import metrics
+
+
+def ckan_package():
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    ckandict['extras'] = [
+        {'key': 'spatial',
+         'value': '{"type": "Point", "coordinates": [1, 2]}'},
+        {'key': 'number', 'value': '12'},
+        {'key': 'broken', 'value': '{"not": json'},
+        {'key': 'source', 'value': 'census'}]
+    ckandict['resources'][0]['schema'] = ' {"fields": [{"name": "a"}]}'
+    return ckandict
+
+
+@pytest.fixture
+def decoded(monkeypatch):
+    '''List of the values JSON loaded.'''
+    out = []
+    loads = json_backend.loads
+
+    def counting_loads(value):
+        out.append(value)
+        return loads(value)
+    monkeypatch.setattr(json_backend, 'loads', counting_loads)
+    return out
+
+
+class TestLazyDataset:
+    def test_same_as_eager(self):
+        ckandict = ckan_package()
+        exp = ckan_to_frictionless.dataset(copy.deepcopy(ckandict))
+        out = ckan_to_frictionless.dataset(ckandict, lazy=True)
+        assert isinstance(out, lazy.LazyDict)
+        assert isinstance(out['resources'][0], lazy.LazyDict)
+        assert json.dumps(out) == json.dumps(exp)
+        assert out == exp
+        assert exp == out
+
+    def test_values_are_decoded_on_first_access(self, decoded):
+        out = ckan_to_frictionless.dataset(ckan_package(), lazy=True)
+        # scalars are decoded right away, as they are cheap
+        assert decoded == ['12', 'census']
+        assert out['name'] == 'testing'
+        assert out['number'] == 12
+        assert len(decoded) == 2
+        assert out['spatial'] == {'type': 'Point', 'coordinates': [1, 2]}
+        assert out['spatial'] is out['spatial']
+        assert len(decoded) == 3
+        assert out.get('broken') == '{"not": json'
+        assert out['resources'][0]['schema'] == {'fields': [{'name': 'a'}]}
+
+    def test_copies_see_decoded_values(self):
+        exp = ckan_to_frictionless.dataset(ckan_package())
+        for copied in [dict(ckan_to_frictionless.dataset(ckan_package(),
+                                                         lazy=True)),
+                       {**ckan_to_frictionless.dataset(ckan_package(),
+                                                       lazy=True)},
+                       copy.deepcopy(ckan_to_frictionless.dataset(
+                           ckan_package(), lazy=True)),
+                       pickle.loads(pickle.dumps(ckan_to_frictionless.dataset(
+                           ckan_package(), lazy=True)))]:
+            assert json.dumps(copied) == json.dumps(exp)
+
+    def test_copy_keeps_values_to_decode(self, decoded):
+        out = ckan_to_frictionless.dataset(ckan_package(), lazy=True).copy()
+        assert isinstance(out, lazy.LazyDict)
+        assert len(decoded) == 2
+        assert out.pop('spatial')['type'] == 'Point'
+
+    def test_not_json_extras_are_counted_when_read(self):
+        with metrics.enabled() as collector:
+            out = ckan_to_frictionless.dataset(ckan_package(), lazy=True)
+            assert collector.totals().get('dataset.extra_not_json', 0) == 1
+            out['broken']
+            assert collector.totals()['dataset.extra_not_json'] == 2
+
+    def test_inplace_is_refused(self):
+        with pytest.raises(ValueError):
+            ckan_to_frictionless.dataset(ckan_package(), inplace=True,
+                                         lazy=True)
+        with pytest.raises(ValueError):
+            ckan_to_frictionless.resource({}, inplace=True, lazy=True)
+
+
+class TestLazyResource:
+    def test_same_as_eager(self, decoded):
+        ckandict = ckan_package()['resources'][0]
+        out = ckan_to_frictionless.resource(ckandict, lazy=True)
+        assert ckandict['schema'].startswith(' {')
+        assert decoded == []
+        assert out == ckan_to_frictionless.resource(ckandict)
@@ -0,0 +1,235 @@
+# coding=utf-8
+import io
+import json
+import tarfile
+import zipfile
+
+import pytest
+
+from frictionless_ckan_mapper import cli
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import loader
+
+
+def descriptor(num):
+    inpath = 'tests/fixtures/frictionless_package.json'
+    fddict = json.load(open(inpath))
+    fddict['name'] = 'package-{}'.format(num)
+    return fddict
+
+
+def lake(tmpdir, num=3):
+    '''A directory of `num` descriptors, a broken one and other files.'''
+    root = tmpdir.mkdir('lake')
+    for i in range(num):
+        root.mkdir('package-{}'.format(i)).join(loader.DESCRIPTOR).write(
+            json.dumps(descriptor(i)))
+    root.join('package-0', 'data.csv').write('a,b\n1,2\n')
+    root.mkdir('broken').join(loader.DESCRIPTOR).write('{"name": ')
+    return root
+
+
+def names(outfile):
+    return sorted(json.loads(line)['name']
+                  for line in outfile.getvalue().splitlines())
+
+
+class TestIterDescriptors:
+    def test_directory(self, tmpdir):
+        root = lake(tmpdir)
+        items = list(loader.iter_descriptors(str(root)))
+        assert [item[0] for item in items] == [
+            'broken/datapackage.json', 'package-0/datapackage.json',
+            'package-1/datapackage.json', 'package-2/datapackage.json']
+        assert items[1][1] == str(root.join('package-0', 'datapackage.json'))
+        assert items[1][2] is None
+
+    @pytest.mark.parametrize('suffix', ['.tar.gz', '.zip'])
+    def test_archives(self, tmpdir, suffix):
+        root = lake(tmpdir)
+        path = str(tmpdir.join('lake' + suffix))
+        if suffix == '.zip':
+            with zipfile.ZipFile(path, 'w') as archive:
+                for i in range(3):
+                    name = 'package-{}/datapackage.json'.format(i)
+                    archive.write(str(root.join(name)), 'lake/' + name)
+        else:
+            with tarfile.open(path, 'w:gz') as archive:
+                archive.add(str(root), 'lake')
+        items = list(loader.iter_descriptors(
+            path, skip={'lake/broken/datapackage.json'}))
+        assert sorted(item[0] for item in items) == [
+            'lake/package-0/datapackage.json',
+            'lake/package-1/datapackage.json',
+            'lake/package-2/datapackage.json']
+        assert all(item[1] is None for item in items)
+        assert json.loads(items[0][2].decode('utf-8'))['name'].startswith(
+            'package-')
+
+    @pytest.mark.parametrize('format', [tarfile.USTAR_FORMAT,
+                                        tarfile.GNU_FORMAT,
+                                        tarfile.PAX_FORMAT])
+    @pytest.mark.parametrize('mode', ['w', 'w:bz2', 'w:xz'])
+    def test_tar_formats(self, tmpdir, format, mode):
+        path = str(tmpdir.join('lake.tar'))
+        names = ['a/datapackage.json',
+                 'long' * 30 + '/datapackage.json',
+                 'p' * 90 + '/' + 'q' * 60 + '/datapackage.json',
+                 u'données/datapackage.json',
+                 'b/datapackage.json.bak']
+        with tarfile.open(path, mode, format=format) as archive:
+            for name in names:
+                data = json.dumps({'name': name}).encode('utf-8')
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+        with tarfile.open(path) as archive:
+            exp = [(member.name, archive.extractfile(member).read())
+                   for member in archive if member.name in names[:4]]
+        assert [(item[0], item[2]) for item in
+                loader.iter_descriptors(path)] == exp
+
+    def test_tar_member_types(self, tmpdir):
+        path = str(tmpdir.join('lake.tar'))
+        data = json.dumps({'name': 'a'}).encode('utf-8')
+        # a volume header ('V') with data, left to tarfile, and GNU long
+        # link names ('K')
+        volume = tarfile.TarInfo('volume')
+        volume.type = b'V'
+        volume.size = 1024
+        with tarfile.open(path, 'w', format=tarfile.GNU_FORMAT) as archive:
+            for name in ['a/datapackage.json', 'b/datapackage.json']:
+                link = tarfile.TarInfo(name.replace('/', '-link/'))
+                link.type = tarfile.SYMTYPE
+                link.linkname = 'x' * 200
+                archive.addfile(link)
+                archive.addfile(tarfile.TarInfo(name.split('/')[0] + '/'))
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                archive.addfile(info, io.BytesIO(data))
+                if name.startswith('a'):
+                    archive.addfile(volume, io.BytesIO(bytes(1024)))
+        assert [item[0] for item in loader.iter_descriptors(path)] == [
+            'a/datapackage.json', 'b/datapackage.json']
+        assert [item[0] for item in loader.iter_descriptors(
+            path, skip={'b/datapackage.json'})] == ['a/datapackage.json']
+
+    def test_tar_signed_checksum(self, tmpdir):
+        path = str(tmpdir.join('lake.tar'))
+        data = b'{}'
+        with tarfile.open(path, 'w', format=tarfile.USTAR_FORMAT) as archive:
+            info = tarfile.TarInfo(u'données/datapackage.json')
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+        with open(path, 'r+b') as archive:
+            header = bytearray(archive.read(512))
+            header[148:156] = b' ' * 8
+            signed = sum(byte - 256 if byte & 0x80 else byte
+                         for byte in header)
+            header[148:156] = '{:06o}\0 '.format(signed).encode('ascii')
+            archive.seek(0)
+            archive.write(header)
+        assert list(loader.iter_descriptors(path)) == [
+            (u'données/datapackage.json', None, b'{}')]
+
+    def test_tar_numbers(self):
+        assert loader._tar_number(b'00000001750\0') == 0o1750
+        assert loader._tar_number(b'0000644\0\x01\x02\x03\x04') == 0o644
+        assert loader._tar_number(b'\x81' + bytes(11)) == 1 << 88
+        assert loader._tar_number(b'\x80' + bytes(10) + b'\x05') == 5
+        assert loader._tar_number(b'\xff' * 12) == -1
+
+    def test_corrupted_tar(self, tmpdir):
+        path = tmpdir.join('lake.tar')
+        path.write(b'x' * 1024, mode='wb')
+        with pytest.raises(ValueError):
+            list(loader.iter_descriptors(str(path)))
+
+    def test_not_a_tree(self, tmpdir):
+        path = tmpdir.join('file.json')
+        path.write('{}')
+        with pytest.raises(ValueError):
+            loader.iter_descriptors(str(path))
+
+
+class TestLoad:
+    def test_load(self, tmpdir):
+        root = lake(tmpdir)
+        outfile, quarantine = io.StringIO(), io.StringIO()
+        report = loader.load(str(root), outfile, quarantine=quarantine)
+        assert (report.converted, report.failed, report.skipped) == (3, 1, 0)
+        lines = outfile.getvalue().splitlines()
+        assert json.loads(lines[0]) == frictionless_to_ckan.package(
+            descriptor(0))
+        failure = json.loads(quarantine.getvalue())
+        assert failure['location'] == 'broken/datapackage.json'
+        assert failure['error'].startswith('JSONDecodeError')
+
+    def test_batches_and_checkpoint(self, tmpdir, monkeypatch):
+        monkeypatch.setattr(loader, 'BATCH_SIZE', 2)
+        root = lake(tmpdir, 5)
+        checkpoint = str(tmpdir.join('loaded.txt'))
+        outfile = io.StringIO()
+        report = loader.load(str(root), outfile, checkpoint=checkpoint)
+        assert report.converted == 5
+        with io.open(checkpoint) as done:
+            assert len(done.readlines()) == 5
+
+        root.mkdir('package-5').join(loader.DESCRIPTOR).write(
+            json.dumps(descriptor(5)))
+        outfile = io.StringIO()
+        report = loader.load(str(root), outfile, checkpoint=checkpoint)
+        assert (report.converted, report.failed, report.skipped) == (1, 1, 5)
+        assert names(outfile) == ['package-5']
+        assert 'skipped' in str(report)
+
+    def test_drop_partial_line(self, tmpdir):
+        path = tmpdir.join('ckan.jsonl')
+        assert loader.drop_partial_line(str(path)) == 0
+        path.write('{"name": "a"}\n{"name": "b"}\n{"na')
+        assert loader.drop_partial_line(str(path)) == 4
+        assert path.read() == '{"name": "a"}\n{"name": "b"}\n'
+        assert loader.drop_partial_line(str(path)) == 0
+        # a single line longer than a block, cut short
+        path.write('{"name": "' + 'x' * 2000)
+        assert loader.drop_partial_line(str(path)) == 2010
+        assert path.read() == ''
+
+    def test_workers(self, tmpdir):
+        root = lake(tmpdir, 10)
+        outfile = io.StringIO()
+        report = loader.load(str(root), outfile, workers=2, chunksize=3)
+        assert report.converted == 10
+        assert names(outfile) == sorted('package-{}'.format(i)
+                                        for i in range(10))
+
+
+class TestCommandLine:
+    def test_load(self, tmpdir, capsys):
+        root = lake(tmpdir)
+        outpath = tmpdir.join('ckan.jsonl')
+        checkpoint = tmpdir.join('loaded.txt')
+        quarantine = tmpdir.join('quarantine.jsonl')
+        args = ['load', str(root), str(outpath), '--checkpoint',
+                str(checkpoint), '--quarantine', str(quarantine)]
+        cli.main(args)
+        assert len(outpath.readlines()) == 3
+        assert len(quarantine.readlines()) == 1
+        assert 'Failed descriptors written to' in capsys.readouterr().err
+
+        # resumed: the output is kept
+        root.mkdir('package-3').join(loader.DESCRIPTOR).write(
+            json.dumps(descriptor(3)))
+        cli.main(args)
+        assert len(outpath.readlines()) == 4
+        assert '3 skipped' in capsys.readouterr().err
+
+        # a package cut short by a crash is dropped before appending
+        root.mkdir('package-4').join(loader.DESCRIPTOR).write(
+            json.dumps(descriptor(4)))
+        outpath.write('{"name": "package-4", "tit', mode='a')
+        cli.main(args)
+        lines = outpath.readlines()
+        assert len(lines) == 5
+        assert [json.loads(line)['name'] for line in lines][-1] == \
+            'package-4'
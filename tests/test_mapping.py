@@ -0,0 +1,37 @@
+# coding=utf-8
+from frictionless_ckan_mapper import mapping
+
+
+class TestCompileMapping:
+    def test_renamed_keys_move_to_the_end_in_table_order(self):
+        convert = mapping.compile_mapping({'b': 'y', 'a': 'x'})
+        out = convert({'a': 1, 'b': 2, 'c': 3})
+        assert list(out.items()) == [('c', 3), ('y', 2), ('x', 1)]
+
+    def test_renamed_key_keeps_position_of_existing_key(self):
+        convert = mapping.compile_mapping({'url': 'path'})
+        out = convert({'path': 'a', 'format': 'CSV', 'url': 'b'})
+        assert list(out.items()) == [('path', 'b'), ('format', 'CSV')]
+
+    def test_keys_to_remove(self):
+        convert = mapping.compile_mapping({}, keys_to_remove=['a', 'b'])
+        assert convert({'a': 1, 'c': 3}) == {'c': 3}
+
+    def test_extra_mapping(self):
+        convert = mapping.compile_mapping({'a': 'x'}, extra_mapping={'b': 'y'})
+        out = convert({'a': 1, 'b': 2})
+        assert list(out.items()) == [('x', 1), ('y', 2)]
+
+    def test_transform_and_drop_none(self):
+        def transform(outdict):
+            outdict['a'] = None
+
+        convert = mapping.compile_mapping({'b': 'c'}, transform=transform,
+                                          drop_none=True)
+        assert convert({'a': 1, 'b': None, 'd': 4}) == {'d': 4}
+
+    def test_input_is_not_modified(self):
+        convert = mapping.compile_mapping({'a': 'x'}, keys_to_remove=['b'])
+        indict = {'a': 1, 'b': 2}
+        convert(indict)
+        assert indict == {'a': 1, 'b': 2}
@@ -0,0 +1,86 @@
+# coding=utf-8
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import metrics
+
+
+def degenerate_package(name='gdp'):
+    return {
+        'name': name,
+        'license_id': '',
+        'extras': [{'key': 'a', 'value': '[1, 2]'},
+                   {'key': 'b', 'value': 'not json'}],
+        'resources': [{'url': 'a.csv'}, {'name': 'data'}, {'name': 'data'},
+                      {'name': 'x', 'schema': '{broken'}],
+    }
+
+
+class TestMetrics:
+    def test_disabled_by_default(self):
+        assert metrics.current is None
+        metrics.incr('dataset.extra_not_json')
+
+    def test_dataset_events(self):
+        with metrics.enabled() as collector:
+            ckan_to_frictionless.dataset(degenerate_package())
+        assert collector.totals() == {
+            'dataset.extra_not_json': 1,
+            'resource.value_not_json': 1,
+            'resource.unnamed': 1,
+            'resource.renamed_duplicate': 2,
+            'dataset.no_license_name': 1,
+            'dataset.no_license_title': 1,
+            'dataset.no_license_path': 1,
+        }
+        assert collector.records == {(None, 'dataset'): 1}
+        assert metrics.current is None
+
+    def test_clean_package_has_no_events(self):
+        indict = {'name': 'gdp', 'license_id': 'cc-by',
+                  'license_title': 'CC BY', 'license_url': 'http://cc.org',
+                  'resources': [{'name': 'data', 'url': 'a.csv'}]}
+        with metrics.enabled() as collector:
+            ckan_to_frictionless.dataset(indict)
+        assert collector.totals() == {}
+        assert collector.worst() == []
+
+    def test_package_events(self):
+        fddict = {'name': 'gdp', 'schema': {'fields': []}, 'custom': 'x'}
+        with metrics.enabled() as collector:
+            frictionless_to_ckan.package(fddict)
+        assert collector.totals() == {'package.extra_spilled': 2,
+                                      'package.extra_json_encoded': 1}
+        assert collector.records == {(None, 'package'): 1}
+
+    def test_per_portal_and_worst_packages(self):
+        collector = metrics.Collector(top=2)
+        with metrics.enabled(collector, portal='a.org'):
+            ckan_to_frictionless.dataset(degenerate_package('bad'))
+            indict = degenerate_package('less-bad')
+            indict['resources'] = []
+            ckan_to_frictionless.dataset(indict)
+        with metrics.enabled(collector, portal='b.org'):
+            ckan_to_frictionless.dataset(degenerate_package('bad-b'))
+        assert collector.counts['a.org', 'resource.unnamed'] == 1
+        assert collector.counts['b.org', 'resource.unnamed'] == 1
+        assert collector.counts['a.org', 'dataset.extra_not_json'] == 2
+        assert collector.worst() == [(8, 'b.org', 'dataset', 'bad-b'),
+                                     (8, 'a.org', 'dataset', 'bad')]
+        assert collector.portal is None
+
+    def test_summary_and_prometheus(self):
+        with metrics.enabled(portal='demo "ckan"') as collector:
+            ckan_to_frictionless.dataset(degenerate_package())
+            ckan_to_frictionless.dataset(degenerate_package())
+        lines = collector.summary().splitlines()
+        assert lines[0].split() == ['portal', 'event', 'count', 'per', 'pkg']
+        renamed = [line for line in lines if 'renamed_duplicate' in line]
+        assert renamed[0].split()[-2:] == ['4', '2.000']
+        text = collector.prometheus()
+        assert '# TYPE frictionless_ckan_mapper_events_total counter' in text
+        assert ('frictionless_ckan_mapper_events_total{portal="demo '
+                '\\"ckan\\"",event="resource.unnamed"} 2') in text
+        assert ('frictionless_ckan_mapper_packages_total{portal="demo '
+                '\\"ckan\\"",kind="dataset"} 2') in text
+        collector.reset()
+        assert collector.totals() == {}
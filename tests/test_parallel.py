@@ -0,0 +1,48 @@
+# coding=utf-8
+import pytest
+
+from frictionless_ckan_mapper import parallel
+
+
+def square(x):
+    return x * x
+
+
+def fail_on_three(x):
+    if x == 3:
+        raise ValueError('three')
+    return x
+
+
+class TestMapRecords:
+    def test_ordered(self):
+        out = parallel.map_records(square, range(50), workers=3, chunksize=4)
+        assert list(out) == [x * x for x in range(50)]
+
+    def test_unordered(self):
+        out = parallel.map_records(square, range(50), workers=3,
+                                   ordered=False)
+        assert sorted(out) == [x * x for x in range(50)]
+
+    def test_single_worker_is_lazy(self):
+        consumed = []
+
+        def records():
+            for x in range(5):
+                consumed.append(x)
+                yield x
+
+        out = parallel.map_records(square, records(), workers=1)
+        assert consumed == []
+        assert next(out) == 0
+        assert consumed == [0]
+
+    def test_errors_are_raised(self):
+        with pytest.raises(ValueError):
+            list(parallel.map_records(fail_on_three, range(10), workers=2))
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError):
+            parallel.map_records(square, [], workers=0)
+        with pytest.raises(ValueError):
+            parallel.map_records(square, [], chunksize=0)
@@ -3,8 +3,6 @@ import json
 import frictionless_ckan_mapper.ckan_to_frictionless as ckan_to_frictionless
 import frictionless_ckan_mapper.frictionless_to_ckan as frictionless_to_ckan
 
-import six
-
 
 class TestPackageConversion:
     def test_round_trip_ckan(self):
@@ -16,16 +14,7 @@ class TestPackageConversion:
         fd2 = ckan_to_frictionless.dataset(ckan2)
         ckan3 = frictionless_to_ckan.package(fd2)
 
-        # FIXME: this currently doesn't work for Python 2 due to the way
-        # Unicode is handled and because the dictionary keys do not keep
-        # the same order.
-        # Solution 1: Skip for Python 2 (it's clearly the same dictionary
-        # if the build passes on Python 3)
-        # Solution 2: Hard code the dicts as in `test_extras_is_converted`
-        # in test_frictionless_to_ckan.py instead of loading JSON and
-        # sort the keys.
-        if not six.PY2:
-            assert ckan2 == ckan3
+        assert ckan2 == ckan3
 
     def test_differences_ckan_round_trip(self):
         # When converting ckan1 to fd1 then fd1 to ckan2,
@@ -39,16 +28,7 @@ class TestPackageConversion:
                              'full_ckan_package_first_round_trip.json')
         exp = json.load(open(inpath_round_trip))
 
-        # FIXME: this currently doesn't work for Python 2 due to the way
-        # Unicode is handled and because the dictionary keys do not keep
-        # the same order.
-        # Solution 1: Skip for Python 2 (it's clearly the same dictionary
-        # if the build passes on Python 3)
-        # Solution 2: Hard code the dicts as in `test_extras_is_converted`
-        # in test_frictionless_to_ckan.py instead of loading JSON and
-        # sort the keys.
-        if not six.PY2:
-            assert ckan2 == exp
+        assert ckan2 == exp
 
         # Notable differences in `exp` from ckan1 are:
         # - Keys not defined in a standard CKAN package such as
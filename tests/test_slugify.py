@@ -0,0 +1,29 @@
+# coding=utf-8
+from frictionless_ckan_mapper import slugify
+
+
+class TestSlugify:
+    def test_ascii(self):
+        assert slugify.slugify(u'  Emojis CSV ') == 'emojis-csv'
+        assert slugify.slugify(u'data.csv') == 'data.csv'
+        assert slugify.slugify(u'a|b  c') == 'a-b-c'
+        assert slugify.slugify(u'snake_case') == 'snake_case'
+
+    def test_unicode_is_transliterated(self):
+        assert slugify.slugify(u'Données Économiques') == 'donnees-economiques'
+        assert slugify.slugify(u'國內生產總值') == 'guo-nei-sheng-chan-zong-zhi'
+
+    def test_empty(self):
+        assert slugify.slugify(u'') == 'unnamed-resource'
+        assert slugify.slugify(u'   ') == 'unnamed-resource'
+
+    def test_cache_statistics(self):
+        slugify.cache_clear()
+        for _ in range(3):
+            slugify.slugify(u'download')
+        slugify.slugify(u'data')
+        info = slugify.cache_info()
+        assert (info.hits, info.misses, info.currsize) == (2, 2, 2)
+        assert info.maxsize == slugify.CACHE_SIZE
+        slugify.cache_clear()
+        assert slugify.cache_info().currsize == 0
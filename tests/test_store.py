@@ -0,0 +1,111 @@
+# coding=utf-8
+import io
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import frictionless_to_ckan
+from frictionless_ckan_mapper import store
+
+
+def packages(num=3):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    return [dict(ckandict, id='id-{}'.format(i), name='package-{}'.format(i))
+            for i in range(num)]
+
+
+@pytest.fixture
+def path(tmpdir):
+    return str(tmpdir.join('catalog.jsonl'))
+
+
+class TestCatalogStore:
+    def test_dataset_by_id_and_name(self, path):
+        with store.CatalogStore(
+                path, convert=ckan_to_frictionless.dataset) as catalog:
+            for ckandict in packages():
+                catalog.add(ckandict)
+        catalog = store.CatalogStore(path, readonly=True)
+        assert len(catalog) == 3
+        assert list(catalog) == ['id-0', 'id-1', 'id-2']
+        exp = ckan_to_frictionless.dataset(packages()[1])
+        assert catalog.get('id-1') == exp
+        assert catalog.get('package-1') == exp
+        assert catalog.raw('package-1') == json.dumps(exp).encode('utf-8')
+        assert catalog.get('missing') is None
+        assert 'missing' not in catalog
+        catalog.close()
+
+    def test_package(self, path):
+        fddicts = [ckan_to_frictionless.dataset(ckandict)
+                   for ckandict in packages()]
+        with store.CatalogStore(
+                path, convert=frictionless_to_ckan.package) as catalog:
+            for fddict in fddicts:
+                catalog.add(fddict)
+            assert (catalog.get('package-2') ==
+                    frictionless_to_ckan.package(fddicts[2]))
+
+    def test_updates_and_removals(self, path):
+        with store.CatalogStore(path) as catalog:
+            for ckandict in packages():
+                catalog.add(ckandict)
+            catalog.add(dict(packages()[0], name='renamed'))
+            catalog.remove('package-1')
+            with pytest.raises(KeyError):
+                catalog.remove('package-1')
+        for catalog in [store.CatalogStore(path),
+                        store.CatalogStore(path, readonly=True)]:
+            assert list(catalog) == ['id-0', 'id-2']
+            assert catalog.get('package-0') is None
+            assert catalog.get('renamed')['id'] == 'id-0'
+            assert catalog.get('id-0')['name'] == 'renamed'
+            assert 'package-1' not in catalog
+            catalog.close()
+
+    def test_package_without_id_or_name(self, path):
+        with store.CatalogStore(path) as catalog:
+            catalog.add({'name': 'no-id'})
+            assert catalog.get('no-id') == {'name': 'no-id'}
+            with pytest.raises(ValueError):
+                catalog.add({'title': 'nothing'})
+
+    def test_readers_refresh(self, path):
+        writer = store.CatalogStore(path)
+        writer.add(packages()[0])
+        writer.flush()
+        reader = store.CatalogStore(path, readonly=True)
+        writer.add(packages()[1])
+        writer.flush()
+        assert reader.get('id-1') is None
+        reader.refresh()
+        assert reader.get('id-1')['name'] == 'package-1'
+        assert reader.get('id-0')['name'] == 'package-0'
+        writer.close()
+        reader.close()
+
+    def test_recovery(self, path):
+        with store.CatalogStore(path) as catalog:
+            for ckandict in packages(2):
+                catalog.add(ckandict)
+        # a crash: a package written but not indexed, a package and an
+        # index entry written in part
+        with io.open(path, 'ab') as data:
+            data.write(json.dumps(packages(3)[2]).encode('utf-8') + b'\n')
+            data.write(b'{"id": "id-3", "na')
+        with io.open(path + store.INDEX_SUFFIX, 'ab') as index:
+            index.write(b'[12345, "id-')
+        with store.CatalogStore(path) as catalog:
+            assert list(catalog) == ['id-0', 'id-1', 'id-2']
+            catalog.add(dict(packages()[0], id='id-3', name='package-3'))
+        with store.CatalogStore(path, readonly=True) as catalog:
+            assert len(catalog) == 4
+            assert catalog.get('package-3')['id'] == 'id-3'
+            assert catalog.get('package-2')['id'] == 'id-2'
+        with io.open(path, 'rb') as data:
+            assert data.read().count(b'\n') == 4
+        with io.open(path + store.INDEX_SUFFIX) as index:
+            assert [json.loads(line)[1] for line in index] == [
+                'id-0', 'id-1', 'id-2', 'id-3']
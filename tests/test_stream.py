@@ -0,0 +1,113 @@
+# coding=utf-8
+import io
+import json
+
+import pytest
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import cli
+from frictionless_ckan_mapper import stream
+
+
+def packages(num=3):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    out = []
+    for i in range(num):
+        indict = dict(ckandict)
+        indict['name'] = u'package-{}-é'.format(i)
+        indict['num_resources'] = 1234567
+        out.append(indict)
+    return out
+
+
+def envelope(results):
+    return json.dumps({
+        'help': 'https://demo.ckan.org/api/3/action/help_show?name=results',
+        'success': True,
+        'result': {
+            'count': len(results),
+            'facets': {'results': ['not', 'packages']},
+            'results': results,
+            'sort': 'score desc',
+            'search_facets': {}
+        }
+    }, indent=2)
+
+
+class TestIterPackages:
+    @pytest.fixture(autouse=True)
+    def small_blocks(self, monkeypatch):
+        # make sure values straddle block boundaries
+        monkeypatch.setattr(stream, 'BLOCK_SIZE', 7)
+
+    def test_jsonl(self):
+        indicts = packages()
+        infile = io.StringIO(u'\n'.join(json.dumps(p) for p in indicts))
+        assert list(stream.iter_packages(infile)) == indicts
+
+    def test_envelope(self):
+        indicts = packages()
+        infile = io.StringIO(envelope(indicts))
+        assert list(stream.iter_packages(infile)) == indicts
+
+    def test_array(self):
+        indicts = packages()
+        infile = io.StringIO(json.dumps(indicts))
+        assert list(stream.iter_packages(infile)) == indicts
+
+    def test_empty(self):
+        assert list(stream.iter_packages(io.StringIO(u''))) == []
+        assert list(stream.iter_packages(io.StringIO(envelope([])))) == []
+
+    def test_explicit_format(self):
+        indicts = packages(1)
+        infile = io.StringIO(json.dumps(indicts[0]))
+        assert list(stream.iter_packages(infile, format='jsonl')) == indicts
+        with pytest.raises(ValueError):
+            stream.iter_packages(infile, format='xml')
+
+    def test_invalid_json(self):
+        with pytest.raises(ValueError):
+            list(stream.iter_packages(io.StringIO(u'{"name": "abc"')))
+
+    def test_invalid_json_stops_reading(self):
+        # a malformed package fails without reading the rest of the dump
+        class CountingIO(io.StringIO):
+            chars = 0
+
+            def read(self, size=-1):
+                data = io.StringIO.read(self, size)
+                self.chars += len(data)
+                return data
+
+        tail = u'\n'.join(json.dumps(p) for p in packages(200))
+        for bad in [u'{"name": "abc", oops}', u'{"name": "a\nbc"}',
+                    u'{"name": "abc" "title": "x"}']:
+            infile = CountingIO(u'{"name": "first"}\n' + bad + u'\n' + tail)
+            found = []
+            with pytest.raises(ValueError):
+                for package in stream.iter_packages(infile):
+                    found.append(package)
+            assert found == [{'name': 'first'}]
+            assert infile.chars < 1000
+
+
+class TestConvert:
+    def test_convert(self):
+        indicts = packages()
+        infile = io.StringIO(envelope(indicts))
+        outfile = io.StringIO()
+        count = stream.convert(infile, outfile)
+        assert count == 3
+        out = [json.loads(line) for line in outfile.getvalue().splitlines()]
+        assert out == [ckan_to_frictionless.dataset(p) for p in indicts]
+
+    def test_cli(self, tmpdir):
+        indicts = packages()
+        inpath = tmpdir.join('dump.json')
+        inpath.write(envelope(indicts))
+        outpath = tmpdir.join('out.jsonl')
+        cli.main(['convert', str(inpath), str(outpath)])
+        out = [json.loads(line) for line in outpath.readlines()]
+        assert out == [ckan_to_frictionless.dataset(p) for p in indicts]
@@ -0,0 +1,113 @@
+# coding=utf-8
+import io
+import json
+
+from frictionless_ckan_mapper import ckan_to_frictionless
+from frictionless_ckan_mapper import cli
+from frictionless_ckan_mapper import sync
+
+
+def packages(num=4):
+    inpath = 'tests/fixtures/full_ckan_package.json'
+    ckandict = json.load(open(inpath))
+    out = []
+    for i in range(num):
+        indict = dict(ckandict)
+        indict['id'] = 'id-{}'.format(i)
+        indict['name'] = 'package-{}'.format(i)
+        indict['metadata_modified'] = '2020-06-25T14:50:34'
+        out.append(indict)
+    return out
+
+
+def today():
+    '''Yesterday's packages with 0 modified, 1 touched, 2 deleted, 4 added.'''
+    new = packages(5)
+    new[0] = dict(new[0], title='New title',
+                  metadata_modified='2020-06-26T10:00:00')
+    new[1] = dict(new[1], metadata_modified='2020-06-26T10:00:00',
+                  revision_id='another-revision')
+    del new[2]
+    return new
+
+
+def lines(fileobj):
+    return [json.loads(line) for line in fileobj.getvalue().splitlines()]
+
+
+class TestSync:
+    def test_only_changes_are_converted(self):
+        old_index = sync.build_index(packages())
+        outfile = io.StringIO()
+        manifest = io.StringIO()
+        new = today()
+        changes = sync.sync(old_index, iter(new), outfile, manifest)
+        assert changes.as_dict() == {'added': 1, 'modified': 1,
+                                     'deleted': 1, 'unchanged': 2}
+        assert lines(outfile) == [ckan_to_frictionless.dataset(new[0]),
+                                  ckan_to_frictionless.dataset(new[3])]
+        manifest = lines(manifest)
+        assert [(line['change'], line['id']) for line in manifest] == [
+            ('modified', 'id-0'), ('added', 'id-4'), ('deleted', 'id-2')]
+        assert manifest[0]['name'] == 'package-0'
+        assert manifest[0]['metadata_modified'] == '2020-06-26T10:00:00'
+        assert len(manifest[0]['fingerprint']) == 32
+        assert manifest[2] == {'change': 'deleted', 'id': 'id-2'}
+
+    def test_same_metadata_modified_is_not_hashed(self, monkeypatch):
+        old_index = sync.build_index(packages())
+        hashed = []
+        monkeypatch.setattr(sync, '_digest',
+                            lambda package: hashed.append(package['id']))
+        new_index = {}
+        sync.sync(old_index, packages(), io.StringIO(), new_index=new_index)
+        assert hashed == []
+        assert new_index == old_index
+
+    def test_new_index_is_the_index_of_the_new_packages(self):
+        new_index = {}
+        sync.sync(sync.build_index(packages()), today(), io.StringIO(),
+                  new_index=new_index)
+        assert new_index == sync.build_index(today())
+
+    def test_index_round_trip(self):
+        index = sync.build_index(packages())
+        fileobj = io.StringIO()
+        sync.write_index(index, fileobj)
+        assert sync.read_index(io.StringIO(fileobj.getvalue())) == index
+
+    def test_cli(self, tmpdir, capsys):
+        old = tmpdir.join('old.jsonl')
+        old.write(''.join(json.dumps(p) + '\n' for p in packages()))
+        new = tmpdir.join('new.jsonl')
+        new.write(''.join(json.dumps(p) + '\n' for p in today()))
+        outpath = tmpdir.join('changed.jsonl')
+        manifest = tmpdir.join('manifest.jsonl')
+        index = tmpdir.join('index.jsonl')
+        cli.main(['sync', str(old), str(new), str(outpath),
+                  '--manifest', str(manifest), '--save-index', str(index)])
+        assert len(outpath.readlines()) == 2
+        assert len(manifest.readlines()) == 3
+        assert '1 added, 1 modified, 1 deleted, 2 unchanged' in \
+            capsys.readouterr().err
+
+        # nothing changed since the saved index
+        cli.main(['sync', str(index), str(new), str(outpath),
+                  '--old-format', 'index'])
+        assert outpath.read() == ''
+        assert '0 added, 0 modified, 0 deleted, 4 unchanged' in \
+            capsys.readouterr().err
+
+    def test_cli_standard_streams(self, tmpdir, capsys, monkeypatch):
+        # - is stdin for the old dump and stdout for the index, which must
+        # not be closed
+        old = io.StringIO(''.join(json.dumps(p) + '\n' for p in packages()))
+        monkeypatch.setattr('sys.stdin', old)
+        new = tmpdir.join('new.jsonl')
+        new.write(''.join(json.dumps(p) + '\n' for p in today()))
+        outpath = tmpdir.join('changed.jsonl')
+        cli.main(['sync', '-', str(new), str(outpath), '--save-index', '-'])
+        assert not old.closed
+        captured = capsys.readouterr()
+        assert len(captured.out.splitlines()) == 4
+        assert '1 added, 1 modified, 1 deleted, 2 unchanged' in captured.err
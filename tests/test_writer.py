@@ -0,0 +1,98 @@
+# coding=utf-8
+import io
+import json
+
+from frictionless_ckan_mapper import client
+from frictionless_ckan_mapper import writer
+from tests.fake_ckan import FakeCKAN
+
+
+def packages(num, start=0):
+    return [{'name': 'package-{}'.format(i), 'title': 'Package {}'.format(i),
+             'extras': [{'key': 'number', 'value': str(i)}]}
+            for i in range(start, start + num)]
+
+
+class TestWriter:
+    def test_create_then_update(self):
+        with FakeCKAN(packages(3)) as portal:
+            ckandicts = packages(5)
+            ckandicts[0]['title'] = 'Changed'
+            report = writer.run(portal.url, ckandicts, concurrency=2)
+            assert report.created == 2
+            assert report.updated == 3
+            assert report.failed == 0
+            assert len(portal.packages) == 5
+            assert portal.find('package-0')['title'] == 'Changed'
+            assert portal.find('package-4')['id']
+            # one conflict per existing package
+            assert portal.stats['requests'] == 8
+
+    def test_package_with_id_is_updated_first(self):
+        existing = dict(packages(1)[0], id='id-0')
+        with FakeCKAN([existing]) as portal:
+            ckandicts = [dict(existing, title='Changed'),
+                         dict(packages(1, start=1)[0], id='id-1')]
+            report = writer.run(portal.url, ckandicts)
+            assert (report.created, report.updated) == (1, 1)
+            assert portal.find('id-1')['name'] == 'package-1'
+            assert portal.stats['package_update'] == 1
+            assert portal.stats['requests'] == 3
+
+    def test_checkpoint_resume(self, tmpdir):
+        checkpoint = str(tmpdir.join('written.txt'))
+        with FakeCKAN() as portal:
+            writer.run(portal.url, packages(4), checkpoint=checkpoint)
+            report = writer.run(portal.url, packages(6),
+                                checkpoint=checkpoint)
+            assert report.skipped == 4
+            assert report.created == 2
+            assert portal.stats['requests'] == 6
+        with open(checkpoint) as infile:
+            assert sorted(infile.read().split()) == [
+                'package-{}'.format(i) for i in range(6)]
+
+    def test_truncated_checkpoint_line_is_written_again(self, tmpdir):
+        checkpoint = tmpdir.join('written.txt')
+        checkpoint.write('package-0\npack')
+        with FakeCKAN() as portal:
+            report = writer.run(portal.url, packages(2),
+                                checkpoint=str(checkpoint))
+        assert (report.skipped, report.created) == (1, 1)
+
+    def test_refused_packages_are_quarantined(self):
+        quarantine = io.StringIO()
+        with FakeCKAN(api_key='secret') as portal:
+            report = writer.run(portal.url, packages(2),
+                                quarantine=quarantine)
+            assert portal.packages == []
+        assert report.failed == 2
+        lines = [json.loads(line)
+                 for line in quarantine.getvalue().splitlines()]
+        assert sorted(line['name'] for line in lines) == [
+            'package-0', 'package-1']
+        assert lines[0]['status'] == 403
+        assert 'Access denied' in lines[0]['error']
+
+    def test_api_key_and_retries(self):
+        with FakeCKAN(api_key='secret', failures=2) as portal:
+            ckan = client.Client(portal.url, backoff=0.01,
+                                 headers={'Authorization': 'secret'})
+
+            async def run():
+                try:
+                    return await writer.write(None, packages(3), client=ckan)
+                finally:
+                    ckan.close()
+            report = client.run(run())
+            assert report.created == 3
+            assert ckan.retried == 2
+            assert len(portal.packages) == 3
+
+    def test_rate_limit(self):
+        with FakeCKAN() as portal:
+            report = writer.run(portal.url, packages(6), concurrency=6,
+                                rate=50)
+        assert report.created == 6
+        # 5 intervals of 20 ms between the requests
+        assert report.seconds >= 0.1